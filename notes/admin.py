@@ -1,5 +1,76 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
 
+from .jobs import enqueue
 from .models import Note
+from .purge import deactivate
+
+User = get_user_model()
 
 admin.site.register(Note)
+
+
+class NotesUserAdmin(UserAdmin):
+    """
+    Пользователи без каскадного удаления заметок одной транзакцией.
+
+    И удаление со страницы пользователя, и действие вместо массового
+    удаления закрывают пользователям вход и ставят задачи purge_user:
+    заметки удаляются в фоне, а не в запросе к админке.
+    Страница подтверждения показывает число заметок, не собирая их.
+    """
+    actions = ('purge_selected',)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Стандартное действие грузит все заметки выбранных пользователей.
+        actions.pop('delete_selected', None)
+        return actions
+
+    def _enqueue_purge(self, request, user_ids):
+        deactivate(user_ids)
+        for user_id in user_ids:
+            enqueue('purge_user', request.user, user_id=user_id)
+
+    @admin.action(
+        permissions=('delete',),
+        description='Удалить выбранных пользователей вместе с заметками',
+    )
+    def purge_selected(self, request, queryset):
+        user_ids = list(queryset.values_list('pk', flat=True))
+        self._enqueue_purge(request, user_ids)
+        self.message_user(
+            request,
+            f'Пользователей отправлено на удаление: {len(user_ids)}. Вход '
+            'им уже закрыт, заметки удалят обработчики run_workers.',
+            messages.SUCCESS,
+        )
+
+    def get_deleted_objects(self, objs, request):
+        counts = {
+            user: Note.objects.for_author(user, trashed=None).count()
+            for user in objs
+        }
+        return (
+            [f'{user}: заметок {count}' for user, count in counts.items()],
+            {
+                User._meta.verbose_name_plural: len(counts),
+                Note._meta.verbose_name_plural: sum(counts.values()),
+            },
+            set(),
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self._enqueue_purge(request, [obj.pk])
+        self.message_user(
+            request,
+            f'Пользователь {obj} отправлен на удаление: вход ему уже '
+            'закрыт, заметки удалят обработчики run_workers.',
+            messages.SUCCESS,
+        )
+
+
+admin.site.unregister(User)
+admin.site.register(User, NotesUserAdmin)
@@ -1,6 +1,64 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, pre_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """
+    Восстанавливает FTS-триггеры, если миграции пересоздали таблицу,
+    и сдвигает id заметок шарда в его диапазон.
+    """
+    from .search import install_search_index
+    from .sharding import reserve_id_range
+
+    connection = connections[using]
+    if 'notes_note' in connection.introspection.table_names():
+        install_search_index(connection)
+        reserve_id_range(connection)
+
+
+def start_migrating(sender, using, **kwargs):
+    """
+    Направляет запросы миграций данных к заметкам в мигрируемую базу.
+
+    Сигнал приходит до миграций, и каждый migrate выставляет базу заново,
+    даже если предыдущий упал, не дойдя до post_migrate.
+    """
+    from .sharding import start_migrating
+
+    start_migrating(using)
+
+
+def stop_migrating(sender, **kwargs):
+    from .sharding import stop_migrating
+
+    stop_migrating()
+
+
+def drop_search_content(sender, using, plan, **kwargs):
+    """
+    Снимает прежнее представление-источник поиска, если migrate тронет
+    таблицы notes: с ним SQLite не даст пересоздать notes_note.
+    """
+    from .search import drop_search_content
+
+    if any(migration.app_label == sender.label for migration, _ in plan):
+        drop_search_content(connections[using])
 
 
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from . import checks, signals, tasks  # noqa: F401
+        from .compression import register_sql_function
+        from .db import apply_sqlite_pragmas
+
+        pre_migrate.connect(start_migrating, sender=self)
+        pre_migrate.connect(drop_search_content, sender=self)
+        post_migrate.connect(ensure_search_index, sender=self)
+        post_migrate.connect(stop_migrating, sender=self)
+        connection_created.connect(register_sql_function)
+        connection_created.connect(apply_sqlite_pragmas)
@@ -0,0 +1,184 @@
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.template.loader import render_to_string
+from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views import generic
+
+from .cache import aget_or_compute
+from .conditional import adetail_etag, alist_etag
+from .forms import NoteForm, conflict_context
+from .models import Note, VersionConflict
+from .pagination import KeysetPaginator
+from .rendering import RENDERER_VERSION
+
+
+class AsyncNoteBase(generic.View):
+    """
+    Базовый класс асинхронных CBV.
+
+    Пользователь загружается через ``request.auser()`` и подменяет
+    ленивый ``request.user``, чтобы шаблоны не ходили за ним в БД
+    синхронно. Шаблоны Django асинхронно не рендерятся, поэтому
+    рендеринг уходит в поток через sync_to_async и не держит цикл
+    событий.
+    """
+    model = Note
+    success_url = reverse_lazy('notes:success')
+    template_name = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await super().dispatch(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """Пользователь может работать только со своими заметками."""
+        return self.model.objects.for_author(self.request.user)
+
+    async def get_object(self):
+        try:
+            return await self.get_queryset().aget(slug=self.kwargs['slug'])
+        except self.model.DoesNotExist:
+            raise Http404('Заметка не найдена.')
+
+    async def render(self, template_name=None, status=HTTPStatus.OK,
+                     **context):
+        context.setdefault('view', self)
+        content = await sync_to_async(render_to_string)(
+            template_name or self.template_name, context, self.request
+        )
+        return HttpResponse(content, status=status)
+
+
+def conditional(response_or_none, request, etag):
+    """
+    Асинхронная замена декоратора condition: ETag считается заранее
+    через async ORM, а здесь только сравнивается и ставится в заголовок.
+    """
+    etag = quote_etag(etag) if etag else None
+    if response_or_none is None:
+        return get_conditional_response(request, etag=etag)
+    if etag:
+        response_or_none.headers.setdefault('ETag', etag)
+    return response_or_none
+
+
+class NotesList(AsyncNoteBase):
+    """Список всех заметок пользователя."""
+    template_name = 'notes/list.html'
+    paginate_by = 50
+
+    async def get(self, request, *args, **kwargs):
+        etag = await alist_etag(request)
+        if response := conditional(None, request, etag):
+            return response
+        cursor = request.GET.get('cursor')
+        paginator = KeysetPaginator(
+            self.get_queryset().for_list(), self.paginate_by
+        )
+        page = await aget_or_compute(
+            request.user.pk,
+            ('list', str(self.paginate_by), cursor or ''),
+            lambda: paginator.apage(cursor),
+        )
+        response = await self.render(
+            paginator=paginator,
+            page_obj=page,
+            is_paginated=page.has_other_pages(),
+            object_list=page.object_list,
+        )
+        return conditional(response, request, etag)
+
+
+class NoteDetail(AsyncNoteBase):
+    """Заметка подробно."""
+    template_name = 'notes/detail.html'
+
+    def get_queryset(self):
+        return super().get_queryset().defer('text')
+
+    async def get_object(self):
+        note = await super().get_object()
+        if note.html_is_stale:
+            await sync_to_async(note.ensure_html)()
+        return note
+
+    async def get(self, request, *args, **kwargs):
+        etag = await adetail_etag(request, kwargs['slug'])
+        if response := conditional(None, request, etag):
+            return response
+        note = await aget_or_compute(
+            request.user.pk,
+            ('detail', str(RENDERER_VERSION), kwargs['slug']),
+            self.get_object,
+        )
+        response = await self.render(object=note, note=note)
+        return conditional(response, request, etag)
+
+
+class AsyncNoteFormBase(AsyncNoteBase):
+    template_name = 'notes/form.html'
+
+    async def get_instance(self):
+        """Заметка для формы; по умолчанию новая заметка пользователя."""
+        return self.model(author=self.request.user)
+
+    async def get(self, request, *args, **kwargs):
+        form = NoteForm(instance=await self.get_instance())
+        return await self.render(form=form)
+
+    async def post(self, request, *args, **kwargs):
+        form = NoteForm(request.POST, instance=await self.get_instance())
+        if not form.is_valid():
+            return await self.render(form=form)
+        try:
+            saved = await sync_to_async(form.save_unique)()
+        except VersionConflict:
+            return await self.conflict(form)
+        if not saved:
+            return await self.render(form=form)
+        return HttpResponseRedirect(self.success_url)
+
+    async def conflict(self, form):
+        current = await self.get_queryset().filter(
+            pk=form.instance.pk
+        ).primary().afirst()
+        if current is None:
+            raise Http404('Заметка удалена.')
+        return await self.render(
+            'notes/conflict.html', HTTPStatus.CONFLICT,
+            **conflict_context(form, current),
+        )
+
+
+class NoteCreate(AsyncNoteFormBase):
+    """Добавление заметки."""
+
+
+class NoteUpdate(AsyncNoteFormBase):
+    """Редактирование заметки."""
+
+    async def get_instance(self):
+        return await self.get_object()
+
+
+class NoteDelete(AsyncNoteBase):
+    """Удаление заметки в корзину."""
+    template_name = 'notes/delete.html'
+
+    async def get(self, request, *args, **kwargs):
+        note = await self.get_object()
+        return await self.render(object=note, note=note)
+
+    async def post(self, request, *args, **kwargs):
+        if not await sync_to_async(Note.objects.trash_owned)(
+            request.user, kwargs['slug']
+        ):
+            raise Http404('Заметка не найдена.')
+        return HttpResponseRedirect(self.success_url)
@@ -0,0 +1,62 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+
+class UserCache:
+    """
+    Пользователи по id в памяти процесса на NOTES_USER_CACHE_TIMEOUT секунд.
+
+    Запись сбрасывается при сохранении пользователя (в том числе смене
+    пароля) и при выходе, но только в этом процессе: другие процессы
+    увидят изменения не позже чем через таймаут.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def get(self, user_id):
+        entry = self._users.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        # Каждый запрос получает свою копию: кэши прав и прочие
+        # атрибуты не должны утекать между запросами.
+        return copy.copy(entry[0])
+
+    def set(self, user_id, user):
+        expires = time.monotonic() + settings.NOTES_USER_CACHE_TIMEOUT
+        with self._lock:
+            self._users[user_id] = (copy.copy(user), expires)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedUserBackend(ModelBackend):
+    """
+    ModelBackend, который берёт пользователя сессии из кэша процесса.
+
+    Вместе с сессиями в подписанных cookie снимает с каждого запроса
+    обращения к django_session и auth_user. Хэш пароля в сессии
+    по-прежнему сверяется с закэшированным пользователем.
+    """
+
+    def get_user(self, user_id):
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache.set(user_id, user)
+        return user
@@ -0,0 +1,303 @@
+from functools import partial
+from http import HTTPStatus
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .cache import invalidate_user_pages
+from .forms import NoteForm
+from .models import DERIVED_FIELDS, ChangeCounter, Note, NoteSlug
+from .sharding import shard_for, sharding_enabled
+from .slugs import transliterate
+
+# Сколько операций принимается в одном пакете.
+MAX_OPERATIONS = 500
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+OPERATIONS = (CREATE, UPDATE, DELETE)
+
+UPDATE_FIELDS = (
+    'title', 'text', 'slug', 'version', 'updated_at', 'change_seq',
+    *DERIVED_FIELDS,
+)
+
+
+class BatchError(Exception):
+    """Пакет нельзя выполнить целиком: ничего не записано."""
+    status = HTTPStatus.BAD_REQUEST
+
+
+class BatchConflict(BatchError):
+    """Параллельная запись заняла slug, пакет стоит повторить."""
+    status = HTTPStatus.CONFLICT
+
+
+def note_as_dict(note):
+    return {
+        'id': note.pk,
+        'title': note.title,
+        'text': note.text,
+        'slug': note.slug,
+        'version': note.version,
+    }
+
+
+class NoteBatch:
+    """
+    Пакет операций создания, правки и удаления заметок одного автора.
+
+    Операции проверяются по порядку в памяти той же NoteForm, что и в
+    HTML-формах; заметки автора и владельцы упомянутых slug загружаются
+    заранее двумя запросами. Если все операции корректны, изменения
+    пишутся в одной транзакции массовыми запросами: перенос в корзину,
+    обновление, создание. Если хотя бы одна операция ошибочна или
+    ждёт не ту версию заметки, не пишется ничего.
+    """
+
+    def __init__(self, author, operations):
+        if not isinstance(operations, list):
+            raise BatchError('Ожидается список операций.')
+        if len(operations) > MAX_OPERATIONS:
+            raise BatchError(f'В пакете не больше {MAX_OPERATIONS} операций.')
+        self.author = author
+        self.operations = operations
+        self.errors = {}
+        self.conflicts = {}
+        self.created = {}
+        self.updated = {}
+        self.deleted = {}
+
+    def _load(self):
+        """Загружает заметки автора по id и владельцев явных slug."""
+        ids, slugs = set(), set()
+        for operation in self.operations:
+            if not isinstance(operation, dict):
+                continue
+            if isinstance(operation.get('id'), int):
+                ids.add(operation['id'])
+            if isinstance(operation.get('slug'), str):
+                slugs.add(operation['slug'])
+        self.notes = Note.objects.for_author(self.author).primary().in_bulk(
+            ids
+        )
+        self.original_slugs = {
+            note.pk: note.slug for note in self.notes.values()
+        }
+        self.originals = {
+            note.pk: note_as_dict(note) for note in self.notes.values()
+        }
+        self.slug_owners = Note.objects.slug_owners(slugs)
+        self.slug_owners.update(
+            (slug, pk) for pk, slug in self.original_slugs.items()
+        )
+
+    def _apply_form(self, index, operation, note, owner):
+        """
+        Применяет поля операции к заметке через NoteForm.
+
+        Версию операции форма не проверяет: её сверяет _version_conflict(),
+        а без версии пакет пишет поверх текущей.
+        """
+        old_slug = note.slug
+        data = {
+            field: operation.get(field, getattr(note, field))
+            for field in NoteForm.Meta.fields
+        }
+        data['version'] = note.version
+        form = NoteForm(data, instance=note, slug_owners=self.slug_owners)
+        if not form.is_valid():
+            self.errors[index] = {
+                field: list(messages)
+                for field, messages in form.errors.items()
+            }
+            return False
+        self._release(old_slug, owner)
+        if note.slug:
+            self.slug_owners[note.slug] = owner
+        return True
+
+    def _version_conflict(self, index, operation, note):
+        """
+        Сверяет необязательную версию операции с версией заметки.
+
+        Возвращает True, если операцию выполнять нельзя: версия
+        некорректна или заметку уже изменили.
+        """
+        if 'version' not in operation:
+            return False
+        version = operation['version']
+        if type(version) is not int or version < 1:
+            self.errors[index] = {
+                'version': ['Ожидается целое число не меньше 1.']
+            }
+            return True
+        if version != note.version:
+            self.conflicts[index] = note.pk
+            return True
+        return False
+
+    def _release(self, slug, owner):
+        if self.slug_owners.get(slug) == owner:
+            del self.slug_owners[slug]
+
+    def _check(self):
+        for index, operation in enumerate(self.operations):
+            kind = operation.get('op') if isinstance(operation, dict) else None
+            if kind not in OPERATIONS:
+                self.errors[index] = {'op': [
+                    f'Ожидается одна из операций: {", ".join(OPERATIONS)}.'
+                ]}
+                continue
+            if kind == CREATE:
+                note = Note(author=self.author)
+                # Новым заметкам нужен владелец slug, отличный от None.
+                if self._apply_form(index, operation, note, ('new', index)):
+                    self.created[index] = note
+                continue
+            note = self.notes.get(operation.get('id'))
+            if note is None or note.pk in self.deleted:
+                self.errors[index] = {'id': ['Заметка не найдена.']}
+            elif self._version_conflict(index, operation, note):
+                continue
+            elif kind == UPDATE:
+                if self._apply_form(index, operation, note, note.pk):
+                    self.updated[note.pk] = note
+            else:
+                self._release(note.slug, note.pk)
+                self.updated.pop(note.pk, None)
+                self.deleted[note.pk] = note
+
+    def _allocate_slugs(self):
+        """Подбирает slug по заголовку там, где он не указан."""
+        pending = [
+            *(note for note in self.created.values() if not note.slug),
+            *(note for note in self.updated.values() if not note.slug),
+        ]
+        if not pending:
+            return
+        allocator = Note.objects.slug_allocator()
+        allocator.prefetch(transliterate(note.title) for note in pending)
+        for note in pending:
+            base = transliterate(note.title)
+            slug = self.original_slugs.get(note.pk)
+            # Как и Note.save(), правка не меняет адрес без нужды.
+            if slug != base or slug in self.slug_owners:
+                slug = allocator.allocate(base)
+                while slug in self.slug_owners:
+                    slug = allocator.allocate(base)
+            note.slug = slug
+            self.slug_owners[slug] = note
+
+    def _check_versions(self, notes):
+        """
+        Убеждается, что заметки пакета не изменили после загрузки.
+
+        Вызывается внутри транзакции записи: массовые запросы не сверяют
+        версию сами, поэтому при гонке пакет откатывается целиком.
+        """
+        touched = [*self.updated, *self.deleted]
+        if not touched:
+            return
+        current = dict(
+            notes.filter(pk__in=touched, deleted_at=None).values_list(
+                'pk', 'version'
+            )
+        )
+        if current != {pk: self.originals[pk]['version'] for pk in touched}:
+            raise BatchConflict(
+                'Заметки пакета изменились после загрузки, повторите запрос.'
+            )
+
+    def _write(self):
+        now = timezone.now()
+        for note in self.updated.values():
+            note.version += 1
+            note.updated_at = now
+        for note in (*self.updated.values(), *self.created.values()):
+            note.update_derived_fields()
+        using = shard_for(self.author)
+        notes = Note.objects.using(using)
+        with transaction.atomic(using=using):
+            self._check_versions(notes)
+            ChangeCounter.number(
+                [*self.updated.values(), *self.created.values()],
+                using=using,
+            )
+            if self.deleted:
+                # Как trash_owned(): заметки уходят в корзину, а не
+                # удаляются, и синхронизация видит их удалёнными.
+                notes.filter(pk__in=self.deleted).update(
+                    deleted_at=now,
+                    change_seq=ChangeCounter.reserve(using=using),
+                )
+            if self.updated:
+                notes.bulk_update(self.updated.values(), UPDATE_FIELDS)
+            if self.created:
+                notes.bulk_create(self.created.values())
+            if sharding_enabled():
+                NoteSlug.claim([
+                    *self.created.values(),
+                    *(
+                        note for note in self.updated.values()
+                        if note.slug != self.original_slugs[note.pk]
+                    ),
+                ])
+                # Slug удалённой заметки, который пакет отдал другой
+                # заметке, остаётся за автором.
+                kept = {
+                    note.slug for note in self.updated.values()
+                } | {note.slug for note in self.created.values()}
+                released = {
+                    note.slug for note in self.deleted.values()
+                } - kept
+                if released:
+                    transaction.on_commit(
+                        partial(NoteSlug.release, self.author.pk, released),
+                        using=using,
+                    )
+            # Массовые запросы не шлют сигналов, кэш сбрасывается вручную.
+            transaction.on_commit(
+                lambda: invalidate_user_pages(self.author.pk)
+            )
+        invalidate_user_pages(self.author.pk)
+
+    def _result(self, index, operation):
+        if index in self.errors:
+            return {'status': 'error', 'errors': self.errors[index]}
+        if index in self.conflicts:
+            return {
+                'status': 'conflict',
+                'note': self.originals[self.conflicts[index]],
+            }
+        if self.errors or self.conflicts:
+            return {'status': 'skipped'}
+        if operation['op'] == DELETE:
+            return {'status': 'deleted', 'id': operation['id']}
+        note = self.created.get(index) or self.notes[operation['id']]
+        return {'status': f'{operation["op"]}d', 'note': note_as_dict(note)}
+
+    def run(self):
+        """
+        Выполняет пакет и возвращает результаты операций по порядку.
+
+        При ошибках проверки у ошибочных операций статус «error», у
+        операций с устаревшей версией — «conflict» и текущая заметка, у
+        остальных — «skipped»; в БД ничего не меняется.
+        """
+        self._load()
+        self._check()
+        if not self.errors and not self.conflicts:
+            self._allocate_slugs()
+            try:
+                self._write()
+            except IntegrityError:
+                raise BatchConflict(
+                    'Пакет конфликтует с параллельными изменениями, '
+                    'повторите запрос.'
+                )
+        return [
+            self._result(index, operation)
+            for index, operation in enumerate(self.operations)
+        ]
@@ -0,0 +1,491 @@
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .importer import import_notes
+from .models import Job, Note
+from .pagination import NEXT, encode_cursor
+
+DEFAULT_PREFIX = 'bench'
+DEFAULT_PASSWORD = 'bench-password-42'
+PERCENTILES = (50, 95, 99)
+
+WORDS = (
+    'заметка', 'план', 'идея', 'список', 'покупки', 'встреча', 'отчёт',
+    'проект', 'задача', 'книга', 'фильм', 'рецепт', 'поездка', 'код',
+    'django', 'python', 'sqlite', 'cache', 'index', 'query', 'release',
+    'draft', 'meeting', 'todo', 'backlog', 'review', 'deploy', 'bug',
+)
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _records(rng, username, start, count):
+    for number in range(start, start + count):
+        yield {
+            'title': _sentence(rng, rng.randint(2, 5)).capitalize(),
+            'text': _sentence(rng, rng.randint(20, 120)),
+            'slug': f'{username}-{number}',
+        }
+
+
+def seed_notes(users, notes_per_user, prefix=DEFAULT_PREFIX,
+               password=DEFAULT_PASSWORD, seed=0):
+    """
+    Создаёт пользователей ``{prefix}-0`` … и добавляет каждому заметки.
+
+    Пароль хэшируется один раз на всех, пользователи и заметки пишутся
+    массово, заметки — через пакетный импорт с явными slug. Повторный
+    запуск не создаёт существующих пользователей заново, а дописывает
+    им ещё ``notes_per_user`` заметок. Возвращает список авторов.
+    """
+    User = get_user_model()
+    usernames = [f'{prefix}-{number}' for number in range(users)]
+    existing = set(
+        User.objects.filter(username__in=usernames)
+        .values_list('username', flat=True)
+    )
+    password_hash = make_password(password)
+    User.objects.bulk_create(
+        User(username=username, password=password_hash)
+        for username in usernames if username not in existing
+    )
+    authors = list(User.objects.filter(username__in=usernames).order_by('id'))
+    rng = random.Random(seed)
+    for author in authors:
+        start = Note.objects.for_author(author).count()
+        import_notes(
+            author, _records(rng, author.username, start, notes_per_user)
+        )
+    return authors
+
+
+class WorkerContext:
+    """Данные одного потока нагрузки: пользователь, клиент и его заметки."""
+
+    def __init__(self, number, user, password):
+        self.number = number
+        self.user = user
+        self.password = password
+        self.client = Client()
+        self.notes = list(
+            Note.objects.for_author(user)
+            .order_by('id').values_list('id', 'slug')[:1000]
+        )
+        if not self.notes:
+            raise ValueError(f'У пользователя {user} нет заметок.')
+        self.job_id = None
+
+    def note(self, index):
+        return self.notes[index % len(self.notes)]
+
+    def slug(self, index):
+        return self.note(index)[1]
+
+
+class Route:
+    """
+    Маршрут под нагрузкой.
+
+    ``build(context, index)`` готовит запрос вне замера времени и
+    возвращает пару (url, data); в нём же делается подготовка вроде
+    создания заметки под удаление или входа пользователя.
+    """
+
+    def __init__(self, name, build, method='get', expected=200,
+                 anonymous=False, content_type=None):
+        self.name = name
+        self.build = build
+        self.method = method
+        self.expected = expected
+        self.anonymous = anonymous
+        self.content_type = content_type
+
+    def request(self, context, index):
+        url, data = self.build(context, index)
+        kwargs = {'content_type': self.content_type} if (
+            self.content_type
+        ) else {}
+        queries = CaptureQueriesContext(connection)
+        started = time.perf_counter()
+        with queries:
+            response = getattr(context.client, self.method)(
+                url, data, **kwargs
+            )
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+        elapsed = time.perf_counter() - started
+        return elapsed, len(queries), response.status_code == self.expected
+
+
+def _url(name, *args):
+    return lambda context, index: (reverse(name, args=args), None)
+
+
+def _slug_url(name):
+    return lambda context, index: (
+        reverse(name, args=(context.slug(index),)), None
+    )
+
+
+def _list_deep(context, index):
+    note_id, _ = context.notes[len(context.notes) // 2]
+    return reverse('notes:list'), {'cursor': encode_cursor(NEXT, note_id)}
+
+
+def _add(context, index):
+    return reverse('notes:add'), {
+        'title': f'Bench {context.number} {index}', 'text': 'Новый текст',
+    }
+
+
+def _edit(context, index):
+    note_id, slug = context.note(index)
+    # Правку отправляют поверх текущей версии, как из только что
+    # открытой формы, иначе каждая вторая правка была бы конфликтом.
+    version = Note.objects.for_author(context.user).values_list(
+        'version', flat=True
+    ).get(pk=note_id)
+    return reverse('notes:edit', args=(slug,)), {
+        'title': f'Edited {index}', 'text': 'Правка', 'slug': slug,
+        'version': version,
+    }
+
+
+def _delete(context, index):
+    victim = Note.objects.create(
+        title=f'Victim {context.number} {index}', text='x',
+        author=context.user,
+    )
+    return reverse('notes:delete', args=(victim.slug,)), None
+
+
+def _restore(context, index):
+    victim = Note.objects.create(
+        title=f'Trashed {context.number} {index}', text='x',
+        author=context.user,
+    )
+    Note.objects.trash_owned(context.user, victim.slug)
+    return reverse('notes:restore', args=(victim.pk,)), None
+
+
+def _import(context, index):
+    # Задача импорта только ставится в очередь; если её потом выполнят
+    # обработчики, автор получит одну небольшую заметку.
+    record = {'title': f'Imported {context.number} {index}', 'text': 'x'}
+    return reverse('notes:import'), {'file': SimpleUploadedFile(
+        'notes.jsonl', json.dumps(record).encode()
+    )}
+
+
+def _job(context, index):
+    if context.job_id is None:
+        # Завершённая задача: обработчики её не возьмут.
+        context.job_id = Job.objects.create(
+            kind='export', user=context.user, status=Job.Status.DONE,
+            max_attempts=1, result={'count': 0},
+            finished_at=timezone.now(),
+        ).pk
+    return reverse('notes:job', args=(context.job_id,)), None
+
+
+def _sync_recent(context, index):
+    # Обычный клиент синхронизации отстал на несколько изменений.
+    last = Note.objects.for_author(context.user, trashed=None).aggregate(
+        last=Max('change_seq')
+    )['last'] or 0
+    return reverse('notes:sync'), {'token': max(last - 20, 0), 'limit': 100}
+
+
+def _batch(context, index):
+    operations = [
+        {'op': 'update', 'id': context.note(index + shift)[0], 'text': 'b'}
+        for shift in range(10)
+    ]
+    return reverse('notes:batch'), json.dumps({'operations': operations})
+
+
+def _login(context, index):
+    return reverse('users:login'), {
+        'username': context.user.username, 'password': context.password,
+    }
+
+
+def _logout(context, index):
+    context.client.force_login(context.user)
+    return reverse('users:logout'), None
+
+
+def _signup(context, index):
+    username = f'{context.user.username}-s{context.number}-{index}'
+    get_user_model().objects.filter(username=username).delete()
+    password = f'Signup-{username}-pass'
+    return reverse('users:signup'), {
+        'username': username, 'password1': password, 'password2': password,
+    }
+
+
+ROUTES = (
+    Route('home', _url('notes:home')),
+    Route('list', _url('notes:list')),
+    Route('list-deep', _list_deep),
+    Route('detail', _slug_url('notes:detail')),
+    Route('search', lambda context, index: (
+        reverse('notes:search'), {'q': WORDS[index % len(WORDS)]}
+    )),
+    Route('export', lambda context, index: (
+        reverse('notes:export'), {'format': 'jsonl'}
+    )),
+    Route('add-form', _url('notes:add')),
+    Route('add', _add, method='post', expected=302),
+    Route('edit-form', _slug_url('notes:edit')),
+    Route('edit', _edit, method='post', expected=302),
+    Route('delete-form', _slug_url('notes:delete')),
+    Route('delete', _delete, method='post', expected=302),
+    Route('success', _url('notes:success')),
+    Route('trash', _url('notes:trash')),
+    Route('restore', _restore, method='post', expected=302),
+    Route('batch', _batch, method='post',
+          content_type='application/json'),
+    Route('import', _import, method='post', expected=202),
+    Route('job', _job),
+    Route('sync', lambda context, index: (
+        reverse('notes:sync'), {'limit': 100}
+    )),
+    Route('sync-recent', _sync_recent),
+    Route('login-form', _url('users:login'), anonymous=True),
+    Route('login', _login, method='post', expected=302, anonymous=True),
+    Route('logout', _logout, method='post'),
+    Route('signup-form', _url('users:signup'), anonymous=True),
+    Route('signup', _signup, method='post', expected=302, anonymous=True),
+)
+MIXED_READ = Route('read', _slug_url('notes:detail'))
+MIXED_WRITE = Route('write', _edit, method='post', expected=302)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга; ``values`` отсортированы."""
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def _run_worker(route, number, user, password, requests, warmup):
+    context = WorkerContext(number, user, password)
+    if not route.anonymous:
+        context.client.force_login(user)
+    for index in range(warmup):
+        route.request(context, -1 - index)
+    return [route.request(context, index) for index in range(requests)]
+
+
+def _run_in_thread(*args):
+    try:
+        return _run_worker(*args)
+    finally:
+        # Соединения с БД у каждого потока свои.
+        connection.close()
+
+
+def benchmark_route(route, users, concurrency, requests, password,
+                    warmup=1):
+    """
+    Гоняет маршрут ``concurrency`` потоками и возвращает сводку.
+
+    Каждый поток делает ``requests`` замеренных запросов своим клиентом
+    от имени своего пользователя. При ``concurrency == 1`` нагрузка идёт
+    в текущем потоке.
+    """
+    jobs = [
+        (route, number, users[number % len(users)], password,
+         requests, warmup)
+        for number in range(concurrency)
+    ]
+    started = time.perf_counter()
+    if concurrency == 1:
+        samples = _run_worker(*jobs[0])
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = [
+                sample
+                for result in executor.map(lambda job: _run_in_thread(*job),
+                                           jobs)
+                for sample in result
+            ]
+    return summarize(samples, time.perf_counter() - started)
+
+
+def summarize(samples, wall):
+    """Сводка по замерам (время, число запросов, успех) за ``wall`` секунд."""
+    timings = sorted(elapsed for elapsed, _, _ in samples)
+    queries = [count for _, count, _ in samples]
+    summary = {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'rps': round(len(samples) / wall, 1) if wall else 0.0,
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = round(
+            percentile(timings, percent) * 1000, 2
+        )
+    return summary
+
+
+def _run_mixed_worker(number, user, password, requests, write_ratio, seed):
+    context = WorkerContext(number, user, password)
+    context.client.force_login(user)
+    rng = random.Random(seed + number)
+    samples = {MIXED_READ.name: [], MIXED_WRITE.name: []}
+    for index in range(requests):
+        route = MIXED_WRITE if rng.random() < write_ratio else MIXED_READ
+        started = time.perf_counter()
+        try:
+            sample = route.request(context, index)
+        except OperationalError:
+            # database is locked: писатель не дождался блокировки.
+            sample = (time.perf_counter() - started, 0, False)
+        samples[route.name].append(sample)
+    return samples
+
+
+def _run_mixed_in_thread(*args):
+    try:
+        return _run_mixed_worker(*args)
+    finally:
+        connection.close()
+
+
+def run_mixed_load(users, concurrency, requests, write_ratio=0.2,
+                   password=DEFAULT_PASSWORD, seed=0):
+    """
+    Смешанная нагрузка: чтения и правки заметок вперемешку.
+
+    Каждый из ``concurrency`` потоков делает ``requests`` запросов, доля
+    правок — ``write_ratio``. Возвращает сводки чтений и записей и общую
+    пропускную способность: так видно, мешают ли писатели читателям.
+    """
+    jobs = [
+        (number, users[number % len(users)], password, requests,
+         write_ratio, seed)
+        for number in range(concurrency)
+    ]
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [_run_mixed_worker(*jobs[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(
+                lambda job: _run_mixed_in_thread(*job), jobs
+            ))
+    wall = time.perf_counter() - started
+    summaries = {}
+    for name in (MIXED_READ.name, MIXED_WRITE.name):
+        samples = [
+            sample for result in results for sample in result[name]
+        ]
+        if samples:
+            summaries[name] = summarize(samples, wall)
+    summaries['total_rps'] = round(
+        sum(summary['requests'] for summary in summaries.values()) / wall, 1
+    ) if wall else 0.0
+    return summaries
+
+
+@contextmanager
+def sqlite_profile(name):
+    """
+    Временно включает профиль SQLite ``tuned`` или ``default``.
+
+    Меняет настройки соединений со всеми базами SQLite и
+    NOTES_SQLITE_TUNING, пока открыт контекст. Режим журнала хранится в
+    файле базы, поэтому профиль ``default`` явно возвращает
+    journal_mode=DELETE, а ``tuned`` оставляет базы в WAL.
+    """
+    databases = [
+        database for database in connections.all()
+        if database.vendor == 'sqlite'
+    ]
+    saved = [
+        {
+            key: database.settings_dict[key]
+            for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')
+        }
+        for database in databases
+    ]
+    tuned = name == 'tuned'
+    for database in databases:
+        database.close()
+        if tuned:
+            database.settings_dict.update(settings.NOTES_SQLITE_CONNECTION)
+        else:
+            database.settings_dict.update(
+                CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False, OPTIONS={}
+            )
+    try:
+        with override_settings(NOTES_SQLITE_TUNING=tuned):
+            if not tuned:
+                for database in databases:
+                    with database.cursor() as cursor:
+                        cursor.execute('PRAGMA journal_mode = DELETE')
+            yield
+    finally:
+        for database, settings_dict in zip(databases, saved):
+            database.close()
+            database.settings_dict.update(settings_dict)
+
+
+def run_benchmark(routes, users, concurrency, requests,
+                  password=DEFAULT_PASSWORD, warmup=1):
+    return {
+        route.name: benchmark_route(
+            route, users, concurrency, requests, password, warmup
+        )
+        for route in routes
+    }
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Сравнивает прогон с базовым и возвращает описания регрессий.
+
+    Регрессия — p95 хуже базового больше чем в ``1 + threshold`` раз,
+    рост среднего числа SQL-запросов или появление ошибок.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f'{name}: p95 {base["p95_ms"]} → {current["p95_ms"]} мс'
+            )
+        if current['queries_mean'] > base['queries_mean'] + 0.5:
+            regressions.append(
+                f'{name}: SQL-запросов {base["queries_mean"]} → '
+                f'{current["queries_mean"]}'
+            )
+        if current['errors'] > base['errors']:
+            regressions.append(
+                f'{name}: ошибок {base["errors"]} → {current["errors"]}'
+            )
+    return regressions
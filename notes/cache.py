@@ -0,0 +1,74 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _generation_key(user_id):
+    return f'notes:generation:{user_id}'
+
+
+def user_generation(user_id):
+    """
+    Текущее поколение кэша страниц пользователя.
+
+    Поколение входит в ключи всех страниц пользователя, поэтому смена
+    поколения разом делает их недоступными. Поколение случайное, а не
+    счётчик, чтобы после потери записи в кэше ключи не совпали со старыми.
+    """
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_user_pages(user_id):
+    """Сбрасывает все закэшированные страницы пользователя."""
+    cache.set(_generation_key(user_id), uuid4().hex, None)
+
+
+async def auser_generation(user_id):
+    """Асинхронный вариант user_generation()."""
+    key = _generation_key(user_id)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, uuid4().hex, None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def _page_key(user_id, generation, parts):
+    return ':'.join(('notes:page', str(user_id), generation, *parts))
+
+
+def get_or_compute(user_id, parts, compute):
+    """
+    Возвращает значение из кэша страниц пользователя или вычисляет его.
+
+    ``parts`` уточняют страницу внутри пользователя: имя представления,
+    slug, курсор и т.п. Исключения из ``compute`` (например, Http404)
+    пробрасываются и ничего не кэшируют.
+    """
+    key = _page_key(user_id, user_generation(user_id), parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.NOTES_PAGE_CACHE_TIMEOUT)
+    return value
+
+
+async def aget_or_compute(user_id, parts, compute):
+    """
+    Асинхронный вариант get_or_compute: ``compute`` возвращает корутину.
+
+    Кэш опрашивается async-методами: файловый или сетевой кэш не держит
+    цикл событий, пока ждёт ответа.
+    """
+    key = _page_key(user_id, await auser_generation(user_id), parts)
+    value = await cache.aget(key)
+    if value is None:
+        value = await compute()
+        await cache.aset(key, value, settings.NOTES_PAGE_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+})
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Запрещает кэш, свой у каждого процесса, вне режима отладки.
+
+    Страницы заметок сбрасываются сменой поколения пользователя в кэше:
+    с LocMemCache правка в одном процессе не сбросит страницы в других,
+    и они будут отдавать устаревшие данные до истечения таймаута.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'Кэш {backend} не общий для процессов: сброс кэша страниц '
+        'заметок не дойдёт до других процессов.',
+        hint='Укажите в CACHES общий бэкенд: FileBasedCache, Redis или '
+             'Memcached; LocMemCache годится только при DEBUG = True.',
+        id='notes.E001',
+    )]
@@ -0,0 +1,169 @@
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+# Признак сжатого текста в начале BLOB: NUL не встречается в начале
+# обычного текста, следом идут алгоритм и версия формата.
+ZLIB_MARKER = b'\x00zl1'
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(text, threshold):
+    """
+    Сжимает текст длиннее ``threshold`` байт в BLOB с маркером формата.
+
+    Короткий текст, а также текст, который не сжался, возвращается как
+    есть и хранится обычной строкой.
+    """
+    raw = text.encode()
+    if len(raw) < threshold:
+        return text
+    packed = ZLIB_MARKER + zlib.compress(raw, COMPRESSION_LEVEL)
+    return packed if len(packed) < len(raw) else text
+
+
+def decompress_text(value):
+    """Возвращает исходный текст для значения колонки в любом формате."""
+    if isinstance(value, CompressedText):
+        value = value.data
+    if isinstance(value, bytes):
+        if value.startswith(ZLIB_MARKER):
+            return zlib.decompress(value[len(ZLIB_MARKER):]).decode()
+        return value.decode()
+    return value
+
+
+class CompressedText:
+    """Сжатое значение из БД, которое ещё не понадобилось распаковывать."""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __getstate__(self):
+        return self.data
+
+    def __setstate__(self, state):
+        self.data = state
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Распаковывает текст при первом обращении и запоминает результат."""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = instance.__dict__[self.field.attname] = (
+                decompress_text(value)
+            )
+        return value
+
+    def __set__(self, instance, value):
+        # Без __set__ значение из __dict__ перекрыло бы __get__.
+        instance.__dict__[self.field.attname] = value
+
+
+@lru_cache(maxsize=None)
+def decompressing_lookup(lookup_class):
+    """
+    Лукап по содержимому, сравнивающий в SQLite распакованный текст.
+
+    Сжатая строка хранится BLOB-ом, и ``text__icontains`` или точное
+    сравнение без распаковки молча пропустили бы её. Такой лукап читает
+    каждую строку через notes_text(), то есть всегда полным проходом.
+    """
+    class DecompressingLookup(lookup_class):
+
+        def process_lhs(self, compiler, connection, lhs=None):
+            sql, params = super().process_lhs(compiler, connection, lhs)
+            if connection.vendor == 'sqlite':
+                sql = f'notes_text({sql})'
+            return sql, params
+
+    return DecompressingLookup
+
+
+class CompressedTextField(models.TextField):
+    """
+    TextField, который хранит длинный текст в SQLite сжатым.
+
+    Текст от NOTES_TEXT_COMPRESS_THRESHOLD байт пишется BLOB-ом zlib с
+    маркером формата в ту же колонку, короткий — обычной строкой. Модель
+    получает сжатое значение как есть и распаковывает его только при
+    обращении к атрибуту. Лукапы по содержимому сравнивают распакованный
+    текст через SQL-функцию notes_text(), поэтому, как и триггеры поиска,
+    работают только в соединениях Django. Для других СУБД поле ведёт себя
+    как TextField.
+    """
+    descriptor_class = CompressedTextDescriptor
+
+    def get_lookup(self, lookup_name):
+        lookup = super().get_lookup(lookup_name)
+        if lookup is None or lookup_name == 'isnull':
+            return lookup
+        return decompressing_lookup(lookup)
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, bytes):
+            return CompressedText(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, CompressedText)):
+            return decompress_text(value)
+        return super().to_python(value)
+
+    def get_db_prep_save(self, value, connection):
+        value = super().get_db_prep_save(value, connection)
+        if connection.vendor == 'sqlite' and isinstance(value, str):
+            return compress_text(
+                value, settings.NOTES_TEXT_COMPRESS_THRESHOLD
+            )
+        return value
+
+
+def _decode_row(row):
+    if isinstance(row, CompressedText):
+        return decompress_text(row)
+    if isinstance(row, dict):
+        return {key: _decode_row(value) for key, value in row.items()}
+    if isinstance(row, tuple) and any(
+        isinstance(value, CompressedText) for value in row
+    ):
+        values = [_decode_row(value) for value in row]
+        return row._make(values) if hasattr(row, '_make') else tuple(values)
+    return row
+
+
+@lru_cache(maxsize=None)
+def decompressing(iterable_class):
+    """
+    Итератор values()/values_list(), отдающий текст строками.
+
+    Там текст запрошен явно, поэтому распаковывается сразу.
+    """
+    class DecompressingIterable(iterable_class):
+
+        def __iter__(self):
+            return map(_decode_row, super().__iter__())
+
+    return DecompressingIterable
+
+
+def register_sql_function(sender, connection, **kwargs):
+    """
+    Регистрирует в SQLite функцию notes_text() для триггеров FTS5.
+
+    Без неё индекс полнотекстового поиска видел бы сжатые байты. Другие
+    клиенты SQLite этой функции не знают, и запись в notes_note из них
+    падает на триггерах поиска (см. notes.search).
+    """
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'notes_text', 1, decompress_text, deterministic=True
+        )
@@ -0,0 +1,141 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.middleware.csrf import get_token
+
+from .cache import aget_or_compute, get_or_compute
+from .models import Note
+from .rendering import RENDERER_VERSION
+
+
+def _note_state_query(user, slug):
+    return (
+        Note.objects.for_author(user).filter(slug=slug)
+        .values_list('id', 'version')
+    )
+
+
+def _list_state_query(user):
+    return Note.objects.for_author(user)
+
+
+# Номер изменения выдаётся и при переносе в корзину и обратно, а время
+# правки при этом не меняется; число заметок ловит уход из списка.
+LIST_STATE = {'count': Count('id'), 'last': Max('change_seq')}
+
+
+def _memoize(request, parts, compute):
+    """
+    Считает состояние один раз на запрос: заметку для страницы
+    просмотра спрашивают и валидатор, и само представление. Между
+    запросами значение живёт в кэше страниц пользователя и сбрасывается
+    вместе с ним.
+    """
+    validators = request.__dict__.setdefault('_note_validators', {})
+    if parts not in validators:
+        validators[parts] = get_or_compute(request.user.pk, parts, compute)
+    return validators[parts]
+
+
+def _detail_note_query(user, slug):
+    note = (
+        Note.objects.for_author(user).filter(slug=slug)
+        .defer('text').first()
+    )
+    return note and note.ensure_html()
+
+
+def detail_note(request, slug):
+    """
+    Заметка для страницы просмотра или None, если её нет.
+
+    Одна выборка служит и валидаторам, и самой странице, поэтому
+    просмотр с холодным кэшем стоит одного запроса к notes_note.
+    """
+    return _memoize(
+        request, ('detail', str(RENDERER_VERSION), slug),
+        lambda: _detail_note_query(request.user, slug),
+    )
+
+
+def _note_state(request, slug):
+    note = detail_note(request, slug)
+    return note and (note.id, note.version)
+
+
+def _list_state(request):
+    return _memoize(
+        request, ('list-state',),
+        lambda: _list_state_query(request.user).aggregate(**LIST_STATE),
+    )
+
+
+def _csrf_tag(request):
+    """
+    Отпечаток CSRF-секрета, которым подписаны формы на странице.
+
+    Секрет меняется при входе, поэтому после повторного входа старая
+    страница с мёртвым токеном не подтвердится ответом 304.
+    """
+    get_token(request)
+    secret = request.META['CSRF_COOKIE']
+    return hashlib.sha1(secret.encode()).hexdigest()[:16]
+
+
+def _detail_etag(request, state):
+    if state is None:
+        return None
+    note_id, version = state
+    return (
+        f'W/"{request.user.pk}-{note_id}-{version}-r{RENDERER_VERSION}-'
+        f'{_csrf_tag(request)}"'
+    )
+
+
+def _list_etag(request, state):
+    raw = ':'.join((
+        str(request.user.pk), str(state['count']), str(state['last']),
+        request.GET.get('cursor', ''), _csrf_tag(request),
+    ))
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def detail_etag(request, slug, **kwargs):
+    """
+    Слабый ETag заметки: меняется с её версией, версией рендерера и
+    CSRF-секретом сессии.
+
+    Страница содержит CSRF-токен, поэтому ETag слабый: одинаковы только
+    данные заметки. Last-Modified не отдаётся: время правки не знает о
+    токене и подтвердило бы страницу с токеном прежней сессии.
+    """
+    return _detail_etag(request, _note_state(request, slug))
+
+
+def list_etag(request, **kwargs):
+    """
+    Слабый ETag списка заметок из одного агрегатного запроса.
+
+    Число заметок ловит уход заметки из списка, наибольший номер
+    изменения — создание, правку и возвращение из корзины; курсор
+    отличает страницы друг от друга, CSRF-секрет — сессии.
+    """
+    return _list_etag(request, _list_state(request))
+
+
+async def adetail_etag(request, slug):
+    """Тот же ETag заметки для асинхронных представлений."""
+    state = await aget_or_compute(
+        request.user.pk, ('detail-state', slug),
+        lambda: _note_state_query(request.user, slug).afirst(),
+    )
+    return _detail_etag(request, state)
+
+
+async def alist_etag(request):
+    """Тот же ETag списка для асинхронных представлений."""
+    state = await aget_or_compute(
+        request.user.pk, ('list-state',),
+        lambda: _list_state_query(request.user).aaggregate(**LIST_STATE),
+    )
+    return _list_etag(request, state)
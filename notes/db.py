@@ -0,0 +1,22 @@
+from django.conf import settings
+
+from .replicas import replica_aliases
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Ставит новому соединению с SQLite прагмы из NOTES_SQLITE_PRAGMAS.
+
+    Работает, только если включён NOTES_SQLITE_TUNING. Прагмы идут мимо
+    курсора Django и не попадают в журнал запросов; journal_mode=WAL
+    запоминается в файле базы, остальные действуют на это соединение.
+    Реплики открыты только для чтения и прагмы не получают.
+    """
+    if (
+        connection.vendor != 'sqlite'
+        or not settings.NOTES_SQLITE_TUNING
+        or connection.alias in replica_aliases()
+    ):
+        return
+    for name, value in settings.NOTES_SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,103 @@
+import csv
+import json
+import zipfile
+
+from .models import Note
+
+# Сколько строк забирать из БД за раз при потоковой выгрузке.
+CHUNK_SIZE = 2000
+# Порог, после которого накопленные байты отдаются потребителю.
+BUFFER_SIZE = 64 * 1024
+
+FIELDS = ('id', 'title', 'slug', 'text', 'updated_at')
+
+
+class _Buffer:
+    """Файлоподобный приёмник, из которого записанное забирают кусками."""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def iter_rows(author, chunk_size=CHUNK_SIZE):
+    """Кортежи FIELDS заметок автора, читаемые из БД порциями."""
+    return (
+        Note.objects.for_author(author)
+        .order_by('id')
+        .values_list(*FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _as_dict(row):
+    note = dict(zip(FIELDS, row))
+    note['updated_at'] = note['updated_at'].isoformat()
+    return note
+
+
+def export_jsonl(rows):
+    buffer = _Buffer()
+    for row in rows:
+        buffer.write(json.dumps(_as_dict(row), ensure_ascii=False) + '\n')
+        if buffer.size >= BUFFER_SIZE:
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def export_csv(rows):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow(_as_dict(row).values())
+        if buffer.size >= BUFFER_SIZE:
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def export_markdown_zip(rows):
+    """
+    Zip-архив с заметкой в отдельном Markdown-файле.
+
+    Архив пишется в поток без перемотки: zipfile сам переходит на
+    дескрипторы данных, если у приёмника нет ``seek``/``tell``.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for note_id, title, slug, text, _ in rows:
+            archive.writestr(
+                f'{slug or note_id}.md', f'# {title}\n\n{text}\n'
+            )
+            if buffer.size >= BUFFER_SIZE:
+                yield buffer.pop()
+    yield buffer.pop()
+
+
+EXPORT_FORMATS = {
+    'jsonl': (export_jsonl, 'application/x-ndjson', 'jsonl'),
+    'csv': (export_csv, 'text/csv', 'csv'),
+    'md': (export_markdown_zip, 'application/zip', 'zip'),
+}
+
+
+def export_notes(author, export_format, chunk_size=CHUNK_SIZE):
+    """Генератор байтов выгрузки заметок автора в заданном формате."""
+    export, _, _ = EXPORT_FORMATS[export_format]
+    return export(iter_rows(author, chunk_size))
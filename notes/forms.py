@@ -1,29 +1,118 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 
 from .models import Note
+from .slugs import is_slug_conflict
+from .text import text_diff
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
 
 class NoteForm(forms.ModelForm):
-    """Форма для создания или обновления заметки."""
+    """
+    Форма для создания или обновления заметки.
+
+    Занятость slug проверяет уникальный индекс при записи в save_unique(),
+    а не отдельный запрос перед ней. ``slug_owners`` — необязательный
+    словарь «slug → владелец» для пакетной проверки без записи: если он
+    передан, занятость slug проверяется по нему ещё при валидации.
+
+    При правке скрытое поле ``version`` хранит версию, которую видел
+    пользователь: заметка сохранится, только если её не изменили с тех пор.
+    Поле обязательно: правка без версии отклоняется, а не перезаписывает
+    заметку молча.
+    """
+    version = forms.IntegerField(widget=forms.HiddenInput, min_value=1)
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, slug_owners=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slug_owners = slug_owners
+        if self.instance._state.adding:
+            del self.fields['version']
+        else:
+            self.fields['version'].initial = self.instance.version
+
+    def slug_taken(self, slug):
+        if self.slug_owners is None:
+            return False
+        return self.slug_owners.get(slug, self.instance.pk) != (
+            self.instance.pk
+        )
+
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
+        """
+        Обрабатывает случай, если slug не уникален.
+
+        Пустой slug не проверяется: свободный адрес по заголовку
+        подберёт Note.save().
+        """
         cleaned_data = super().clean()
         slug = cleaned_data.get('slug')
         if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
+            return slug
+        if self.slug_taken(slug):
             raise ValidationError(slug + WARNING)
         return slug
+
+    def validate_unique(self):
+        # Единственное уникальное поле — slug: его проверяют clean_slug
+        # по словарю или уникальный индекс в save_unique().
+        pass
+
+    def save(self, commit=True):
+        """
+        У существующей заметки записывает только изменённые поля.
+
+        Если заметку изменили после того, как пользователь открыл форму,
+        поднимается VersionConflict.
+        """
+        if not commit or self.instance._state.adding:
+            return super().save(commit)
+        self.instance.version = self.cleaned_data['version']
+        changed = [
+            name for name in self.changed_data if name in self._meta.fields
+        ]
+        if changed:
+            self.instance.save(update_fields=changed)
+        return self.instance
+
+    def save_unique(self):
+        """
+        Сохраняет заметку; занятый slug становится ошибкой формы.
+
+        Возвращает False, если индекс отверг slug: заметка не сохранена.
+        """
+        slug = self.cleaned_data.get('slug')
+        try:
+            self.save()
+        except IntegrityError as error:
+            if not slug or not is_slug_conflict(error):
+                raise
+            self.add_error('slug', slug + WARNING)
+            return False
+        return True
+
+    def merge(self, current):
+        """
+        Форма с правками пользователя поверх текущей версии заметки.
+
+        Повторная отправка сохранит правки, если заметку снова не
+        изменят; отличия текста показывает шаблон notes/conflict.html.
+        """
+        data = self.data.copy()
+        data['version'] = current.version
+        return type(self)(data, instance=current)
+
+
+def conflict_context(form, current):
+    """Контекст страницы слияния для формы, которая проиграла гонку правок."""
+    return {
+        'form': form.merge(current),
+        'note': current,
+        'diff': text_diff(current.text, form.cleaned_data['text']),
+    }
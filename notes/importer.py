@@ -0,0 +1,205 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import IntegrityError, connections, transaction
+
+from .cache import invalidate_user_pages
+from .models import ChangeCounter, Note, NoteSlug
+from .search import bulk_indexing
+from .sharding import shard_for, sharding_enabled
+from .slugs import MAX_ATTEMPTS, is_slug_conflict, transliterate
+
+# Сколько заметок записывать одной транзакцией.
+DEFAULT_BATCH_SIZE = 5000
+# Сколько пропущенных записей перечислять в итогах импорта.
+MAX_REPORTED_ROWS = 100
+
+
+def parse_jsonl(stream):
+    """
+    Читает записи JSONL, пропуская пустые строки.
+
+    Вместо строки, которая не разбирается как JSON, отдаётся ошибка
+    разбора: импорт пропустит такую запись и сообщит её номер.
+    """
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield error
+
+
+def parse_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+IMPORT_FORMATS = {
+    'jsonl': parse_jsonl,
+    'csv': parse_csv,
+}
+
+
+class ImportStats:
+    """
+    Итоги импорта: сколько заметок записано и за какое время.
+
+    ``skipped_rows`` перечисляет первые ``MAX_REPORTED_ROWS`` пропущенных
+    записей парами (номер записи с 1, причина), ``skipped`` считает все.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.skipped = 0
+        self.skipped_rows = []
+
+    def skip(self, row, reason):
+        self.skipped += 1
+        if len(self.skipped_rows) < MAX_REPORTED_ROWS:
+            self.skipped_rows.append((row, reason))
+
+    @property
+    def rate(self):
+        return self.count / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.count} заметок за {self.seconds:.2f} с '
+            f'({self.rate:.0f} заметок/с, пачек: {self.batches}, '
+            f'пропущено: {self.skipped})'
+        )
+
+
+def _batches(records, batch_size):
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        yield batch
+
+
+def _clean_slug(slug):
+    """Приводит slug из файла к виду, который примет поле модели."""
+    max_length = Note._meta.get_field('slug').max_length
+    try:
+        validate_slug(slug)
+    except ValidationError:
+        slug = transliterate(slug)
+    return slug[:max_length]
+
+
+def _build_note(author, record):
+    """
+    Превращает запись в несохранённую заметку, slug пока не проверен.
+
+    Слишком длинный заголовок обрезается, недопустимый slug строится
+    заново транслитерацией. Для непригодной записи бросает ValueError.
+    """
+    if isinstance(record, json.JSONDecodeError):
+        raise ValueError(f'некорректный JSON: {record.msg}')
+    if not isinstance(record, dict):
+        raise ValueError('запись не является объектом')
+    fields = {
+        name: record.get(name) or '' for name in ('title', 'text', 'slug')
+    }
+    for name, value in fields.items():
+        if not isinstance(value, str):
+            raise ValueError(f'поле {name} должно быть строкой')
+    title_field = Note._meta.get_field('title')
+    note = Note(
+        title=(
+            fields['title'][:title_field.max_length]
+            or title_field.get_default()
+        ),
+        text=fields['text'],
+        slug=_clean_slug(fields['slug']),
+        author=author,
+    )
+    note.update_derived_fields()
+    return note
+
+
+def _build_notes(author, batch, stats):
+    """Строит заметки пачки пронумерованных записей, пропуская негодные."""
+    notes = []
+    for row, record in batch:
+        try:
+            notes.append(_build_note(author, record))
+        except ValueError as error:
+            stats.skip(row, str(error))
+    return notes
+
+
+def _resolve_slugs(notes):
+    """
+    Назначает заметкам пачки уникальные slug.
+
+    Пустые slug подбираются по заголовку. Затем все кандидаты пачки
+    сверяются с БД одним запросом, и совпавшие с существующими или
+    друг с другом получают номерной суффикс.
+    """
+    allocator = Note.objects.slug_allocator()
+    bases = [
+        (note, transliterate(note.title)) for note in notes if not note.slug
+    ]
+    allocator.prefetch(base for _, base in bases)
+    for note, base in bases:
+        note.slug = allocator.allocate(base)
+    taken = set(
+        Note.objects.slug_owners({note.slug for note in notes})
+    )
+    used = set()
+    for note in notes:
+        while note.slug in taken or note.slug in used:
+            note.slug = allocator.allocate(note.slug)
+        used.add(note.slug)
+
+
+def import_notes(author, records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Импортирует заметки автора из потока словарей title/text/slug.
+
+    Записи читаются пачками по ``batch_size``, slug пачки разрешаются в
+    памяти, а сама пачка пишется через bulk_create в одной транзакции.
+    Если параллельная запись заняла slug, пачка откатывается и
+    разрешается заново. Негодные записи пропускаются и попадают в
+    ``skipped_rows`` итогов.
+    """
+    stats = ImportStats()
+    started = time.perf_counter()
+    using = shard_for(author)
+    db = connections[using]
+    try:
+        for batch in _batches(enumerate(records, 1), batch_size):
+            notes = _build_notes(author, batch, stats)
+            if not notes:
+                continue
+            for attempt in range(MAX_ATTEMPTS):
+                _resolve_slugs(notes)
+                try:
+                    with transaction.atomic(using=using), bulk_indexing(db):
+                        ChangeCounter.number(notes, using=using)
+                        Note.objects.using(using).bulk_create(notes)
+                        if sharding_enabled():
+                            NoteSlug.claim(notes)
+                    break
+                except IntegrityError as error:
+                    if (
+                        not is_slug_conflict(error)
+                        or attempt == MAX_ATTEMPTS - 1
+                    ):
+                        raise
+                    # Откаченная пачка получит id заново.
+                    for note in notes:
+                        note.pk = None
+            stats.count += len(notes)
+            stats.batches += 1
+    finally:
+        stats.seconds = time.perf_counter() - started
+        if stats.count:
+            invalidate_user_pages(author.pk)
+    return stats
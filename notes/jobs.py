@@ -0,0 +1,199 @@
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+# Сколько раз обработчик пробует забрать задачу, которую из-под него
+# увели другие обработчики, прежде чем считать очередь пустой.
+CLAIM_ATTEMPTS = 5
+
+
+# Вид задачи → (функция, предел попыток или None).
+HANDLERS = {}
+
+
+def job(kind, max_attempts=None):
+    """
+    Регистрирует функцию ``function(task, **params)`` как вид задачи.
+
+    ``task`` — выполняемая задача Job, ``params`` — её параметры из
+    enqueue(). Возвращённое функцией сохраняется в Job.result, поэтому должно
+    сериализоваться в JSON. ``max_attempts`` — предел попыток, если
+    повтор задачи небезопасен или бесполезен; по умолчанию
+    NOTES_JOB_MAX_ATTEMPTS.
+    """
+    def register(function):
+        HANDLERS[kind] = (function, max_attempts)
+        return function
+    return register
+
+
+def enqueue(kind, user=None, **params):
+    """Ставит задачу вида ``kind`` в очередь и возвращает её."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный вид задачи: {kind}.')
+    return Job.objects.create(
+        kind=kind,
+        user=user,
+        params=params,
+        max_attempts=(
+            HANDLERS[kind][1] or settings.NOTES_JOB_MAX_ATTEMPTS
+        ),
+    )
+
+
+def job_file(name):
+    """Путь к файлу задачи (загрузке или результату) в NOTES_JOB_FILES_DIR."""
+    directory = Path(settings.NOTES_JOB_FILES_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / name
+
+
+def claim(worker):
+    """
+    Забирает первую готовую к запуску задачу или возвращает None.
+
+    Задача переходит в running условным UPDATE ... WHERE status =
+    'queued': из двух обработчиков, выбравших одну задачу, её получит
+    только один, второй попробует следующую.
+    """
+    for _ in range(CLAIM_ATTEMPTS):
+        now = timezone.now()
+        job_id = Job.objects.filter(
+            status=Job.Status.QUEUED, run_after__lte=now
+        ).order_by('run_after', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        if Job.objects.filter(pk=job_id, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING, worker=worker, heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        ):
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _finish(job, **fields):
+    # Условие на обработчик: задачу, признанную зависшей и отданную
+    # другому, прежний обработчик уже не трогает.
+    Job.objects.filter(
+        pk=job.pk, status=Job.Status.RUNNING, worker=job.worker
+    ).update(**fields)
+
+
+def run(job):
+    """
+    Выполняет забранную задачу и записывает итог.
+
+    Упавшая задача возвращается в очередь с задержкой
+    NOTES_JOB_RETRY_SECONDS, удваивающейся с каждой попыткой, пока
+    попытки не кончатся; тогда она остаётся в failed с текстом ошибки.
+    """
+    try:
+        function, _ = HANDLERS[job.kind]
+        result = function(job, **job.params)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.NOTES_JOB_RETRY_SECONDS * 2 ** (job.attempts - 1)
+            _finish(
+                job, status=Job.Status.QUEUED, error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            _finish(
+                job, status=Job.Status.FAILED, error=error,
+                finished_at=timezone.now(),
+            )
+        return False
+    _finish(
+        job, status=Job.Status.DONE, result=result, error='',
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def requeue_stale():
+    """
+    Возвращает в очередь задачи, чей обработчик молчит дольше
+    NOTES_JOB_TIMEOUT секунд (процесс упал или был убит).
+
+    Возвращает число таких задач.
+    """
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(
+            seconds=settings.NOTES_JOB_TIMEOUT
+        ),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED, error='Обработчик не ответил.',
+        finished_at=timezone.now(),
+    )
+    return failed + stale.update(
+        status=Job.Status.QUEUED, run_after=timezone.now()
+    )
+
+
+def schedule_periodic():
+    """
+    Ставит периодические задачи из NOTES_PERIODIC_JOBS, чей интервал
+    истёк с постановки прошлой. Возвращает поставленные задачи.
+    """
+    now = timezone.now()
+    return [
+        enqueue(kind)
+        for kind, seconds in settings.NOTES_PERIODIC_JOBS.items()
+        if not Job.objects.filter(
+            kind=kind, created_at__gt=now - timedelta(seconds=seconds)
+        ).exists()
+    ]
+
+
+def work(worker, stop, poll_seconds, drain=False):
+    """
+    Цикл обработчика: забирает и выполняет задачи, пока не задан
+    ``stop``. С ``drain`` выходит, как только очередь опустела, и
+    работает в вызывающем потоке, не трогая его соединения.
+    Возвращает число выполненных задач.
+    """
+    done = 0
+    while not stop.is_set():
+        job = claim(worker)
+        if job is None:
+            if drain:
+                break
+            stop.wait(poll_seconds)
+            continue
+        run(job)
+        done += 1
+        if not drain:
+            close_old_connections()
+    if not drain:
+        # Соединения потока сами не закроются: запросов он не обслуживает.
+        connections.close_all()
+    return done
+
+
+def job_as_dict(task):
+    """Состояние задачи для JSON API; из ошибки — только последняя строка."""
+    return {
+        'id': task.pk,
+        'kind': task.kind,
+        'status': task.status,
+        'progress': task.progress,
+        'total': task.total,
+        'attempts': task.attempts,
+        'max_attempts': task.max_attempts,
+        'result': task.result,
+        'error': task.error.strip().splitlines()[-1] if task.error else '',
+        'created_at': task.created_at.isoformat(),
+        'finished_at': (
+            task.finished_at.isoformat() if task.finished_at else None
+        ),
+    }
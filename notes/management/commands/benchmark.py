@@ -0,0 +1,147 @@
+import json
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notes.benchmark import (
+    DEFAULT_PASSWORD, DEFAULT_PREFIX, ROUTES, find_regressions,
+    run_benchmark, run_mixed_load, sqlite_profile
+)
+from notes.models import Note
+from notes.sharding import note_databases
+
+SQLITE_PROFILES = ('default', 'tuned')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон всех маршрутов заметок и авторизации: '
+        'p50/p95/p99, пропускная способность и число SQL-запросов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX,
+                            help='Префикс пользователей из seed_notes.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Замеренных запросов на поток.')
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument(
+            '--routes',
+            help='Маршруты через запятую: '
+                 + ', '.join(route.name for route in ROUTES),
+        )
+        parser.add_argument(
+            '--mixed', action='store_true',
+            help='Вместо маршрутов по очереди — чтения и правки вперемешку.',
+        )
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Доля правок в смешанной нагрузке.')
+        parser.add_argument(
+            '--sqlite-profile', action='append', choices=SQLITE_PROFILES,
+            help='Прогнать с профилем SQLite (можно несколько раз, чтобы '
+                 'сравнить). default вернёт базе journal_mode=DELETE.',
+        )
+        parser.add_argument('--label', default='',
+                            help='Метка прогона, например хэш коммита.')
+        parser.add_argument('--output', help='Куда сохранить JSON прогона.')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого прогона для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое ухудшение p95 относительно базового, доля.',
+        )
+
+    def handle(self, *args, **options):
+        routes = ROUTES
+        if options['routes']:
+            names = options['routes'].split(',')
+            routes = [route for route in ROUTES if route.name in names]
+            unknown = set(names) - {route.name for route in routes}
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные маршруты: {", ".join(sorted(unknown))}'
+                )
+        # Заметки могут лежать в шардах, а пользователи — в default,
+        # поэтому авторов собирают по каждой базе с заметками отдельно.
+        author_ids = set()
+        for alias in note_databases():
+            author_ids.update(
+                Note.objects.using(alias).values_list('author_id', flat=True)
+                .distinct()
+            )
+        users = list(
+            get_user_model().objects
+            .filter(
+                username__startswith=f'{options["prefix"]}-',
+                pk__in=author_ids,
+            )
+            .order_by('id')[:options['concurrency']]
+        )
+        if not users:
+            raise CommandError(
+                'Нет пользователей с заметками, сначала запустите seed_notes.'
+            )
+        results = {}
+        for profile in options['sqlite_profile'] or [None]:
+            with sqlite_profile(profile) if profile else nullcontext():
+                summaries = self._run(routes, users, options, profile)
+            prefix = f'{profile}/' if profile else ''
+            results.update(
+                (prefix + name, summary)
+                for name, summary in summaries.items()
+            )
+        report = {
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'mixed': options['mixed'],
+            'routes': results,
+        }
+        self._print(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as stream:
+                baseline = json.load(stream)['routes']
+            regressions = find_regressions(
+                results, baseline, options['threshold']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n'
+                    + '\n'.join(regressions)
+                )
+
+    def _run(self, routes, users, options, profile=None):
+        if not options['mixed']:
+            return run_benchmark(
+                routes, users, options['concurrency'], options['requests'],
+                options['password'], options['warmup'],
+            )
+        summaries = run_mixed_load(
+            users, options['concurrency'], options['requests'],
+            options['write_ratio'], options['password'],
+        )
+        total = summaries.pop('total_rps')
+        self.stdout.write(
+            f'Смешанная нагрузка ({profile or "текущий профиль"}): '
+            f'{total} запросов в секунду'
+        )
+        return summaries
+
+    def _print(self, results):
+        columns = ('requests', 'errors', 'rps', 'p50_ms', 'p95_ms',
+                   'p99_ms', 'queries_mean')
+        self.stdout.write(
+            f'{"route":<16}' + ''.join(f'{column:>14}' for column in columns)
+        )
+        for name, summary in results.items():
+            self.stdout.write(f'{name:<16}' + ''.join(
+                f'{summary[column]:>14}' for column in columns
+            ))
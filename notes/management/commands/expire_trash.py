@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.purge import expire_trash
+
+
+class Command(BaseCommand):
+    help = (
+        'Окончательно удаляет заметки, пролежавшие в корзине больше '
+        'NOTES_TRASH_DAYS дней. Запускать периодически, например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.NOTES_PURGE_BATCH_SIZE)
+        parser.add_argument(
+            '--max-lock', type=float,
+            default=settings.NOTES_PURGE_MAX_LOCK_SECONDS,
+            help='Потолок времени одной транзакции удаления, секунды.',
+        )
+
+    def handle(self, batch_size, max_lock, **options):
+        started = time.perf_counter()
+        expired = expire_trash(batch_size, max_lock)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено из корзины: {expired} за '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
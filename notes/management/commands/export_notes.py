@@ -0,0 +1,38 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.export import CHUNK_SIZE, EXPORT_FORMATS, export_notes
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка заметок пользователя в JSONL, CSV или zip.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', dest='export_format', default='jsonl',
+            choices=sorted(EXPORT_FORMATS),
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Путь к файлу выгрузки, «-» — стандартный вывод.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, username, export_format, output, chunk_size, **options):
+        try:
+            author = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден.')
+        chunks = export_notes(author, export_format, chunk_size)
+        if output == '-':
+            self._write(chunks, sys.stdout.buffer)
+        else:
+            with open(output, 'wb') as stream:
+                self._write(chunks, stream)
+
+    def _write(self, chunks, stream):
+        for chunk in chunks:
+            stream.write(chunk)
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.importer import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, import_notes
+
+
+class Command(BaseCommand):
+    help = 'Пакетный импорт заметок пользователя из JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', dest='import_format', choices=sorted(IMPORT_FORMATS),
+            help='Формат файла; по умолчанию берётся из расширения.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE
+        )
+
+    def handle(self, username, path, import_format, batch_size, **options):
+        try:
+            author = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден.')
+        import_format = import_format or Path(path).suffix.lstrip('.')
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        with open(path, newline='', encoding='utf-8') as stream:
+            stats = import_notes(
+                author, IMPORT_FORMATS[import_format](stream), batch_size
+            )
+        self.stdout.write(self.style.SUCCESS(f'Импортировано {stats}'))
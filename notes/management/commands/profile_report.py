@@ -0,0 +1,49 @@
+import io
+import pstats
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит сохранённые профили запросов и печатает самые горячие '
+        'функции по каждому имени URL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'views', nargs='*',
+            help='Имена URL, например notes:detail; по умолчанию все.',
+        )
+        parser.add_argument(
+            '--dir', dest='directory', default=settings.NOTES_PROFILE_DIR
+        )
+        parser.add_argument('--sort', choices=SORT_KEYS,
+                            default='cumulative')
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, views, directory, sort, limit, **options):
+        root = Path(directory)
+        directories = sorted(path for path in root.glob('*') if path.is_dir())
+        if views:
+            wanted = {view.replace(':', '.') for view in views}
+            directories = [
+                path for path in directories if path.name in wanted
+            ]
+        if not directories:
+            raise CommandError(f'В {root} нет подходящих профилей.')
+        for path in directories:
+            files = sorted(path.glob('*.prof'))
+            if not files:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{path.name}: профилей {len(files)}'
+            ))
+            report = io.StringIO()
+            stats = pstats.Stats(*map(str, files), stream=report)
+            stats.strip_dirs().sort_stats(sort).print_stats(limit)
+            self.stdout.write(report.getvalue())
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.middleware import PROFILE_HEADER, make_profile_token
+
+
+class Command(BaseCommand):
+    help = 'Выдаёт подписанный токен для профилирования запросов.'
+
+    def handle(self, **options):
+        self.stderr.write(
+            f'Передайте в заголовке {PROFILE_HEADER}; токен действует '
+            f'{settings.NOTES_PROFILE_TOKEN_MAX_AGE} с.'
+        )
+        self.stdout.write(make_profile_token())
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.purge import purge_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пользователей вместе с заметками пачками короткими '
+        'транзакциями, не запирая базу на всё удаление.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='+')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.NOTES_PURGE_BATCH_SIZE)
+        parser.add_argument(
+            '--max-lock', type=float,
+            default=settings.NOTES_PURGE_MAX_LOCK_SECONDS,
+            help='Потолок времени одной транзакции удаления, секунды.',
+        )
+
+    def handle(self, usernames, batch_size, max_lock, **options):
+        users = dict(
+            get_user_model().objects.filter(username__in=usernames)
+            .values_list('username', 'pk')
+        )
+        missing = sorted(set(usernames) - set(users))
+        if missing:
+            raise CommandError(
+                f'Нет пользователей: {", ".join(missing)}.'
+            )
+        for username in usernames:
+            started = time.perf_counter()
+            deleted = purge_user(users[username], batch_size, max_lock)
+            self.stdout.write(
+                f'{username}: удалено заметок {deleted} за '
+                f'{time.perf_counter() - started:.2f} с'
+            )
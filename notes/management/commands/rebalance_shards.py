@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.rebalance import (
+    DEFAULT_BATCH_SIZE, prune_slug_directory, rebalance, sync_slug_directory
+)
+from notes.sharding import sharding_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит заметки авторов в шарды, выбранные хэшем автора, и '
+        'сверяет каталог slug. Запускать после изменения NOTES_SHARDS; '
+        'пока автор переносится, его заметки видны не целиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, кого нужно перенести.')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить из каталога slug записи удалённых заметок.',
+        )
+
+    def handle(self, batch_size, dry_run, prune, **options):
+        if not sharding_enabled():
+            raise CommandError('Шарды не настроены: NOTES_SHARDS пуст.')
+        if not dry_run:
+            seen = sync_slug_directory(batch_size)
+            self.stdout.write(f'Каталог slug сверен по {seen} заметкам.')
+        moves = rebalance(batch_size, dry_run)
+        for author_id, source, target, moved in moves:
+            suffix = '' if moved is None else f': {moved} заметок'
+            self.stdout.write(
+                f'Автор {author_id}: {source} → {target}{suffix}'
+            )
+        if prune and not dry_run:
+            pruned = prune_slug_directory(batch_size)
+            self.stdout.write(f'Из каталога slug удалено записей: {pruned}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов к переносу: {len(moves)}.'
+        ))
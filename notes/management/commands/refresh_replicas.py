@@ -0,0 +1,46 @@
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def _file_path(name):
+    """Путь к файлу из NAME базы: обычного или URI вида file:...?mode=ro."""
+    name = str(name)
+    if name.startswith('file:'):
+        name = name[len('file:'):].split('?', 1)[0]
+    return Path(name)
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимает копии основных баз SQLite в файлы их реплик из '
+        'NOTES_REPLICAS (VACUUM INTO и атомарная замена файла).'
+    )
+
+    def handle(self, **options):
+        if not settings.NOTES_REPLICAS:
+            raise CommandError('Реплики не настроены: NOTES_REPLICAS пуст.')
+        for primary, replicas in settings.NOTES_REPLICAS.items():
+            connection = connections[primary]
+            if connection.vendor != 'sqlite':
+                raise CommandError(
+                    f'{primary}: копировать умеем только SQLite.'
+                )
+            for replica in replicas:
+                started = time.perf_counter()
+                path = _file_path(connections[replica].settings_dict['NAME'])
+                temporary = path.with_name(path.name + '.tmp')
+                temporary.unlink(missing_ok=True)
+                with connection.cursor() as cursor:
+                    cursor.execute('VACUUM INTO %s', [str(temporary)])
+                # Открытые соединения дочитают старый файл, новые откроют
+                # уже свежую копию.
+                os.replace(temporary, path)
+                self.stdout.write(
+                    f'{primary} → {replica}: {path} за '
+                    f'{time.perf_counter() - started:.2f} с'
+                )
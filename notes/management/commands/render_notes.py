@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes.tasks import RENDER_BATCH_SIZE, render_stale
+
+
+class Command(BaseCommand):
+    help = (
+        'Перерисовывает HTML заметок, отрисованных прежней версией '
+        'рендерера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=RENDER_BATCH_SIZE)
+
+    def handle(self, batch_size, **options):
+        started = time.perf_counter()
+        rendered = render_stale(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перерисовано заметок: {rendered} за '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,70 @@
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notes.jobs import requeue_stale, schedule_periodic, work
+
+# Как часто искать зависшие задачи и ставить периодические, секунды.
+MAINTENANCE_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди пулом потоков. Процессов '
+        'можно запустить несколько: задачу получит только один из них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int,
+                            default=settings.NOTES_JOB_THREADS)
+        parser.add_argument('--poll', type=float,
+                            default=settings.NOTES_JOB_POLL_SECONDS,
+                            help='Пауза при пустой очереди, секунды.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить задачи, уже стоящие в очереди, и выйти.',
+        )
+
+    def maintain(self):
+        requeue_stale()
+        for task in schedule_periodic():
+            self.stdout.write(f'Поставлена задача {task}.')
+
+    def handle(self, threads, poll, once, **options):
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        stop = threading.Event()
+        self.maintain()
+        if once:
+            done = work(name, stop, poll, drain=True)
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено задач: {done}.'
+            ))
+            return
+        self.stdout.write(f'Обработчиков: {threads}. Остановка — Ctrl+C.')
+        with ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='notes-worker'
+        ) as executor:
+            workers = [
+                executor.submit(work, f'{name}:{number}', stop, poll)
+                for number in range(threads)
+            ]
+            try:
+                while not stop.wait(MAINTENANCE_SECONDS):
+                    # Поток, упавший вне задачи (например, без базы),
+                    # останавливает остальные: ошибку покажет result().
+                    if any(worker.done() for worker in workers):
+                        break
+                    self.maintain()
+                    close_old_connections()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                stop.set()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {sum(worker.result() for worker in workers)}.'
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes.benchmark import DEFAULT_PASSWORD, DEFAULT_PREFIX, seed_notes
+
+
+class Command(BaseCommand):
+    help = 'Создаёт синтетических пользователей и заметки для нагрузки.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--notes', type=int, default=1000,
+                            help='Сколько заметок добавить каждому.')
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX,
+                            help='Пользователи получат имена «prefix-N».')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, users, notes, prefix, password, seed, **options):
+        started = time.perf_counter()
+        authors = seed_notes(users, notes, prefix, password, seed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(authors)}, заметок добавлено: '
+            f'{len(authors) * notes} за '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,49 @@
+import json
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.metrics import METRICS, METRICS_HEADER, make_metrics_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает гистограммы Server-Timing по представлениям, '
+        'забирая их с эндпоинта метрик запущенного сервера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000/metrics/',
+            help='Адрес эндпоинта метрик сервера с тем же SECRET_KEY.',
+        )
+        parser.add_argument('--json', dest='as_json', action='store_true',
+                            help='Вывести ответ эндпоинта как есть.')
+
+    def handle(self, url, as_json, **options):
+        try:
+            request = Request(
+                url, headers={METRICS_HEADER: make_metrics_token()}
+            )
+            with urlopen(request, timeout=10) as response:
+                raw = response.read().decode()
+        except URLError as error:
+            raise CommandError(f'Не удалось получить метрики: {error}')
+        if as_json:
+            self.stdout.write(raw)
+            return
+        self._print(json.loads(raw))
+
+    def _print(self, views):
+        self.stdout.write(f'{"view":<24}{"metric":>8}{"count":>8}'
+                          f'{"p50":>8}{"p95":>8}{"p99":>8}')
+        for view, metrics in sorted(views.items()):
+            for name in METRICS:
+                histogram = metrics[name]
+                self.stdout.write(
+                    f'{view:<24}{name:>8}{histogram["count"]:>8}' + ''.join(
+                        f'{str(histogram[p]):>8}'
+                        for p in ('p50', 'p95', 'p99')
+                    )
+                )
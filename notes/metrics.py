@@ -0,0 +1,123 @@
+import threading
+from bisect import bisect_left
+
+from django.core import signing
+
+# Верхние границы корзин гистограмм времени, мс.
+TIME_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Верхние границы корзин гистограммы числа SQL-запросов.
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Заголовок с подписанным токеном, по которому эндпоинт метрик отвечает
+# без входа под staff; токен подписывает manage.py server_metrics.
+METRICS_HEADER = 'X-Metrics-Token'
+METRICS_SALT = 'notes.metrics'
+METRICS_TOKEN_MAX_AGE = 60
+
+METRICS = {
+    'total': TIME_BUCKETS,
+    'db': TIME_BUCKETS,
+    'tpl': TIME_BUCKETS,
+    'queries': QUERY_BUCKETS,
+}
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и оценкой перцентилей."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent):
+        """
+        Верхняя граница корзины, в которую попал перцентиль.
+
+        None, если наблюдений нет или перцентиль за последней границей.
+        """
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for bound, count in zip((*self.buckets, None), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'buckets': {
+                str(bound if bound is not None else '+Inf'): count
+                for bound, count in zip((*self.buckets, None), self.counts)
+            },
+            **{
+                f'p{percent}': self.percentile(percent)
+                for percent in (50, 95, 99)
+            },
+        }
+
+
+class MetricsRegistry:
+    """
+    Гистограммы метрик запросов по представлениям в памяти процесса.
+
+    У каждого процесса сервера своя копия: эндпоинт метрик показывает
+    только процесс, который обработал запрос к нему.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, values):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = {
+                    name: Histogram(buckets)
+                    for name, buckets in METRICS.items()
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {
+                    name: histogram.as_dict()
+                    for name, histogram in histograms.items()
+                }
+                for view, histograms in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def make_metrics_token():
+    """Подписанный токен для заголовка X-Metrics-Token."""
+    return signing.TimestampSigner(salt=METRICS_SALT).sign('metrics')
+
+
+def metrics_token_valid(token):
+    try:
+        signing.TimestampSigner(salt=METRICS_SALT).unsign(
+            token, max_age=METRICS_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
@@ -0,0 +1,277 @@
+import cProfile
+import time
+import uuid
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import registry
+from .replicas import PIN_COOKIE, primary_reads
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_PARAM = '_profile'
+PROFILE_SALT = 'notes.profile'
+
+
+class RequestTiming:
+    """Счётчики одного запроса: SQL, рендеринг шаблона, общее время."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.tpl = 0.0
+        self.render_started = None
+
+    def sql(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper вокруг каждого запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def rendered(self, response):
+        self.tpl += time.perf_counter() - self.render_started
+
+    def values(self):
+        return {
+            'total': (time.perf_counter() - self.started) * 1000,
+            'db': self.db * 1000,
+            'tpl': self.tpl * 1000,
+            'queries': self.queries,
+        }
+
+
+class ServerTimingMiddleware:
+    """
+    Замеряет SQL, рендеринг шаблонов и общее время каждого запроса.
+
+    Результат уходит в заголовок ``Server-Timing`` и в гистограммы по
+    представлениям, которые отдаёт эндпоинт метрик. Включается настройкой
+    NOTES_SERVER_TIMING; выключенный, middleware убирает себя из цепочки.
+    Время шаблона считается для TemplateResponse, то есть для обычных
+    CBV; ставить middleware стоит первым, чтобы замер охватил остальные.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.NOTES_SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        # То же, что connection.execute_wrapper(), но без контекстных
+        # менеджеров на каждое соединение: это дешевле на каждом запросе.
+        request._server_timing = timing = RequestTiming()
+        wrapped = [connections[alias] for alias in connections]
+        for connection in wrapped:
+            connection.execute_wrappers.append(timing.sql)
+        return timing, wrapped
+
+    def _stop(self, timing, wrapped):
+        for connection in wrapped:
+            connection.execute_wrappers.remove(timing.sql)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timing, wrapped = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self._stop(timing, wrapped)
+        return self._finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing, wrapped = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._stop(timing, wrapped)
+        return self._finish(request, response, timing)
+
+    def process_template_response(self, request, response):
+        timing = request._server_timing
+        timing.render_started = time.perf_counter()
+        response.add_post_render_callback(timing.rendered)
+        return response
+
+    def _finish(self, request, response, timing):
+        values = timing.values()
+        match = request.resolver_match
+        registry.observe(match.view_name if match else 'unresolved', values)
+        response.headers['Server-Timing'] = ', '.join((
+            f'db;dur={values["db"]:.2f};desc="{values["queries"]} queries"',
+            f'tpl;dur={values["tpl"]:.2f}',
+            f'total;dur={values["total"]:.2f}',
+        ))
+        return response
+
+
+def make_profile_token():
+    """Подписанный токен для заголовка X-Profile-Token."""
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign('profile')
+
+
+def profile_dir(view_name):
+    """Каталог профилей представления: «notes:detail» → «notes.detail»."""
+    return Path(settings.NOTES_PROFILE_DIR) / view_name.replace(':', '.')
+
+
+def prune_profiles(keep):
+    """
+    Удаляет старейшие профили сверх NOTES_PROFILE_MAX_FILES файлов или
+    NOTES_PROFILE_MAX_BYTES байт; профиль ``keep`` не удаляется.
+    """
+    profiles = []
+    for path in Path(settings.NOTES_PROFILE_DIR).rglob('*.prof'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # Профиль уже удалил параллельный запрос.
+            continue
+        profiles.append((stat.st_mtime, stat.st_size, path))
+    count = len(profiles)
+    total = sum(size for _, size, _ in profiles)
+    for _, size, path in sorted(profiles):
+        if (
+            count <= settings.NOTES_PROFILE_MAX_FILES
+            and total <= settings.NOTES_PROFILE_MAX_BYTES
+        ):
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        count -= 1
+        total -= size
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует отдельный запрос через cProfile по требованию.
+
+    Профилирование включается подписанным заголовком X-Profile-Token
+    (токен выдаёт ``manage.py profile_token``, он живёт
+    NOTES_PROFILE_TOKEN_MAX_AGE секунд) или параметром ``?_profile=1``
+    у пользователя staff. Профиль пишется в NOTES_PROFILE_DIR, в каталог
+    имени URL, имя файла возвращается в заголовке X-Profile-Id; сверх
+    лимитов каталога старейшие профили удаляются. Для остальных запросов
+    middleware проверяет только заголовок и параметр.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _requested(self, request):
+        token = request.headers.get(PROFILE_HEADER)
+        if token:
+            try:
+                signing.TimestampSigner(salt=PROFILE_SALT).unsign(
+                    token, max_age=settings.NOTES_PROFILE_TOKEN_MAX_AGE
+                )
+                return True
+            except signing.BadSignature:
+                return False
+        return PROFILE_PARAM in request.GET and request.user.is_staff
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._requested(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        return self._store(request, response, profiler)
+
+    async def __acall__(self, request):
+        # Под ASGI в профиль попадёт и всё, что цикл событий выполнял
+        # параллельно с этим запросом.
+        if PROFILE_PARAM in request.GET:
+            request.user = await request.auser()
+        if not self._requested(request):
+            return await self.get_response(request)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+        return self._store(request, response, profiler)
+
+    def _store(self, request, response, profiler):
+        match = request.resolver_match
+        directory = profile_dir(match.view_name if match else 'unresolved')
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.prof'
+        profiler.dump_stats(directory / name)
+        prune_profiles(keep=directory / name)
+        response.headers['X-Profile-Id'] = f'{directory.name}/{name}'
+        return response
+
+
+class ReplicaPinMiddleware:
+    """
+    Чтение своих записей при репликах.
+
+    Запрос с небезопасным методом (POST и т.п.) и все чтения внутри него
+    идут на основную базу; успешный такой запрос ставит cookie на
+    NOTES_REPLICA_PIN_SECONDS секунд, и пока она жива, основная база
+    обслуживает и чтения этого клиента. Без NOTES_REPLICAS middleware
+    убирает себя из цепочки.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        if not settings.NOTES_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _writes(self, request):
+        return request.method not in self.safe_methods
+
+    def _pinned(self, request):
+        return self._writes(request) or PIN_COOKIE in request.COOKIES
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._pinned(request):
+            return self.get_response(request)
+        with primary_reads():
+            response = self.get_response(request)
+        return self._finish(request, response)
+
+    async def __acall__(self, request):
+        if not self._pinned(request):
+            return await self.get_response(request)
+        with primary_reads():
+            response = await self.get_response(request)
+        return self._finish(request, response)
+
+    def _finish(self, request, response):
+        if self._writes(request) and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.NOTES_REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-17 07:55
+
+from django.db import migrations, models
+
+from notes.text import count_words, make_excerpt
+
+BATCH_SIZE = 1000
+
+
+def fill_excerpts(apps, schema_editor):
+    """Заполняет начало текста и число слов у существующих заметок."""
+    Note = apps.get_model('notes', 'Note')
+    last_id = 0
+    while batch := list(
+        Note.objects.filter(id__gt=last_id).order_by('id')
+        .only('id', 'text')[:BATCH_SIZE]
+    ):
+        for note in batch:
+            note.excerpt = make_excerpt(note.text)
+            note.word_count = count_words(note.text)
+        Note.objects.bulk_update(batch, ('excerpt', 'word_count'))
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=160, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число слов'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.1 on 2026-10-17 08:00
+
+from django.conf import settings
+from django.db import migrations
+
+import notes.compression
+from notes.search import uninstall_search_index
+
+BATCH_SIZE = 1000
+
+
+def compress_texts(apps, schema_editor):
+    """
+    Сжимает длинные тексты существующих заметок.
+
+    Старый FTS-индекс читал текст прямо из notes_note, поэтому он удаляется
+    до перезаписи; post_migrate построит его заново через notes_text().
+    """
+    connection = schema_editor.connection
+    uninstall_search_index(connection)
+    if connection.vendor == 'sqlite':
+        Note = apps.get_model('notes', 'Note')
+        threshold = settings.NOTES_TEXT_COMPRESS_THRESHOLD
+        last_id = 0
+        while batch := list(
+            Note.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'text')[:BATCH_SIZE]
+        ):
+            Note.objects.bulk_update(
+                [
+                    note for note in batch
+                    if len(note.text.encode()) >= threshold
+                ],
+                ('text',),
+            )
+            last_id = batch[-1].id
+
+
+def decompress_texts(apps, schema_editor):
+    connection = schema_editor.connection
+    uninstall_search_index(connection)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE notes_note SET text = notes_text(text) "
+                "WHERE typeof(text) = 'blob'"
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_excerpt_word_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=notes.compression.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-17 08:05
+
+import notes.compression
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_text_compressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='html',
+            field=notes.compression.CompressedTextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия рендерера HTML'),
+        ),
+    ]
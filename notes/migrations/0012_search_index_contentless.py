@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from notes.search import reinstall_search_index
+
+
+def reinstall(apps, schema_editor):
+    """
+    Заменяет FTS5-индекс с представлением-источником на индекс без
+    содержимого: представление не давало миграциям пересоздавать
+    notes_note. Базы, созданные с нуля, получили такой индекс ещё в
+    0003, и пересоздание его не меняет.
+    """
+    reinstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0011_job_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall, reinstall),
+    ]
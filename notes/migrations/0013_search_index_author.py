@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from notes.search import reinstall_search_index
+
+
+def reinstall(apps, schema_editor):
+    """
+    Пересоздаёт FTS5-индекс со столбцом автора: условие на автора теперь
+    входит в MATCH, и поиск не перебирает совпадения других авторов.
+    """
+    reinstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0012_search_index_contentless'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall, reinstall),
+    ]
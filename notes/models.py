@@ -1,7 +1,224 @@
+from collections import defaultdict
+from functools import partial
+
 from django.conf import settings
-from django.db import models
+from django.db import (
+    DEFAULT_DB_ALIAS, IntegrityError, connections, models, router,
+    transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_user_pages
+from .compression import CompressedTextField, decompressing
+from .rendering import RENDERER_VERSION, render_note
+from .sharding import shard_for, sharding_enabled
+from .slugs import SlugAllocator, is_slug_conflict, save_with_unique_slug
+from .text import EXCERPT_LENGTH, count_words, make_excerpt
+
+# Поля, которые вычисляются из текста заметки при сохранении.
+DERIVED_FIELDS = ('excerpt', 'word_count', 'html', 'html_version')
+# Узкая проекция для списков: без полного текста заметки.
+LIST_FIELDS = ('id', 'slug', 'title', 'excerpt', 'word_count')
+
+
+class VersionConflict(Exception):
+    """Заметку изменили или удалили после того, как её прочитали."""
+
+
+class ChangeCounter(models.Model):
+    """
+    Единственная строка со счётчиком номеров изменений заметок.
+
+    Номер берётся обновлением этой строки в транзакции изменения, поэтому
+    параллельные записи ждут друг друга и коммитятся в порядке номеров:
+    клиент синхронизации не пропустит изменение с меньшим номером,
+    закоммиченное позже большего.
+    """
+    value = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, count=1, using=None):
+        """
+        Резервирует ``count`` номеров подряд и возвращает первый из них.
+
+        Вызывать внутри транзакции, в которой пишутся сами изменения.
+        SQLite и PostgreSQL получают номер одним UPDATE ... RETURNING.
+        """
+        counter = cls._default_manager.db_manager(using)
+        connection = connections[counter.db]
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {cls._meta.db_table} SET value = value + %s '
+                    'WHERE id = 1 RETURNING value',
+                    [count],
+                )
+                row = cursor.fetchone()
+            if row is not None:
+                return row[0] - count + 1
+        if not counter.filter(pk=1).update(value=F('value') + count):
+            counter.get_or_create(pk=1)
+            counter.filter(pk=1).update(value=F('value') + count)
+        return counter.values_list('value', flat=True).get(pk=1) - count + 1
+
+    @classmethod
+    def number(cls, objects, using=None):
+        """Выдаёт объектам для массовой записи номера изменений подряд."""
+        objects = list(objects)
+        if objects:
+            first = cls.reserve(len(objects), using=using)
+            for seq, obj in enumerate(objects, first):
+                obj.change_seq = seq
+        return objects
+
+
+class NoteQuerySet(models.QuerySet):
+
+    def for_author(self, author, trashed=False):
+        """
+        Заметки автора: живые, при ``trashed=True`` — из корзины, при
+        ``trashed=None`` — все.
+
+        Условие на deleted_at совпадает с условиями частичных индексов,
+        поэтому живые заметки и корзина выбираются каждые по своему.
+        Подсказка ``author`` позволяет роутерам выбрать шард автора и
+        реплику для чтения; без роутеров это обычный фильтр.
+        """
+        clone = self.filter(author=author)
+        if trashed is not None:
+            clone = clone.filter(deleted_at__isnull=not trashed)
+        clone._hints = {**clone._hints, 'author': author}
+        return clone
+
+    def primary(self):
+        """Та же выборка из базы для записи: чтение перед записью."""
+        return self.using(
+            self._db or router.db_for_write(self.model, **self._hints)
+        )
+
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        # Без явной базы заметку кладёт в шард автора роутер.
+        note = self.model(**kwargs)
+        note.save(force_insert=True)
+        return note
+
+    def slug_owners(self, slugs):
+        """
+        Словарь «slug → id заметки» для занятых slug из ``slugs``.
+
+        С шардами занятость смотрится в каталоге NoteSlug, и id заметок
+        уникальны между шардами.
+        """
+        if sharding_enabled():
+            return NoteSlug.owners(slugs)
+        return dict(
+            self.filter(slug__in=slugs, deleted_at__isnull=True)
+            .values_list('slug', 'id')
+        )
+
+    def slug_allocator(self, exclude_pk=None):
+        """
+        Подборщик свободных slug: по каталогу, если заметки в шардах.
+
+        Slug заметок в корзине считаются свободными.
+        """
+        if sharding_enabled():
+            return SlugAllocator(
+                NoteSlug, exclude_pk=exclude_pk, owner='note_id',
+                using=DEFAULT_DB_ALIAS,
+            )
+        return SlugAllocator(
+            self.model, exclude_pk=exclude_pk, using=self.db,
+            condition=models.Q(deleted_at__isnull=True),
+        )
 
-from pytils.translit import slugify
+    def for_list(self):
+        """Только поля для списков, чтобы не читать длинные тексты."""
+        return self.only(*LIST_FIELDS)
+
+    def values(self, *fields, **expressions):
+        clone = super().values(*fields, **expressions)
+        clone._iterable_class = decompressing(clone._iterable_class)
+        return clone
+
+    def values_list(self, *fields, flat=False, named=False):
+        clone = super().values_list(*fields, flat=flat, named=named)
+        clone._iterable_class = decompressing(clone._iterable_class)
+        return clone
+
+    def delete(self):
+        """Удаляет заметки, оставляя надгробия для синхронизации."""
+        notes = self.primary()
+        with transaction.atomic(using=notes.db):
+            tombstones = ChangeCounter.number(
+                (
+                    NoteTombstone(note_id=note_id, author_id=author_id)
+                    for note_id, author_id in notes.values_list(
+                        'id', 'author_id'
+                    )
+                ),
+                using=notes.db,
+            )
+            NoteTombstone.objects.using(notes.db).bulk_create(tombstones)
+            return super(NoteQuerySet, notes).delete()
+
+    def trash_owned(self, author, slug):
+        """
+        Переносит заметку автора в корзину одним UPDATE по slug.
+
+        Заметка получает время удаления и новый номер изменения, поэтому
+        клиенты синхронизации увидят её удалённой; строку позже удалит
+        expire_trash(). Slug заметки в корзине свободен для других
+        заметок: с шардами запись каталога NoteSlug снимается после
+        коммита шарда, а restore_owned() закрепляет slug заново.
+        Возвращает True, если живая заметка была.
+        """
+        # Сигналы сохранения не шлются, поэтому кэш страниц автора
+        # сбрасывается здесь.
+        notes = self.for_author(author).filter(slug=slug).primary()
+        with transaction.atomic(using=notes.db):
+            moved = notes.update(
+                deleted_at=timezone.now(),
+                change_seq=ChangeCounter.reserve(using=notes.db),
+            )
+        if moved:
+            invalidate_user_pages(author.pk)
+            transaction.on_commit(
+                partial(invalidate_user_pages, author.pk), using=notes.db
+            )
+            if sharding_enabled():
+                transaction.on_commit(
+                    partial(NoteSlug.release, author.pk, [slug]),
+                    using=notes.db,
+                )
+        return bool(moved)
+
+    def restore_owned(self, author, pk):
+        """
+        Возвращает заметку автора из корзины; None, если её там нет.
+
+        Пока заметка лежала в корзине, её slug мог занять кто-то ещё:
+        тогда восстановленная заметка получает новый slug по заголовку.
+        Восстановление — обычное сохранение, с новой версией, временем
+        изменения и номером изменения.
+        """
+        note = self.for_author(
+            author, trashed=True
+        ).primary().filter(pk=pk).first()
+        if note is None:
+            return None
+        note.deleted_at = None
+        try:
+            note.save(update_fields=('deleted_at', 'slug'))
+        except IntegrityError as error:
+            if not is_slug_conflict(error):
+                raise
+            note.slug = ''
+            note.save(update_fields=('deleted_at', 'slug'))
+        return note
 
 
 class Note(models.Model):
@@ -11,28 +228,382 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
+    # Уникален только среди живых заметок: см. notes_note_live_slug_uniq.
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
         max_length=100,
-        unique=True,
         blank=True,
         help_text=('Укажите адрес для страницы заметки. Используйте только '
                    'латиницу, цифры, дефисы и знаки подчёркивания')
     )
+    # Без ограничения в БД: в шарде нет таблицы пользователей.
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    updated_at = models.DateTimeField('Изменена', auto_now=True)
+    # Заметка в корзине: None у живых, время удаления у удалённых.
+    deleted_at = models.DateTimeField(
+        'Удалена', null=True, blank=True, editable=False
+    )
+    version = models.PositiveIntegerField(
+        'Версия содержимого', default=1, editable=False
+    )
+    change_seq = models.PositiveBigIntegerField(
+        'Номер изменения', default=0, editable=False
     )
+    excerpt = models.CharField(
+        'Начало текста', max_length=EXCERPT_LENGTH, blank=True,
+        editable=False,
+    )
+    word_count = models.PositiveIntegerField(
+        'Число слов', default=0, editable=False
+    )
+    html = CompressedTextField('Текст в HTML', blank=True, editable=False)
+    html_version = models.PositiveSmallIntegerField(
+        'Версия рендерера HTML', default=0, editable=False
+    )
+
+    objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('slug',), name='notes_note_live_slug_uniq',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='notes_note_live_author_id_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=('author', 'deleted_at'),
+                name='notes_note_trash_author_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+            models.Index(
+                fields=('deleted_at',), name='notes_note_trash_expiry_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+            models.Index(
+                fields=('author', 'change_seq'),
+                name='notes_note_author_seq_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    def update_derived_fields(self):
+        """Пересчитывает поля, вычисляемые из текста; зовут и bulk-пути."""
+        self.excerpt = make_excerpt(self.text)
+        self.word_count = count_words(self.text)
+        self.html = render_note(self.text)
+        self.html_version = RENDERER_VERSION
+
+    @property
+    def html_is_stale(self):
+        return self.html_version != RENDERER_VERSION
+
+    def ensure_html(self):
+        """
+        Перерисовывает HTML, отрисованный прежней версией рендерера.
+
+        Пишет только html и html_version: содержимое заметки не менялось,
+        поэтому её версия и номер изменения остаются прежними.
+        """
+        if self.html_is_stale:
+            self.html = render_note(self.text)
+            self.html_version = RENDERER_VERSION
+            using = router.db_for_write(type(self), instance=self)
+            type(self)._default_manager.using(using).filter(
+                pk=self.pk
+            ).update(
+                html=self.html, html_version=self.html_version
+            )
+        return self
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Сохраняет заметку, увеличивая версию существующей.
+
+        Правка пишется одним UPDATE ... WHERE id = ? AND version = ? с
+        версией, которую видел автор правки. Если заметку успели изменить
+        или удалить, поднимается VersionConflict и ничего не пишется.
+        """
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.update_derived_fields()
+        expected_version = None
+        if not self._state.adding:
+            expected_version = self.version
+            self.version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'version', 'updated_at', 'change_seq',
+                    *(DERIVED_FIELDS if 'text' in update_fields else ()),
+                }
+        self._expected_version = expected_version
+        save = super().save
+        if sharding_enabled() and (
+            update_fields is None or 'slug' in update_fields
+        ):
+            save = partial(self._save_and_claim_slug, save)
+        try:
+            with transaction.atomic(using=using):
+                self.change_seq = ChangeCounter.reserve(using=using)
+                if self.slug:
+                    save(*args, **kwargs)
+                else:
+                    save_with_unique_slug(
+                        self, save, *args,
+                        allocator=type(self).objects.db_manager(
+                            using
+                        ).slug_allocator(exclude_pk=self.pk),
+                        **kwargs,
+                    )
+        except (VersionConflict, IntegrityError):
+            self.version = expected_version
+            raise
+        finally:
+            del self._expected_version
+
+    def _save_and_claim_slug(self, save, *args, **kwargs):
+        """
+        Записывает заметку в шард, а её slug — в каталог NoteSlug.
+
+        Запись в каталог не атомарна с транзакцией шарда: подробности
+        в NoteSlug.claim().
+        """
+        save(*args, **kwargs)
+        NoteSlug.claim([self])
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        expected_version = self.__dict__.get('_expected_version')
+        if expected_version is None:
+            return super()._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update
+            )
+        updated = super()._do_update(
+            base_qs.filter(version=expected_version), using, pk_val, values,
+            update_fields, forced_update,
+        )
+        if not updated:
+            raise VersionConflict(
+                f'Заметка {pk_val} уже не в версии {expected_version}.'
+            )
+        return updated
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            NoteTombstone.objects.using(using).create(
+                note_id=self.pk,
+                author_id=self.author_id,
+                change_seq=ChangeCounter.reserve(using=using),
+            )
+            return super().delete(*args, **kwargs)
+
+
+class NoteTombstone(models.Model):
+    """След удалённой заметки, по которому клиенты узнают об удалении."""
+    note_id = models.BigIntegerField('ID заметки')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    change_seq = models.PositiveBigIntegerField('Номер изменения')
+    deleted_at = models.DateTimeField('Удалена', auto_now_add=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'change_seq'),
+                name='notes_tombstone_author_seq_idx',
+            ),
+        )
+
+
+class NoteSlug(models.Model):
+    """
+    Каталог slug заметок из всех шардов; живёт в default.
+
+    Уникальный индекс по slug держит адреса заметок уникальными между
+    шардами. Перенос в корзину снимает запись заметки (release()), а
+    удаление и переименование каталог не трогают: запись, чья заметка
+    удалена, лежит в корзине или переименована, считается свободной и
+    переходит к первой заметке, которая захочет этот slug.
+    """
+    slug = models.SlugField(max_length=100, unique=True)
+    note_id = models.BigIntegerField('ID заметки')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+
+    @classmethod
+    def _taken(cls):
+        # Тот же текст, что у уникального индекса: is_slug_conflict().
+        return IntegrityError(
+            f'UNIQUE constraint failed: {cls._meta.db_table}.slug'
+        )
+
+    @classmethod
+    def live(cls, claims):
+        """
+        Записи каталога, чьи заметки существуют, не в корзине и всё ещё
+        с этим slug.
+
+        Заметки проверяются одним запросом на каждый шард, где живут
+        авторы записей.
+        """
+        by_shard = defaultdict(list)
+        for claim in claims:
+            by_shard[shard_for(claim.author_id)].append(claim)
+        live = []
+        for alias, group in by_shard.items():
+            notes = set(
+                Note.objects.using(alias)
+                .filter(
+                    pk__in=[claim.note_id for claim in group],
+                    deleted_at__isnull=True,
+                )
+                .values_list('pk', 'slug')
+            )
+            live.extend(
+                claim for claim in group
+                if (claim.note_id, claim.slug) in notes
+            )
+        return live
+
+    @classmethod
+    def release(cls, author_id, slugs):
+        """
+        Снимает записи автора с ``slugs``: его заметки ушли в корзину.
+
+        Зовётся после коммита шарда: пока перенос в корзину может
+        откатиться, slug должен оставаться за заметкой.
+        """
+        cls.objects.filter(author_id=author_id, slug__in=slugs).delete()
+
+    @classmethod
+    def owners(cls, slugs):
+        return {
+            claim.slug: claim.note_id
+            for claim in cls.live(cls.objects.filter(slug__in=slugs))
+        }
+
+    @classmethod
+    def claim(cls, notes):
+        """
+        Закрепляет за сохранёнными заметками их slug.
+
+        Зовётся в транзакции шарда после записи заметок. Если slug держит
+        другая живая заметка, поднимается IntegrityError, как от
+        уникального индекса, и транзакция шарда откатывается.
+
+        Каталог и шард — разные базы, и общей транзакции у них нет: запись
+        в default фиксируется сразу, и если транзакция шарда потом
+        откатится, в каталоге останется запись без заметки. Такая запись
+        не живая (см. live()), и её забирает первая заметка, которой
+        понадобится этот slug. Проверка чужих записей стоит запроса к
+        каждому шарду их авторов.
+        """
+        wanted = {note.slug: note for note in notes}
+        existing = cls.objects.in_bulk(wanted, field_name='slug')
+        foreign = [
+            claim for slug, claim in existing.items()
+            if claim.note_id != wanted[slug].pk
+        ]
+        if cls.live(foreign):
+            raise cls._taken()
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            for claim in foreign:
+                # Условие на прежнюю заметку: запись не уведут дважды.
+                note = wanted[claim.slug]
+                if not cls.objects.filter(
+                    pk=claim.pk, note_id=claim.note_id
+                ).update(note_id=note.pk, author_id=note.author_id):
+                    raise cls._taken()
+            cls.objects.bulk_create(
+                cls(slug=slug, note_id=note.pk, author_id=note.author_id)
+                for slug, note in wanted.items() if slug not in existing
+            )
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди; живёт в default.
+
+    Задачу ставит notes.jobs.enqueue(), выполняет manage.py run_workers.
+    Обработчик отчитывается о ходе работы через report(), по этим же
+    отметкам находят задачи упавших обработчиков.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+
+    kind = models.CharField('Вид задачи', max_length=50)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    params = models.JSONField('Параметры', default=dict)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=Status, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Предел попыток')
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    progress = models.PositiveIntegerField('Сделано', default=0)
+    total = models.PositiveIntegerField('Всего', null=True, blank=True)
+    result = models.JSONField('Результат', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    worker = models.CharField('Обработчик', max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField('Отметка', null=True, blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('run_after', 'id'), name='notes_job_queued_idx',
+                condition=models.Q(status='queued'),
+            ),
+            models.Index(
+                fields=('kind', 'created_at'), name='notes_job_kind_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk}'
+
+    def report(self, progress, total=None):
+        """Сохраняет ход работы; заодно отмечает, что обработчик жив."""
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        self.heartbeat_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).update(
+            progress=self.progress, total=self.total,
+            heartbeat_at=self.heartbeat_at,
+        )
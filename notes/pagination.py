@@ -0,0 +1,139 @@
+import base64
+import binascii
+import math
+
+from django.http import Http404
+
+NEXT = 'n'
+PREV = 'p'
+
+
+def encode_cursor(direction, key):
+    """Упаковывает направление и ключ в непрозрачную строку курсора."""
+    raw = f'{direction}:{key}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _unpack_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        direction, key = (
+            base64.urlsafe_b64decode(padded).decode().split(':', 1)
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise Http404('Некорректный курсор страницы.')
+    if direction not in (NEXT, PREV):
+        raise Http404('Некорректный курсор страницы.')
+    return direction, key
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор, на некорректное значение отвечает 404."""
+    direction, key = _unpack_cursor(cursor)
+    try:
+        return direction, int(key)
+    except ValueError:
+        raise Http404('Некорректный курсор страницы.')
+
+
+def decode_rank_cursor(cursor):
+    """Распаковывает курсор с ключом (ранг, id), как decode_cursor."""
+    direction, key = _unpack_cursor(cursor)
+    try:
+        rank, pk = key.split(':')
+        rank, pk = float(rank), int(pk)
+    except ValueError:
+        raise Http404('Некорректный курсор страницы.')
+    if not math.isfinite(rank):
+        raise Http404('Некорректный курсор страницы.')
+    return direction, (rank, pk)
+
+
+def keyset_page(rows, per_page, direction, key, attr):
+    """
+    Собирает KeysetPage из per_page + 1 строк, выбранных по курсору.
+
+    Строки назад выбираются в обратном порядке и здесь разворачиваются;
+    курсоры соседних страниц строятся из атрибута attr крайних строк.
+    """
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREV:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows)
+    if direction == NEXT:
+        has_next, has_prev = has_more, key is not None
+    else:
+        has_next, has_prev = True, has_more
+    first = getattr(rows[0], attr)
+    last = getattr(rows[-1], attr)
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(NEXT, last) if has_next else None,
+        prev_cursor=encode_cursor(PREV, first) if has_prev else None,
+    )
+
+
+class KeysetPage:
+    """Страница, полученная поиском по ключу, без OFFSET и COUNT."""
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Курсорная пагинация по возрастанию уникального целочисленного ключа.
+
+    Каждая страница выбирается одним запросом вида
+    ``WHERE key > ? ORDER BY key LIMIT per_page + 1``, поэтому стоимость
+    страницы N не зависит от N. Лишняя запись нужна только для того,
+    чтобы узнать, есть ли следующая страница.
+    """
+
+    def __init__(self, queryset, per_page, key='id'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.key = key
+
+    def _queryset_for(self, cursor):
+        direction, key = decode_cursor(cursor) if cursor else (NEXT, None)
+        if direction == NEXT:
+            queryset = self.queryset.order_by(self.key)
+            if key is not None:
+                queryset = queryset.filter(**{f'{self.key}__gt': key})
+        else:
+            queryset = self.queryset.filter(
+                **{f'{self.key}__lt': key}
+            ).order_by(f'-{self.key}')
+        return direction, key, queryset[:self.per_page + 1]
+
+    def _build_page(self, rows, direction, key):
+        return keyset_page(rows, self.per_page, direction, key, self.key)
+
+    def page(self, cursor=None):
+        direction, key, queryset = self._queryset_for(cursor)
+        return self._build_page(list(queryset), direction, key)
+
+    async def apage(self, cursor=None):
+        direction, key, queryset = self._queryset_for(cursor)
+        rows = [row async for row in queryset]
+        return self._build_page(rows, direction, key)
@@ -0,0 +1,191 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.utils import timezone
+
+from .auth import user_cache
+from .cache import invalidate_user_pages
+from .models import Note, NoteSlug, NoteTombstone
+from .sharding import SHARDED_MODELS, note_databases, shard_for
+
+# Первая пачка, по которой меряется стоимость удаления одной строки.
+FIRST_BATCH_SIZE = 10
+# Какую долю потолка блокировки занимает пачка по оценке: запас на
+# разброс стоимости строк между пачками.
+LOCK_TARGET_SHARE = 0.5
+
+
+def delete_in_batches(queryset, using, batch_size, max_lock_seconds,
+                      order_by='id', before_delete=None, progress=None):
+    """
+    Удаляет строки ``queryset`` из ``using`` пачками, транзакция на пачку.
+
+    Каждая пачка — первые по ``order_by`` оставшиеся строки; порядок
+    стоит выбирать по индексу выборки, чтобы не сортировать её целиком.
+    В памяти только id одной пачки; id выбираются вне транзакции, так
+    что блокировку записи держит один DELETE по первичному ключу и
+    ``before_delete(rows, using)``, если он задан. Первая пачка
+    маленькая; по ней меряется время блокировки на строку, и следующая
+    пачка берётся такой, чтобы по этой оценке держать блокировку не
+    дольше половины ``max_lock_seconds``. Пачка растёт не больше чем
+    вдвое за шаг и не больше ``batch_size``, но может сжаться до одной
+    строки, если даже столько строк не укладывается в потолок.
+    После каждой пачки ``progress`` получает число удалённых строк.
+    Сигналы удаления не шлются. Возвращает число удалённых строк.
+    """
+    rows = queryset.using(using)
+    ids = rows.order_by(order_by).values_list('id', flat=True)
+    size = min(FIRST_BATCH_SIZE, batch_size)
+    deleted = 0
+    while batch := list(ids[:size]):
+        started = time.perf_counter()
+        with transaction.atomic(using=using):
+            # Условия выборки повторяются: строку, которая перестала им
+            # отвечать после SELECT, удалять уже нельзя.
+            doomed = rows.filter(pk__in=batch)
+            if before_delete is not None:
+                before_delete(doomed, using)
+            deleted += doomed._raw_delete(using)
+        held = time.perf_counter() - started
+        if progress is not None:
+            progress(deleted)
+        size = min(size * 2, batch_size)
+        if held > 0:
+            per_row = held / len(batch)
+            size = max(1, min(
+                size, int(max_lock_seconds * LOCK_TARGET_SHARE / per_row)
+            ))
+    return deleted
+
+
+def deactivate(user_ids):
+    """Закрывает пользователям вход до того, как их удалят."""
+    get_user_model().objects.filter(pk__in=user_ids).update(is_active=False)
+    for user_id in user_ids:
+        user_cache.discard(user_id)
+
+
+def _delete_user_row(user_id):
+    """
+    Удаляет строку пользователя из default без сборщика каскада Django.
+
+    Сборщик User.delete() искал бы заметки и надгробия в default, а с
+    шардами их там нет или нет самих таблиц. К этому моменту они уже
+    удалены из шарда, поэтому разбираются только связи в default:
+    SET_NULL обнуляется, CASCADE удаляется одним запросом, связи
+    многие-ко-многим снимаются. Сигналы удаления не шлются, кэш
+    пользователя сбрасывается здесь.
+    """
+    User = get_user_model()
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        for relation in User._meta.related_objects:
+            if relation.related_model._meta.model_name in SHARDED_MODELS:
+                continue
+            rows = relation.related_model._base_manager.using(
+                DEFAULT_DB_ALIAS
+            ).filter(**{relation.field.name: user_id})
+            if relation.on_delete is models.SET_NULL:
+                rows.update(**{relation.field.name: None})
+            elif relation.on_delete is models.CASCADE:
+                rows._raw_delete(DEFAULT_DB_ALIAS)
+        for field in User._meta.many_to_many:
+            field.remote_field.through.objects.filter(
+                **{field.m2m_field_name(): user_id}
+            )._raw_delete(DEFAULT_DB_ALIAS)
+        User.objects.filter(pk=user_id)._raw_delete(DEFAULT_DB_ALIAS)
+    user_cache.discard(user_id)
+
+
+def purge_user(user, batch_size=None, max_lock_seconds=None, progress=None):
+    """
+    Удаляет пользователя (или id) вместе с заметками без общего каскада.
+
+    Каскад Django загрузил бы все заметки в память и удалил их одной
+    транзакцией, заперев SQLite на всё время удаления. Здесь заметки,
+    надгробия и записи каталога slug удаляются пачками через
+    delete_in_batches(), и только потом — сам пользователь, без сборщика
+    каскада: см. _delete_user_row(). Прерванное удаление можно повторить.
+    ``progress`` получает число удалённых заметок после каждой пачки.
+    Возвращает число удалённых заметок.
+    """
+    user_id = getattr(user, 'pk', user)
+    batch_size = batch_size or settings.NOTES_PURGE_BATCH_SIZE
+    max_lock_seconds = (
+        max_lock_seconds or settings.NOTES_PURGE_MAX_LOCK_SECONDS
+    )
+    shard = shard_for(user_id)
+    deactivate([user_id])
+    # Живые заметки и корзина отдельно: у каждой выборки свой индекс.
+    deleted = 0
+    for trashed in (False, True):
+        deleted += delete_in_batches(
+            Note.objects.for_author(user_id, trashed=trashed), shard,
+            batch_size, max_lock_seconds,
+            progress=progress and (
+                lambda count, before=deleted: progress(before + count)
+            ),
+        )
+    delete_in_batches(
+        NoteTombstone.objects.filter(author_id=user_id), shard, batch_size,
+        max_lock_seconds,
+    )
+    delete_in_batches(
+        NoteSlug.objects.filter(author_id=user_id), DEFAULT_DB_ALIAS,
+        batch_size, max_lock_seconds,
+    )
+    invalidate_user_pages(user_id)
+    _delete_user_row(user_id)
+    return deleted
+
+
+def _bury(notes, using):
+    """
+    Пишет надгробия заметок перед удалением из корзины.
+
+    Номер изменения надгробию достаётся от заметки: его выдали при
+    переносе в корзину, и клиенты, видевшие удаление, не получат его
+    повторно.
+    """
+    select, params = notes.values_list(
+        'id', 'author_id', 'change_seq', 'deleted_at'
+    ).query.sql_with_params()
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {NoteTombstone._meta.db_table} '
+            '(note_id, author_id, change_seq, deleted_at) '
+            f'SELECT * FROM ({select}) AS expired',
+            params,
+        )
+
+
+def expire_trash(batch_size=None, max_lock_seconds=None, progress=None):
+    """
+    Удаляет заметки, пролежавшие в корзине больше NOTES_TRASH_DAYS дней.
+
+    Удаление идёт пачками через delete_in_batches() по индексу времени
+    удаления, на месте заметок остаются надгробия для синхронизации.
+    ``progress`` получает число удалённых заметок после каждой пачки.
+    Возвращает число удалённых заметок.
+    """
+    batch_size = batch_size or settings.NOTES_PURGE_BATCH_SIZE
+    max_lock_seconds = (
+        max_lock_seconds or settings.NOTES_PURGE_MAX_LOCK_SECONDS
+    )
+    expired = Note.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(
+            days=settings.NOTES_TRASH_DAYS
+        )
+    )
+    deleted = 0
+    for using in note_databases():
+        deleted += delete_in_batches(
+            expired, using, batch_size, max_lock_seconds,
+            order_by='deleted_at', before_delete=_bury,
+            progress=progress and (
+                lambda count, before=deleted: progress(before + count)
+            ),
+        )
+    return deleted
@@ -3,11 +3,18 @@ import pytest
 
 # Импортируем класс клиента.
 from django.test.client import Client
+from django.core.cache import cache
 
 # Импортируем модель заметки, чтобы создать экземпляр.
 from notes.models import Note
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Откат транзакции теста не откатывает кэш страниц.
+    cache.clear()
+
+
 @pytest.fixture
 # Используем встроенную фикстуру для модели пользователей django_user_model.
 def author(django_user_model):  
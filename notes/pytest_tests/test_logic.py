@@ -81,8 +81,11 @@ def test_author_can_edit_note(author_client, form_data, note):
     # Получаем адрес страницы редактирования заметки:
     url = reverse('notes:edit', args=(note.slug,))
     # В POST-запросе на адрес редактирования заметки
-    # отправляем form_data - новые значения для полей заметки:
-    response = author_client.post(url, form_data)
+    # отправляем form_data - новые значения для полей заметки
+    # и версию, которую видел автор:
+    response = author_client.post(
+        url, {**form_data, 'version': note.version}
+    )
     # Проверяем редирект:
     assertRedirects(response, reverse('notes:success'))
     # Обновляем объект заметки note: получаем обновлённые данные из БД:
@@ -110,7 +113,7 @@ def test_author_can_delete_note(author_client, slug_for_args):
     url = reverse('notes:delete', args=slug_for_args)
     response = author_client.post(url)
     assertRedirects(response, reverse('notes:success'))
-    assert Note.objects.count() == 0
+    assert Note.objects.filter(deleted_at=None).count() == 0
 
 
 def test_other_user_cant_delete_note(not_author_client, slug_for_args):
@@ -0,0 +1,184 @@
+from django.db import transaction
+
+from .cache import invalidate_user_pages
+from .models import ChangeCounter, Note, NoteSlug, NoteTombstone
+from .sharding import note_databases, shard_for
+
+# Сколько строк переносить одной транзакцией.
+DEFAULT_BATCH_SIZE = 1000
+
+
+def misplaced_authors(using):
+    """Авторы, чьи заметки или надгробия лежат в ``using`` не по хэшу."""
+    authors = set(
+        Note.objects.using(using).values_list('author_id', flat=True)
+        .distinct()
+    ) | set(
+        NoteTombstone.objects.using(using)
+        .values_list('author_id', flat=True).distinct()
+    )
+    return sorted(
+        author_id for author_id in authors if shard_for(author_id) != using
+    )
+
+
+def _raise_counter(source, target):
+    """
+    Поднимает счётчик изменений шарда ``target`` до счётчика ``source``.
+
+    Токены синхронизации перенесённого автора выданы ``source``, поэтому
+    новые номера в ``target`` должны быть больше любого из них.
+    """
+    value = ChangeCounter.objects.using(source).filter(pk=1).values_list(
+        'value', flat=True
+    ).first() or 0
+    counter = ChangeCounter.objects.using(target)
+    counter.get_or_create(pk=1)
+    counter.filter(pk=1, value__lt=value).update(value=value)
+
+
+def _move_notes(author_id, source, target, batch_size):
+    moved = 0
+    # Живые заметки и корзина отдельно: у каждой выборки свой индекс.
+    for trashed in (False, True):
+        notes = Note.objects.using(source).for_author(
+            author_id, trashed=trashed
+        )
+        moved += _move_note_batches(
+            notes, author_id, source, target, batch_size
+        )
+    return moved
+
+
+def _move_note_batches(notes, author_id, source, target, batch_size):
+    """
+    Копирует пачки заметок в ``target`` и удаляет их из ``source``.
+
+    Надгробие старого id пишется в той же транзакции, что и копия, поэтому
+    по надгробиям видно, какие заметки уже скопировал прерванный прошлый
+    перенос: их не копируют второй раз, а только удаляют из ``source``.
+    Сопоставлять копии по slug нельзя: его делят заметка в корзине и
+    живая заметка. Каталог slug переходит только к живым копиям, и чужую
+    живую запись он не перезаписывает (см. NoteSlug.claim()).
+    """
+    moved = 0
+    while batch := list(notes.order_by('id')[:batch_size]):
+        old_ids = [note.pk for note in batch]
+        with transaction.atomic(using=target):
+            copied = set(
+                NoteTombstone.objects.using(target).filter(
+                    author_id=author_id, note_id__in=old_ids
+                ).values_list('note_id', flat=True)
+            )
+            fresh = [note for note in batch if note.pk not in copied]
+            # Клиенты синхронизации узнают о новых id через надгробия.
+            tombstones = [
+                NoteTombstone(note_id=note.pk, author_id=author_id)
+                for note in fresh
+            ]
+            for note in fresh:
+                note.pk = None
+            ChangeCounter.number([*fresh, *tombstones], using=target)
+            Note.objects.using(target).bulk_create(fresh)
+            NoteTombstone.objects.using(target).bulk_create(tombstones)
+            NoteSlug.claim([note for note in fresh if note.deleted_at is None])
+        with transaction.atomic(using=source):
+            notes.filter(pk__in=old_ids)._raw_delete(source)
+        moved += len(batch)
+    return moved
+
+
+def _move_tombstones(author_id, source, target, batch_size):
+    tombstones = NoteTombstone.objects.using(source).filter(
+        author_id=author_id
+    )
+    while batch := list(tombstones.order_by('id')[:batch_size]):
+        old_ids = [tombstone.pk for tombstone in batch]
+        for tombstone in batch:
+            tombstone.pk = None
+        with transaction.atomic(using=target):
+            ChangeCounter.number(batch, using=target)
+            NoteTombstone.objects.using(target).bulk_create(batch)
+        with transaction.atomic(using=source):
+            tombstones.filter(pk__in=old_ids)._raw_delete(source)
+
+
+def move_author(author_id, source, target, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Переносит заметки и надгробия автора из шарда ``source`` в ``target``,
+    его шард по shard_for().
+
+    Перенос идёт пачками по транзакции на пачку в каждой базе. В новом
+    шарде заметки получают id из его диапазона и новые номера изменений,
+    а для старых id пишутся надгробия: клиенты синхронизации увидят
+    замену заметок. Прерванный перенос можно просто повторить.
+    Возвращает число перенесённых заметок.
+    """
+    _raise_counter(source, target)
+    moved = _move_notes(author_id, source, target, batch_size)
+    _move_tombstones(author_id, source, target, batch_size)
+    invalidate_user_pages(author_id)
+    return moved
+
+
+def sync_slug_directory(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Дописывает в каталог NoteSlug slug живых заметок, которых в нём нет.
+
+    Нужен после включения шардов на базе, где заметки уже есть.
+    Возвращает число просмотренных заметок.
+    """
+    seen = 0
+    for using in note_databases():
+        rows = Note.objects.using(using).filter(
+            deleted_at__isnull=True
+        ).order_by('id').values_list('id', 'slug', 'author_id')
+        last_id = 0
+        while batch := list(rows.filter(id__gt=last_id)[:batch_size]):
+            NoteSlug.objects.bulk_create(
+                (
+                    NoteSlug(slug=slug, note_id=note_id, author_id=author_id)
+                    for note_id, slug, author_id in batch
+                ),
+                ignore_conflicts=True,
+            )
+            seen += len(batch)
+            last_id = batch[-1][0]
+    return seen
+
+
+def prune_slug_directory(batch_size=DEFAULT_BATCH_SIZE):
+    """Удаляет из каталога записи удалённых и переименованных заметок."""
+    pruned = 0
+    last_id = 0
+    while batch := list(
+        NoteSlug.objects.filter(id__gt=last_id).order_by('id')[:batch_size]
+    ):
+        live = {claim.pk for claim in NoteSlug.live(batch)}
+        with transaction.atomic():
+            for claim in batch:
+                # Условие на заметку: запись могли уже передать другой.
+                if claim.pk not in live:
+                    pruned += NoteSlug.objects.filter(
+                        pk=claim.pk, note_id=claim.note_id
+                    ).delete()[0]
+        last_id = batch[-1].pk
+    return pruned
+
+
+def rebalance(batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Раскладывает авторов по шардам согласно shard_for().
+
+    Возвращает список переносов (id автора, откуда, куда, число заметок);
+    при ``dry_run`` только находит их, число заметок — None.
+    """
+    moves = []
+    for source in note_databases():
+        for author_id in misplaced_authors(source):
+            target = shard_for(author_id)
+            moved = None if dry_run else move_author(
+                author_id, source, target, batch_size
+            )
+            moves.append((author_id, source, target, moved))
+    return moves
@@ -0,0 +1,151 @@
+import re
+
+from django.utils.html import escape
+
+# Меняется вместе с правилами разметки: заметки с другой версией
+# перерисовываются при открытии или командой render_notes.
+RENDERER_VERSION = 2
+# Глубже этого цитаты не разбираются, чтобы не уходить в рекурсию.
+MAX_QUOTE_DEPTH = 4
+
+# Длиннее этого подпись и адрес ссылки не разбираются.
+MAX_LABEL_LENGTH = 200
+MAX_HREF_LENGTH = 2000
+
+FENCE = '```'
+HEADING = re.compile(r'(#{1,6})\s+(.+)')
+LIST_ITEM = re.compile(r'[-*+]\s+(.+)')
+ORDERED_ITEM = re.compile(r'\d{1,9}[.)]\s+(.+)')
+# Подпись и адрес ссылки не содержат скобок [ ]: иначе разбор от каждой
+# незакрытой «[» доходил бы до конца строки, и время росло бы квадратично.
+INLINE = re.compile(
+    r'`(?P<code>[^`]+)`'
+    r'|\*\*(?P<strong>[^*]+)\*\*'
+    r'|\*(?P<em>[^*\s](?:[^*]*[^*\s])?)\*'
+    rf'|\[(?P<label>[^\[\]]{{1,{MAX_LABEL_LENGTH}}})\]'
+    rf'\((?P<href>[^)\s\[\]]{{1,{MAX_HREF_LENGTH}}})\)'
+    r'|(?P<url>https?://[^\s<>"]*[^\s<>".,;:!?)\]])'
+)
+# Ссылки только на веб, почту и адреса сайта: никаких javascript: и data:.
+SAFE_URL = re.compile(r'(?:https?://|mailto:|/|#)', re.IGNORECASE)
+
+
+def _link(href, label):
+    return f'<a href="{escape(href)}" rel="nofollow noopener">{label}</a>'
+
+
+def _inline(text, links=True):
+    """Строчная разметка: код, жирный, курсив и ссылки."""
+    parts = []
+    position = 0
+    for match in INLINE.finditer(text):
+        if match['code'] is not None:
+            html = f'<code>{escape(match["code"])}</code>'
+        elif match['strong'] is not None:
+            html = f'<strong>{_inline(match["strong"], links)}</strong>'
+        elif match['em'] is not None:
+            html = f'<em>{_inline(match["em"], links)}</em>'
+        elif not links:
+            continue
+        elif match['label'] is not None:
+            label = _inline(match['label'], links=False)
+            if SAFE_URL.match(match['href']):
+                html = _link(match['href'], label)
+            else:
+                html = label
+        else:
+            html = _link(match['url'], escape(match['url']))
+        parts.append(escape(text[position:match.start()]))
+        parts.append(html)
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return ''.join(parts)
+
+
+def _starts_block(line, depth):
+    return (
+        line.startswith(FENCE)
+        or (line.startswith('>') and depth < MAX_QUOTE_DEPTH)
+        or any(
+            pattern.fullmatch(line)
+            for pattern in (HEADING, LIST_ITEM, ORDERED_ITEM)
+        )
+    )
+
+
+def _code_block(lines, index):
+    code = []
+    index += 1
+    while index < len(lines) and not lines[index].strip().startswith(FENCE):
+        code.append(lines[index])
+        index += 1
+    return f'<pre><code>{escape(chr(10).join(code))}</code></pre>', index + 1
+
+
+def _quote(lines, index, depth):
+    quoted = []
+    while index < len(lines) and lines[index].strip().startswith('>'):
+        quoted.append(lines[index].strip()[1:])
+        index += 1
+    html = _render_blocks(quoted, depth + 1)
+    return f'<blockquote>{html}</blockquote>', index
+
+
+def _list(lines, index, pattern):
+    tag = 'ul' if pattern is LIST_ITEM else 'ol'
+    items = []
+    while index < len(lines) and (
+        item := pattern.fullmatch(lines[index].strip())
+    ):
+        items.append(f'<li>{_inline(item[1])}</li>')
+        index += 1
+    return f'<{tag}>{"".join(items)}</{tag}>', index
+
+
+def _paragraph(lines, index, depth):
+    paragraph = []
+    while index < len(lines):
+        line = lines[index].strip()
+        if not line or (paragraph and _starts_block(line, depth)):
+            break
+        paragraph.append(_inline(line))
+        index += 1
+    return '<p>' + '<br>\n'.join(paragraph) + '</p>', index
+
+
+def _render_blocks(lines, depth):
+    html = []
+    index = 0
+    while index < len(lines):
+        line = lines[index].strip()
+        if not line:
+            index += 1
+            continue
+        if line.startswith(FENCE):
+            block, index = _code_block(lines, index)
+        elif heading := HEADING.fullmatch(line):
+            level = len(heading[1])
+            block = f'<h{level}>{_inline(heading[2])}</h{level}>'
+            index += 1
+        elif line.startswith('>') and depth < MAX_QUOTE_DEPTH:
+            block, index = _quote(lines, index, depth)
+        elif LIST_ITEM.fullmatch(line):
+            block, index = _list(lines, index, LIST_ITEM)
+        elif ORDERED_ITEM.fullmatch(line):
+            block, index = _list(lines, index, ORDERED_ITEM)
+        else:
+            block, index = _paragraph(lines, index, depth)
+        html.append(block)
+    return '\n'.join(html)
+
+
+def render_note(text):
+    """
+    Превращает текст заметки с простой Markdown-разметкой в HTML.
+
+    Понимает абзацы, заголовки #, списки, цитаты >, блоки кода ```,
+    `код`, **жирный**, *курсив*, [ссылки](https://...) и голые адреса.
+    Весь текст экранируется, теги появляются только из разметки,
+    поэтому результат безопасно выводить как есть.
+    """
+    return _render_blocks(text.splitlines(), depth=0)
@@ -0,0 +1,95 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+# Cookie «читать с основной базы»: живёт NOTES_REPLICA_PIN_SECONDS после
+# записи, чтобы автор видел свои изменения до того, как их получат реплики.
+PIN_COOKIE = 'notes_primary'
+
+_primary_reads = ContextVar('notes_primary_reads', default=False)
+
+
+def replica_aliases():
+    return {
+        alias
+        for replicas in settings.NOTES_REPLICAS.values()
+        for alias in replicas
+    }
+
+
+def primary_of(alias):
+    """Основная база для реплики ``alias`` или сам ``alias``."""
+    for primary, replicas in settings.NOTES_REPLICAS.items():
+        if alias in replicas:
+            return primary
+    return alias
+
+
+class ReplicaHealth:
+    """
+    Результаты проверки реплик, запомненные на время процесса.
+
+    Реплика проверяется запросом к django_migrations не чаще раза в
+    NOTES_REPLICA_HEALTH_INTERVAL секунд; упавшая пропускается до
+    следующей проверки.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._checked = {}
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            state = self._checked.get(alias)
+        if state is not None and (
+            now - state[1] < settings.NOTES_REPLICA_HEALTH_INTERVAL
+        ):
+            return state[0]
+        healthy = self.check(alias)
+        with self._lock:
+            self._checked[alias] = (healthy, now)
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM django_migrations LIMIT 1')
+        except DatabaseError:
+            connection.close()
+            return False
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+health = ReplicaHealth()
+
+
+def read_alias(primary):
+    """База для чтения заметок: случайная живая реплика или ``primary``."""
+    if _primary_reads.get():
+        return primary
+    replicas = [
+        alias for alias in settings.NOTES_REPLICAS.get(primary, ())
+        if health.is_healthy(alias)
+    ]
+    return random.choice(replicas) if replicas else primary
+
+
+@contextmanager
+def primary_reads():
+    """Внутри контекста заметки читаются только с основных баз."""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
@@ -0,0 +1,88 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .replicas import primary_of, read_alias, replica_aliases
+from .sharding import (
+    SHARDED_MODELS, migrating_database, note_databases, shard_for,
+    sharding_enabled,
+)
+
+
+def _is_sharded(model):
+    return (
+        model._meta.app_label == 'notes'
+        and model._meta.model_name in SHARDED_MODELS
+    )
+
+
+class ShardRouter:
+    """
+    Кладёт заметки, надгробия и счётчик изменений в шард автора.
+
+    Шард выводится из подсказок: ``author``, которую ставит
+    Note.objects.for_author(), или ``instance`` — у заметки и надгробия
+    по author_id, у пользователя (``user.note_set``) по его id. Запросы
+    без подсказок роутер угадать не может, кроме как во время migrate:
+    миграции данных работают с той базой, которую мигрируют. Всё
+    остальное, включая пользователей и каталог slug, живёт в default.
+    """
+
+    def _db(self, model, instance=None, author=None, **hints):
+        if not _is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        if author is None and instance is not None:
+            author = getattr(instance, 'author_id', None)
+            if author is None and not _is_sharded(instance.__class__):
+                author = instance.pk
+        if author is None:
+            migrating = migrating_database()
+            if migrating is not None:
+                return migrating
+            return None if sharding_enabled() else DEFAULT_DB_ALIAS
+        return shard_for(author)
+
+    db_for_read = _db
+    db_for_write = _db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Заметка в шарде ссылается на автора из default.
+        if _is_sharded(obj1.__class__) or _is_sharded(obj2.__class__):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in note_databases():
+            return None
+        return app_label == 'notes' and (
+            model_name is None or model_name in SHARDED_MODELS
+        )
+
+
+class ReplicaRouter(ShardRouter):
+    """
+    Читает заметки с реплик, пишет и читает остальное с основных баз.
+
+    Основная база выбирается так же, как в ShardRouter, а чтение заметок
+    уходит на живую реплику из NOTES_REPLICAS. Пользователи и сессии
+    всегда читаются с основной базы: устаревшая сессия разлогинила бы
+    пользователя. Реплики не мигрируют: это копии основных баз, и
+    миграции данных читают саму мигрируемую базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        primary = super().db_for_read(model, **hints)
+        if (
+            primary is None or not _is_sharded(model)
+            or migrating_database() is not None
+        ):
+            return primary
+        return read_alias(primary)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if primary_of(obj1._state.db) == primary_of(obj2._state.db):
+            return True
+        return super().allow_relation(obj1, obj2, **hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return super().allow_migrate(db, app_label, model_name, **hints)
@@ -0,0 +1,332 @@
+import re
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Note
+from .pagination import (
+    NEXT, PREV, KeysetPage, decode_rank_cursor, keyset_page,
+)
+from .sharding import shard_for
+
+# Индекс FTS5 без собственного содержимого: он хранит только токены, а
+# текст для подсветки берётся из самих заметок. Столбец author хранит id
+# автора одним токеном: условие на него входит в MATCH, и FTS5 перебирает
+# только заметки автора, а не совпадения по всем пользователям. Длинный
+# текст хранится сжатым, и триггеры отдают его индексу через функцию
+# notes_text(), которую notes.compression регистрирует в соединениях
+# Django. Поэтому писать в notes_note можно только через соединения
+# Django: в sqlite3, dbshell или утилитах резервного копирования INSERT,
+# UPDATE и DELETE заметок падают с «no such function: notes_text».
+FTS_TABLE = 'notes_note_fts'
+# Представление-источник прежней версии индекса: оно мешало миграциям
+# пересоздавать notes_note и удаляется вместе с индексом.
+LEGACY_FTS_CONTENT = 'notes_note_fts_content'
+
+# Маркеры подсветки: управляющие символы не встречаются в тексте заметок,
+# поэтому их можно безопасно заменить на теги уже после экранирования.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SEARCH_TRIGGERS = {
+    'notes_note_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS notes_note_fts_ai
+        AFTER INSERT ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, author, title, text)
+            VALUES (new.id, new.author_id, new.title, notes_text(new.text));
+        END
+    """,
+    'notes_note_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS notes_note_fts_ad
+        AFTER DELETE ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, author, title, text)
+            VALUES ('delete', old.id, old.author_id, old.title,
+                    notes_text(old.text));
+        END
+    """,
+    'notes_note_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS notes_note_fts_au
+        AFTER UPDATE OF author_id, title, text ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, author, title, text)
+            VALUES ('delete', old.id, old.author_id, old.title,
+                    notes_text(old.text));
+            INSERT INTO {FTS_TABLE}(rowid, author, title, text)
+            VALUES (new.id, new.author_id, new.title, notes_text(new.text));
+        END
+    """,
+}
+
+CREATE_FTS_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        author, title, text, content='',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+INDEX_NOTES_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, author, title, text)
+    SELECT id, author_id, title, notes_text(text)
+    FROM notes_note WHERE id > %s
+"""
+
+# Сколько слов текста показывать во фрагменте с совпадением и сколько
+# из них — до совпадения.
+SNIPPET_WORDS = 24
+SNIPPET_LEAD_WORDS = 3
+WORD_RE = re.compile(r'\w+')
+
+# Ранг совпадения: заголовок весит больше текста, столбец автора не
+# учитывается вовсе.
+SEARCH_RANK = f'bm25({FTS_TABLE}, 0.0, 10.0, 1.0)'
+
+# Страницы выбираются по ключу (ранг, id) без OFFSET: подстановка
+# {keyset} сравнивает пару с курсором, {order} задаёт направление.
+SEARCH_SQL = f"""
+    SELECT notes_note.id, notes_note.slug, notes_note.title,
+           notes_note.author_id, notes_note.text,
+           {SEARCH_RANK} AS search_rank
+    FROM {FTS_TABLE}
+    JOIN notes_note ON notes_note.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH %s AND notes_note.author_id = %s
+      AND notes_note.deleted_at IS NULL {{keyset}}
+    ORDER BY search_rank {{order}}, notes_note.id {{order}}
+    LIMIT %s
+"""
+SEARCH_KEYSET = {
+    NEXT: f'AND ({SEARCH_RANK}, notes_note.id) > (%s, %s)',
+    PREV: f'AND ({SEARCH_RANK}, notes_note.id) < (%s, %s)',
+}
+
+
+def install_search_index(connection):
+    """
+    Создаёт FTS5-индекс и триггеры синхронизации, если их ещё нет.
+
+    SQLite пересоздаёт таблицу notes_note при некоторых миграциях и теряет
+    при этом триггеры, поэтому функция вызывается и после каждого migrate.
+    Если чего-то не хватало, индекс перестраивается по notes_note целиком.
+    Для других СУБД ничего не делает.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name = %s "
+            "OR (type = 'trigger' AND tbl_name = 'notes_note')",
+            [FTS_TABLE],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [
+            name for name in (FTS_TABLE, *SEARCH_TRIGGERS)
+            if name not in existing
+        ]
+        if not missing:
+            return False
+        cursor.execute(CREATE_FTS_TABLE)
+        for sql in SEARCH_TRIGGERS.values():
+            cursor.execute(sql)
+        # У индекса без содержимого нет команды rebuild.
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+        )
+        cursor.execute(INDEX_NOTES_SQL, [0])
+    return True
+
+
+def uninstall_search_index(connection):
+    """Удаляет FTS5-индекс и его триггеры."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in SEARCH_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        cursor.execute(f'DROP VIEW IF EXISTS {LEGACY_FTS_CONTENT}')
+
+
+def reinstall_search_index(connection):
+    """Пересоздаёт FTS5-индекс в текущем виде, каким бы он ни был."""
+    uninstall_search_index(connection)
+    install_search_index(connection)
+
+
+def drop_search_content(connection):
+    """
+    Удаляет представление-источник прежней версии индекса перед migrate.
+
+    Django пересоздаёт notes_note в SQLite через переименование таблицы,
+    а SQLite не переименует её, пока на неё ссылается представление. Оно
+    осталось только в базах, мигрированных до 0012_search_index_contentless.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP VIEW IF EXISTS {LEGACY_FTS_CONTENT}')
+
+
+@contextmanager
+def bulk_indexing(connection):
+    """
+    Отключает построчную индексацию вставок на время массовой загрузки.
+
+    Триггер на INSERT удаляется внутри транзакции, а после загрузки все
+    новые строки попадают в FTS5 одним INSERT ... SELECT, что в разы
+    быстрее построчных триггеров. Вызывать внутри transaction.atomic():
+    DDL в SQLite транзакционна, и при ошибке триггер вернётся откатом.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TRIGGER IF EXISTS notes_note_fts_ai')
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM notes_note')
+        (last_id,) = cursor.fetchone()
+    yield
+    with connection.cursor() as cursor:
+        cursor.execute(INDEX_NOTES_SQL, [last_id])
+        cursor.execute(SEARCH_TRIGGERS['notes_note_fts_ai'])
+
+
+def build_match_query(query):
+    """
+    Превращает пользовательский ввод в безопасное FTS5-выражение.
+
+    Каждое слово берётся в кавычки и ищется по префиксу, слова
+    объединяются через AND. Синтаксис FTS5 из ввода не пропускается.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def author_match_query(author, match):
+    """
+    Ограничивает FTS5-выражение заметками автора.
+
+    Слова запроса ищутся только в заголовке и тексте, иначе число из
+    запроса совпало бы с id автора в чужих заметках.
+    """
+    return f'author : "{author.pk}" AND {{title text}} : ({match})'
+
+
+def _highlight(value):
+    """Экранирует текст и превращает маркеры подсветки в <mark>."""
+    return mark_safe(
+        escape(value or '')
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+@lru_cache(maxsize=1)
+def _fold_table():
+    """
+    Таблица для str.translate, снимающая диакритику, как токенизатор.
+
+    Каждый символ заменяется ровно одним, поэтому позиции совпадений в
+    преобразованной строке годятся и для исходной.
+    """
+    table = {}
+    for code in range(0xC0, 0x2000):
+        base = unicodedata.normalize('NFD', chr(code))[0]
+        if base != chr(code):
+            table[code] = base
+    return table
+
+
+def _match_pattern(query):
+    """Слова запроса по префиксу, без учёта регистра и диакритики."""
+    words = [
+        re.escape(word.translate(_fold_table()))
+        for word in re.findall(r'\w+', query)
+    ]
+    return re.compile(rf'(?<!\w)(?:{"|".join(words)})\w*', re.IGNORECASE)
+
+
+def _mark(text, pattern):
+    """Обрамляет совпадения маркерами подсветки."""
+    folded = text.translate(_fold_table())
+    parts, last = [], 0
+    for match in pattern.finditer(folded):
+        parts += [
+            text[last:match.start()], MARK_START,
+            text[match.start():match.end()], MARK_END,
+        ]
+        last = match.end()
+    parts.append(text[last:])
+    return ''.join(parts)
+
+
+def _snippet(text, pattern):
+    """
+    Фрагмент текста вокруг первого совпадения с подсвеченными словами.
+
+    Индекс FTS5 не хранит текст, поэтому фрагмент строится здесь, по
+    распакованному тексту заметки со страницы результатов.
+    """
+    match = pattern.search(text.translate(_fold_table()))
+    start = match.start() if match else 0
+    lead = list(WORD_RE.finditer(text, max(0, start - 200), start))
+    begin = lead[-SNIPPET_LEAD_WORDS:][0].start() if lead else start
+    end = begin
+    for count, word in enumerate(WORD_RE.finditer(text, begin), 1):
+        end = word.end()
+        if count == SNIPPET_WORDS:
+            break
+    fragment = _mark(text[begin:end], pattern)
+    prefix = '…' if text[:begin].strip() else ''
+    suffix = '…' if text[end:].strip() else ''
+    return f'{prefix}{fragment}{suffix}'
+
+
+def search_notes(author, query, limit, cursor=None):
+    """
+    Ищет заметки автора по заголовку и тексту, лучшие совпадения первыми.
+
+    Возвращает KeysetPage: курсор страницы хранит ранг и id её крайней
+    заметки, и каждая следующая страница стоит столько же, сколько первая.
+    У найденных заметок заполнены атрибуты ``title_highlight`` и
+    ``text_snippet`` с уже экранированной подсветкой совпадений.
+    """
+    match = build_match_query(query)
+    if not match:
+        return KeysetPage([])
+    direction, key = decode_rank_cursor(cursor) if cursor else (NEXT, None)
+    alias = shard_for(author)
+    if connections[alias].vendor != 'sqlite':
+        notes = _search_fallback(author, query, limit, direction, key)
+    else:
+        sql = SEARCH_SQL.format(
+            keyset=SEARCH_KEYSET[direction] if key else '',
+            order='DESC' if direction == PREV else 'ASC',
+        )
+        notes = list(Note.objects.db_manager(alias).raw(sql, [
+            author_match_query(author, match), author.pk,
+            *(key or ()), limit + 1,
+        ]))
+    pattern = _match_pattern(query)
+    for note in notes:
+        note.search_key = f'{note.search_rank!r}:{note.pk}'
+        note.title_highlight = _highlight(_mark(note.title, pattern))
+        note.text_snippet = _highlight(_snippet(note.text, pattern))
+    return keyset_page(notes, limit, direction, key, 'search_key')
+
+
+def _search_fallback(author, query, limit, direction, key):
+    """Поиск без FTS5 для СУБД, отличных от SQLite: без ранга, по id."""
+    condition = Q()
+    for word in re.findall(r'\w+', query):
+        condition &= Q(title__icontains=word) | Q(text__icontains=word)
+    notes = Note.objects.for_author(author).filter(condition)
+    if direction == PREV:
+        notes = notes.filter(id__lt=key[1]).order_by('-id')
+    else:
+        notes = notes.filter(id__gt=key[1] if key else 0).order_by('id')
+    notes = list(notes[:limit + 1])
+    for note in notes:
+        note.search_rank = 0.0
+    return notes
@@ -0,0 +1,99 @@
+import hashlib
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Модели, строки которых живут в шарде автора, а не в default.
+SHARDED_MODELS = frozenset({'note', 'notetombstone', 'changecounter'})
+# Ширина диапазона id заметок у каждого шарда: шард номер i выдаёт id
+# начиная с i * SHARD_ID_SPAN, поэтому id заметок уникальны между шардами.
+SHARD_ID_SPAN = 10 ** 12
+NOTE_TABLE = 'notes_note'
+
+# База, которую сейчас мигрирует manage.py migrate. Миграции данных пишут
+# через Model.objects без подсказок, и роутер отправляет такие запросы к
+# заметкам в мигрируемую базу, а не в default.
+_migrating = ContextVar('notes_migrating', default=None)
+
+
+def sharding_enabled():
+    return bool(settings.NOTES_SHARDS)
+
+
+def note_databases():
+    """Базы, в которых лежат заметки: шарды или одна default."""
+    return list(settings.NOTES_SHARDS) or [DEFAULT_DB_ALIAS]
+
+
+def migrating_database():
+    """Алиас базы, которую мигрирует текущий migrate, или None."""
+    return _migrating.get()
+
+
+def start_migrating(alias):
+    _migrating.set(alias)
+
+
+def stop_migrating():
+    _migrating.set(None)
+
+
+def _weight(alias, author_id):
+    digest = hashlib.blake2b(
+        f'{alias}:{author_id}'.encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'big')
+
+
+@lru_cache(maxsize=65536)
+def _rendezvous(shards, author_id):
+    return max(shards, key=lambda alias: _weight(alias, author_id))
+
+
+def shard_for(author):
+    """
+    Алиас базы с заметками автора: пользователя или его id.
+
+    Шард выбирается rendezvous-хэшированием: у каждой пары «шард, автор»
+    есть стабильный вес, автору достаётся шард с наибольшим. Добавление
+    шарда переносит к нему только ~1/N авторов, остальные остаются на
+    месте, а перенос выполняет manage.py rebalance_shards.
+    """
+    shards = tuple(settings.NOTES_SHARDS)
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    return _rendezvous(shards, getattr(author, 'pk', author))
+
+
+def reserve_id_range(connection):
+    """
+    Сдвигает автоинкремент заметок шарда в его диапазон id.
+
+    Работает для SQLite: в sqlite_sequence записывается начало диапазона,
+    если автоинкремент до него ещё не дошёл.
+    """
+    if (
+        connection.alias not in settings.NOTES_SHARDS
+        or connection.vendor != 'sqlite'
+    ):
+        return
+    start = settings.NOTES_SHARDS.index(connection.alias) * SHARD_ID_SPAN
+    if not start:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [NOTE_TABLE]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [NOTE_TABLE, start],
+            )
+        elif row[0] < start:
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = %s WHERE name = %s',
+                [start, NOTE_TABLE],
+            )
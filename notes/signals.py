@@ -0,0 +1,57 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import user_cache
+from .cache import invalidate_user_pages
+from .models import Note, NoteTombstone
+from .sharding import shard_for
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_author_pages(sender, instance, using, **kwargs):
+    """
+    Любое изменение заметки сбрасывает кэш страниц её автора.
+
+    Сброс повторяется после коммита: иначе параллельный запрос успел бы
+    закэшировать ещё не изменённые данные под новым поколением.
+    """
+    invalidate_user_pages(instance.author_id)
+    transaction.on_commit(
+        partial(invalidate_user_pages, instance.author_id), using=using
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(sender, instance, **kwargs):
+    """Смена пароля и любая правка пользователя сбрасывают его кэш."""
+    user_cache.discard(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_sharded_notes(sender, instance, using, **kwargs):
+    """
+    Удаляет заметки пользователя из его шарда.
+
+    Каскад Django удаляет связанные строки только в базе пользователя,
+    а заметки из других шардов сюда не видны.
+    """
+    shard = shard_for(instance)
+    if shard == using:
+        return
+    for model in (Note, NoteTombstone):
+        model.objects.using(shard).filter(author_id=instance.pk)._raw_delete(
+            shard
+        )
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        user_cache.discard(user.pk)
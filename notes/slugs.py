@@ -0,0 +1,166 @@
+import re
+from functools import lru_cache
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length
+from pytils.translit import slugify
+
+# Сколько раз пробовать сохранить заметку, если конкурент успел занять slug.
+MAX_ATTEMPTS = 5
+# Место, которое оставляется под суффикс вида «-12345» у длинных slug.
+SUFFIX_RESERVE = 6
+# Slug для заголовков, из которых транслитерация ничего не оставила.
+FALLBACK_SLUG = 'note'
+# Тексты IntegrityError от уникальных индексов slug: заметок в шарде и
+# каталога NoteSlug (его конфликт NoteSlug.claim() поднимает сам).
+SLUG_CONFLICTS = frozenset(
+    f'UNIQUE constraint failed: {table}.slug'
+    for table in ('notes_note', 'notes_noteslug')
+)
+
+
+@lru_cache(maxsize=4096)
+def transliterate(title):
+    """Транслитерирует заголовок в slug, запоминая результат."""
+    return slugify(title)
+
+
+def is_slug_conflict(error):
+    """
+    Проверяет, что IntegrityError вызвана повтором slug.
+
+    Сравнивается весь текст ошибки: подстрока «slug» нашлась бы и в
+    ошибках других ограничений, чьё имя её содержит.
+    """
+    return str(error) in SLUG_CONFLICTS
+
+
+class SlugAllocator:
+    """
+    Подбирает свободные slug вида «todo», «todo-2», «todo-3».
+
+    Сначала проверяется slug без номера: если он свободен, выдаётся он,
+    даже когда заняты номерные варианты. Иначе наибольший занятый номер
+    для основы узнаётся одним запросом по диапазону уникального индекса
+    и дальше учитывается в памяти, поэтому пачка заметок с одинаковым
+    заголовком стоит два запроса, а не по запросу на каждого кандидата.
+    Для пачки разных заголовков ``prefetch`` одним запросом выясняет,
+    какие slug без номера свободны.
+    """
+
+    def __init__(self, model, exclude_pk=None, using=None, owner='pk',
+                 condition=None):
+        self.model = model
+        self.exclude_pk = exclude_pk
+        self.using = using
+        self.owner = owner
+        # Какие строки держат slug: условие частичного уникального индекса.
+        self.condition = condition
+        self.max_length = model._meta.get_field('slug').max_length
+        self._highest = {}
+        self._free = set()
+        # Slug без номера, занятые в БД или уже выданные.
+        self._taken = set()
+
+    def _queryset(self):
+        queryset = self.model._default_manager.db_manager(self.using).all()
+        if self.condition is not None:
+            queryset = queryset.filter(self.condition)
+        if self.exclude_pk is not None:
+            queryset = queryset.exclude(**{self.owner: self.exclude_pk})
+        return queryset
+
+    def _split(self, base):
+        """Возвращает slug без номера и основу для номерных вариантов."""
+        bare = base[:self.max_length] or FALLBACK_SLUG
+        return bare, bare[:self.max_length - SUFFIX_RESERVE]
+
+    def _bare_taken(self, bare):
+        """Проверяет, занят ли slug без номера."""
+        return self._queryset().filter(slug=bare).exists()
+
+    def _load(self, stem):
+        """
+        Находит наибольший занятый номер для основы одним запросом.
+
+        Кандидаты сортируются в БД по длине и значению, поэтому самый
+        большой номер обычно приходит первой же строкой и остальные
+        slug основы не читаются. Slug без номера считается номером 1.
+        """
+        numbered = re.compile(rf'{re.escape(stem)}-(\d+)')
+        slugs = self._queryset().filter(
+            slug__gte=f'{stem}-', slug__lt=f'{stem}.'
+        ).order_by(Length('slug').desc(), '-slug').values_list(
+            'slug', flat=True
+        )
+        for slug in slugs.iterator(chunk_size=100):
+            if match := numbered.fullmatch(slug):
+                return max(1, int(match[1]))
+        return 1
+
+    def prefetch(self, bases):
+        """
+        Одним запросом узнаёт, какие slug без номера свободны.
+
+        Свободный slug выдаётся без запроса номеров; номера для основы
+        загружаются, только если slug без номера уже занят.
+        """
+        bares = {
+            self._split(base)[0] for base in bases
+        } - self._free - self._taken
+        taken = set(
+            self._queryset().filter(slug__in=bares)
+            .values_list('slug', flat=True)
+        )
+        self._free |= bares - taken
+        self._taken |= taken
+
+    def allocate(self, base):
+        """Возвращает первый свободный slug для основы ``base``."""
+        bare, stem = self._split(base)
+        if bare not in self._free and bare not in self._taken:
+            if self._bare_taken(bare):
+                self._taken.add(bare)
+            else:
+                self._free.add(bare)
+        if bare in self._free:
+            self._free.discard(bare)
+            self._taken.add(bare)
+            return bare
+        if bare not in self._highest:
+            self._highest[bare] = self._load(stem)
+        number = self._highest[bare] = self._highest[bare] + 1
+        return f'{stem}-{number}'
+
+    def forget(self, base):
+        """Сбрасывает запомненное об основе, чтобы перечитать её из БД."""
+        bare = self._split(base)[0]
+        self._highest.pop(bare, None)
+        self._free.discard(bare)
+        self._taken.discard(bare)
+
+
+def save_with_unique_slug(note, save, *args, allocator=None, **kwargs):
+    """
+    Сохраняет заметку со slug, подобранным по заголовку.
+
+    Вместо проверки «есть ли такой slug» перед записью заметка сразу
+    сохраняется, а уникальность гарантирует индекс: при конфликте с
+    параллельной записью номера перечитываются и попытка повторяется.
+    """
+    if allocator is None:
+        allocator = SlugAllocator(
+            type(note), exclude_pk=note.pk, using=kwargs.get('using')
+        )
+    base = transliterate(note.title)
+    for attempt in range(MAX_ATTEMPTS):
+        note.slug = allocator.allocate(base)
+        try:
+            with transaction.atomic(using=kwargs.get('using')):
+                save(*args, **kwargs)
+            return
+        except IntegrityError as error:
+            if not is_slug_conflict(error) or attempt == MAX_ATTEMPTS - 1:
+                note.slug = ''
+                raise
+            allocator.forget(base)
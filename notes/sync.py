@@ -0,0 +1,54 @@
+from .batch import note_as_dict
+from .models import Note, NoteTombstone
+from .sharding import shard_for
+
+# Сколько изменений отдавать за один запрос синхронизации.
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+def parse_token(token):
+    """Токен — номер последнего полученного изменения; пустой значит 0."""
+    if not token:
+        return 0
+    seq = int(token)
+    if seq < 0:
+        raise ValueError('Токен не может быть отрицательным.')
+    return seq
+
+
+def changes_since(author, since, limit=DEFAULT_LIMIT):
+    """
+    Изменения заметок автора с номером больше ``since``.
+
+    Заметки и надгробия выбираются по индексу (author, change_seq) не
+    больше чем по ``limit + 1`` строк, поэтому стоимость запроса зависит
+    от числа изменений, а не от числа заметок. Изменённая несколько раз
+    заметка приходит один раз, в последней версии. Заметка в корзине
+    приходит удалённой, восстановленная — снова заметкой.
+    """
+    notes = [
+        (note.change_seq, note if note.deleted_at is None else note.pk)
+        for note in Note.objects.for_author(author, trashed=None).filter(
+            change_seq__gt=since
+        ).order_by('change_seq')[:limit + 1]
+    ]
+    tombstones = list(
+        NoteTombstone.objects.using(shard_for(author))
+        .filter(author=author, change_seq__gt=since)
+        .order_by('change_seq')
+        .values_list('change_seq', 'note_id')[:limit + 1]
+    )
+    changes = sorted(notes + tombstones, key=lambda change: change[0])
+    page = changes[:limit]
+    return {
+        'notes': [
+            {**note_as_dict(note), 'change_seq': seq}
+            for seq, note in page if isinstance(note, Note)
+        ],
+        'deleted': [
+            note_id for _, note_id in page if not isinstance(note_id, Note)
+        ],
+        'token': str(page[-1][0] if page else since),
+        'has_more': len(changes) > limit,
+    }
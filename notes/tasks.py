@@ -0,0 +1,151 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from .export import CHUNK_SIZE, EXPORT_FORMATS, iter_rows
+from .importer import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, import_notes
+from .jobs import job, job_file
+from .models import Job, Note
+from .purge import delete_in_batches, expire_trash, purge_user
+from .rendering import RENDERER_VERSION, render_note
+from .sharding import note_databases
+
+# Сколько заметок перерисовывать за раз.
+RENDER_BATCH_SIZE = 500
+
+
+def _counted(items, task, every, total=None):
+    """Пропускает ``items`` насквозь, отчитываясь о ходе каждые ``every``."""
+    count = 0
+    for count, item in enumerate(items, 1):
+        if count % every == 0:
+            task.report(count, total)
+        yield item
+    task.report(count, total)
+
+
+def render_stale(batch_size=RENDER_BATCH_SIZE, progress=None):
+    """
+    Перерисовывает HTML заметок, отрисованных прежней версией рендерера.
+
+    ``progress`` получает число перерисованных заметок после каждой
+    пачки. Возвращает число перерисованных заметок.
+    """
+    rendered = 0
+    for using in note_databases():
+        notes = Note.objects.using(using)
+        stale = notes.exclude(html_version=RENDERER_VERSION)
+        last_id = 0
+        while batch := list(
+            stale.filter(id__gt=last_id).order_by('id')
+            .only('id', 'text')[:batch_size]
+        ):
+            for note in batch:
+                note.html = render_note(note.text)
+                note.html_version = RENDERER_VERSION
+            # bulk_update не трогает версию и номер изменения заметки.
+            notes.bulk_update(batch, ('html', 'html_version'))
+            rendered += len(batch)
+            last_id = batch[-1].id
+            if progress is not None:
+                progress(rendered)
+    return rendered
+
+
+@job('export_notes')
+def export_notes_job(task, export_format):
+    """Выгружает заметки владельца задачи в файл для скачивания."""
+    export, content_type, extension = EXPORT_FORMATS[export_format]
+    total = Note.objects.for_author(task.user).count()
+    name = f'export-{task.pk}.{extension}'
+    with open(job_file(name), 'wb') as stream:
+        for chunk in export(_counted(
+            iter_rows(task.user), task, CHUNK_SIZE, total
+        )):
+            stream.write(chunk)
+    return {
+        'file': name,
+        'filename': f'notes.{extension}',
+        'content_type': content_type,
+        'count': total,
+    }
+
+
+# Повтор дописал бы заметки, уже импортированные до сбоя, второй раз.
+@job('import_notes', max_attempts=1)
+def import_notes_job(task, upload, import_format,
+                     batch_size=DEFAULT_BATCH_SIZE):
+    """Импортирует заметки владельцу задачи из загруженного файла."""
+    path = job_file(upload)
+    try:
+        with open(path, newline='', encoding='utf-8') as stream:
+            stats = import_notes(
+                task.user,
+                _counted(
+                    IMPORT_FORMATS[import_format](stream), task, batch_size
+                ),
+                batch_size,
+            )
+    finally:
+        path.unlink(missing_ok=True)
+    return {
+        'count': stats.count,
+        'seconds': round(stats.seconds, 2),
+        'skipped': stats.skipped,
+        'skipped_rows': [
+            {'row': row, 'reason': reason}
+            for row, reason in stats.skipped_rows
+        ],
+    }
+
+
+@job('purge_user')
+def purge_user_job(task, user_id):
+    """Удаляет пользователя с заметками; владелец задачи — кто удаляет."""
+    total = Note.objects.for_author(user_id, trashed=None).count()
+    return {
+        'deleted': purge_user(
+            user_id, progress=lambda deleted: task.report(deleted, total)
+        ),
+    }
+
+
+@job('render_notes')
+def render_notes_job(task, batch_size=RENDER_BATCH_SIZE):
+    return {'rendered': render_stale(batch_size, progress=task.report)}
+
+
+@job('expire_trash')
+def expire_trash_job(task):
+    return {'expired': expire_trash(progress=task.report)}
+
+
+def _drop_job_files(jobs, using):
+    """Удаляет файлы результатов задач перед удалением их строк."""
+    for result in jobs.exclude(result=None).values_list('result', flat=True):
+        if isinstance(result, dict) and 'file' in result:
+            job_file(result['file']).unlink(missing_ok=True)
+
+
+@job('expire_jobs')
+def expire_jobs_job(task):
+    """
+    Удаляет завершённые задачи старше NOTES_JOB_KEEP_DAYS и их файлы.
+
+    Строки удаляются пачками через delete_in_batches(), и после каждой
+    пачки задача отчитывается: иначе долгая очистка выглядела бы
+    зависшей, и requeue_stale() запустил бы её второй раз.
+    """
+    finished = Job.objects.filter(
+        status__in=(Job.Status.DONE, Job.Status.FAILED),
+        finished_at__lt=timezone.now() - timedelta(
+            days=settings.NOTES_JOB_KEEP_DAYS
+        ),
+    )
+    return {'expired': delete_in_batches(
+        finished, DEFAULT_DB_ALIAS, settings.NOTES_PURGE_BATCH_SIZE,
+        settings.NOTES_PURGE_MAX_LOCK_SECONDS,
+        before_delete=_drop_job_files, progress=task.report,
+    )}
@@ -1,4 +1,8 @@
+import os
+import unittest
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
 
@@ -6,6 +10,13 @@ from notes.models import Note
 
 User = get_user_model()
 
+# Долгие замеры на сотнях тысяч заметок запускаются только по запросу:
+# NOTES_HEAVY_TESTS=1 python manage.py test notes
+heavy = unittest.skipUnless(
+    os.environ.get('NOTES_HEAVY_TESTS') == '1',
+    'тяжёлая проверка, включается NOTES_HEAVY_TESTS=1',
+)
+
 
 class BaseTestCase(TestCase):
     """Базовый тест-кейс с общими фикстурами и URL."""
@@ -34,6 +45,7 @@ class BaseTestCase(TestCase):
         cls.home_url = reverse('notes:home')
         cls.signup_url = reverse('users:signup')
         cls.logout_url = reverse('users:logout')
+        cls.search_url = reverse('notes:search')
         cls.note = Note.objects.create(
             title='Author note', text='Some text', author=cls.author
         )
@@ -43,3 +55,7 @@ class BaseTestCase(TestCase):
         cls.detail_url = reverse('notes:detail', args=(cls.note.slug,))
         cls.edit_url = reverse('notes:edit', args=(cls.note.slug,))
         cls.delete_url = reverse('notes:delete', args=(cls.note.slug,))
+
+    def setUp(self):
+        # Откат транзакции теста не откатывает кэш страниц.
+        cache.clear()
@@ -0,0 +1,129 @@
+import threading
+import unittest
+from http import HTTPStatus
+from unittest import mock
+
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+
+from notes import async_views, views
+from notes.models import Note
+from notes.tests.base import BaseTestCase
+from notes.urls import note_urlpatterns
+from yanote.urls import auth_urls
+
+urlpatterns = [
+    path('', include(([
+        path('', views.Home.as_view(), name='home'),
+        *note_urlpatterns(async_views),
+        path('search/', views.NoteSearch.as_view(), name='search'),
+        path('trash/', views.NoteTrash.as_view(), name='trash'),
+        path('done/', views.NoteSuccess.as_view(), name='success'),
+    ], 'notes'))),
+    path('auth/', include(auth_urls)),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTests(BaseTestCase):
+    """Асинхронные представления ведут себя так же, как синхронные."""
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.author)
+
+    async def test_pages_available_for_author(self):
+        """Автору доступны список, заметка, правка и удаление."""
+        for url in (
+            self.list_url, self.add_url, self.detail_url,
+            self.edit_url, self.delete_url,
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    async def test_anonymous_redirected_to_login(self):
+        """Аноним перенаправляется на страницу логина."""
+        response = await AsyncClient().get(self.list_url)
+        self.assertRedirects(
+            response, f'{self.login_url}?next={self.list_url}',
+            fetch_redirect_response=False,
+        )
+
+    async def test_foreign_note_not_found(self):
+        """Чужая заметка для автора не существует."""
+        url = self.detail_url.replace(self.note.slug, self.readers_note.slug)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    async def test_templates_render_off_event_loop(self):
+        """Шаблоны рендерятся в потоке, а не в цикле событий."""
+        loop_thread = threading.current_thread()
+        threads = []
+        real_render = async_views.render_to_string
+
+        def render(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return real_render(*args, **kwargs)
+
+        with mock.patch.object(async_views, 'render_to_string', render):
+            for url in (self.list_url, self.add_url, self.detail_url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_list_contains_only_own_notes(self):
+        response = await self.async_client.get(self.list_url)
+        object_list = list(response.context['object_list'])
+        self.assertEqual(object_list, [self.note])
+
+    async def test_unchanged_detail_returns_304(self):
+        response = await self.async_client.get(self.detail_url)
+        response = await self.async_client.get(
+            self.detail_url, headers={'if-none-match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    async def test_create_edit_delete(self):
+        """Создание, правка и удаление проходят через async ORM."""
+        response = await self.async_client.post(
+            self.add_url, {'title': 'Новая', 'text': 'Текст'}
+        )
+        self.assertRedirects(
+            response, self.success_url, fetch_redirect_response=False
+        )
+        note = await Note.objects.aget(author=self.author, title='Новая')
+        self.assertEqual(note.slug, 'novaya')
+        await self.async_client.post(
+            self.edit_url,
+            {
+                'title': 'Другая', 'text': 'Правка', 'slug': self.note.slug,
+                'version': self.note.version,
+            },
+        )
+        await self.note.arefresh_from_db()
+        self.assertEqual(self.note.text, 'Правка')
+        await self.async_client.post(self.delete_url)
+        self.assertFalse(
+            await Note.objects.for_author(self.author).filter(
+                pk=self.note.pk
+            ).aexists()
+        )
+
+    async def test_stale_edit_conflicts(self):
+        await self.async_client.post(self.edit_url, {
+            'title': 'Первая', 'text': 'Раз', 'slug': self.note.slug,
+            'version': 1,
+        })
+        response = await self.async_client.post(self.edit_url, {
+            'title': 'Вторая', 'text': 'Два', 'slug': self.note.slug,
+            'version': 1,
+        })
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        await self.note.arefresh_from_db()
+        self.assertEqual(self.note.title, 'Первая')
+
+
+if __name__ == '__main__':
+    unittest.main()
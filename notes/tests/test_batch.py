@@ -0,0 +1,193 @@
+import json
+import unittest
+from http import HTTPStatus
+from unittest import mock
+
+from django.urls import reverse
+
+from notes.batch import NoteBatch
+from notes.forms import WARNING
+from notes.models import Note
+from notes.tests.base import BaseTestCase
+
+
+class BatchApiTests(BaseTestCase):
+    """Проверки JSON API пакетных операций."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.batch_url = reverse('notes:batch')
+
+    def post(self, operations, client=None):
+        return (client or self.author_client).post(
+            self.batch_url,
+            json.dumps({'operations': operations}),
+            content_type='application/json',
+        )
+
+    def test_mixed_operations_applied(self):
+        """Создание, правка и удаление выполняются одним запросом."""
+        second = Note.objects.create(
+            title='Second', text='Text', author=self.author
+        )
+        response = self.post([
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст'},
+            {'op': 'update', 'id': self.note.pk, 'text': 'Правка'},
+            {'op': 'delete', 'id': second.pk},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        created, updated, deleted = response.json()['results']
+        self.assertEqual(created['status'], 'created')
+        self.assertEqual(created['note']['slug'], 'novaya')
+        self.assertEqual(updated['note']['version'], 2)
+        self.assertEqual(deleted, {'status': 'deleted', 'id': second.pk})
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.text, 'Правка')
+        self.assertEqual(self.note.title, 'Author note')
+        self.assertEqual(self.note.version, 2)
+        self.assertFalse(Note.objects.for_author(self.author).filter(
+            pk=second.pk
+        ).exists())
+
+    def test_delete_moves_note_to_trash(self):
+        """Удаление в пакете переносит заметку в корзину, как и форма."""
+        response = self.post([{'op': 'delete', 'id': self.note.pk}])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        trashed = Note.objects.for_author(self.author, trashed=True).get()
+        self.assertEqual(trashed.pk, self.note.pk)
+        self.assertGreater(trashed.change_seq, self.note.change_seq)
+        response = self.post([
+            {'op': 'create', 'text': 'Новая', 'slug': self.note.slug},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_stale_version_is_conflict(self):
+        """Операция с устаревшей версией отменяет пакет с ответом 409."""
+        response = self.post([
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст'},
+            {'op': 'update', 'id': self.note.pk, 'text': 'Правка',
+             'version': self.note.version + 1},
+            {'op': 'delete', 'id': self.note.pk, 'version': 5},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        skipped, updated, deleted = response.json()['results']
+        self.assertEqual(skipped, {'status': 'skipped'})
+        self.assertEqual(updated['status'], 'conflict')
+        self.assertEqual(updated['note']['text'], self.note.text)
+        self.assertEqual(updated['note']['version'], self.note.version)
+        self.assertEqual(deleted['status'], 'conflict')
+        self.assertFalse(Note.objects.filter(title='Новая').exists())
+        response = self.post([
+            {'op': 'update', 'id': self.note.pk, 'text': 'Правка',
+             'version': self.note.version},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['note']['version'], 2)
+
+    def test_invalid_version_is_error(self):
+        for version in ('1', 0, True, None):
+            with self.subTest(version=version):
+                response = self.post([
+                    {'op': 'update', 'id': self.note.pk, 'version': version},
+                ])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertIn(
+                    'version', response.json()['results'][0]['errors']
+                )
+
+    def test_note_changed_after_load_is_conflict(self):
+        """Правка между загрузкой и записью откатывает пакет целиком."""
+        load = NoteBatch._load
+
+        def load_then_edit(batch):
+            load(batch)
+            Note.objects.filter(pk=self.note.pk).update(version=5)
+
+        with mock.patch.object(NoteBatch, '_load', load_then_edit):
+            response = self.post([
+                {'op': 'update', 'id': self.note.pk, 'text': 'Правка'},
+            ])
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.text, 'Some text')
+
+    def test_invalid_operation_rolls_back_batch(self):
+        """Ошибка в одной операции отменяет весь пакет."""
+        start_count = Note.objects.count()
+        response = self.post([
+            {'op': 'create', 'title': 'Новая', 'text': 'Текст'},
+            {'op': 'create', 'title': 'Чужой slug', 'text': 'Текст',
+             'slug': self.readers_note.slug},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        skipped, failed = response.json()['results']
+        self.assertEqual(skipped, {'status': 'skipped'})
+        self.assertEqual(
+            failed['errors'], {'slug': [self.readers_note.slug + WARNING]}
+        )
+        self.assertEqual(Note.objects.count(), start_count)
+
+    def test_slugs_checked_against_batch(self):
+        """Slug, освобождённый в пакете, можно занять, повторный — нет."""
+        response = self.post([
+            {'op': 'update', 'id': self.note.pk, 'slug': 'moved'},
+            {'op': 'create', 'text': 'A', 'slug': self.note.slug},
+            {'op': 'create', 'text': 'B', 'slug': 'moved'},
+        ])
+        self.assertEqual(
+            response.json()['results'][2]['errors'],
+            {'slug': ['moved' + WARNING]},
+        )
+        response = self.post([
+            {'op': 'update', 'id': self.note.pk, 'slug': 'moved'},
+            {'op': 'create', 'text': 'A', 'slug': self.note.slug},
+        ])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_foreign_note_not_found(self):
+        """Чужие заметки нельзя ни править, ни удалять."""
+        for op in ('update', 'delete'):
+            with self.subTest(op=op):
+                response = self.post([{'op': op, 'id': self.readers_note.pk}])
+                self.assertEqual(
+                    response.json()['results'][0]['errors'],
+                    {'id': ['Заметка не найдена.']},
+                )
+        self.assertTrue(
+            Note.objects.filter(pk=self.readers_note.pk).exists()
+        )
+
+    def test_many_edits_cost_constant_queries(self):
+        """Правка 200 заметок стоит горстку запросов, а не 200."""
+        notes = Note.objects.bulk_create(
+            Note(title='Todo', text='x', slug=f'todo-{i}', author=self.author)
+            for i in range(200)
+        )
+        operations = [
+            {'op': 'update', 'id': note.pk, 'text': 'y'} for note in notes
+        ]
+        with self.assertNumQueries(10):
+            response = self.post(operations)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            Note.objects.filter(author=self.author, text='y').count(), 200
+        )
+
+    def test_malformed_payload(self):
+        for body in ('not json', '[]', '{"operations": {}}'):
+            with self.subTest(body=body):
+                response = self.author_client.post(
+                    self.batch_url, body, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_anonymous_forbidden(self):
+        response = self.post([], client=self.client)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+
+from notes.benchmark import (
+    ROUTES, benchmark_route, find_regressions, percentile, run_mixed_load,
+    seed_notes
+)
+from notes.models import Note
+from notes.tests.base import BaseTestCase
+
+
+class BenchmarkTests(BaseTestCase):
+    """Проверки генератора данных и нагрузочного прогона."""
+
+    def test_seed_notes_creates_users_and_notes(self):
+        call_command('seed_notes', users=2, notes=30, stdout=io.StringIO())
+        call_command('seed_notes', users=2, notes=5, stdout=io.StringIO())
+        authors = get_user_model().objects.filter(
+            username__startswith='bench-'
+        )
+        self.assertEqual(authors.count(), 2)
+        for author in authors:
+            with self.subTest(author=author.username):
+                self.assertEqual(
+                    Note.objects.filter(author=author).count(), 35
+                )
+
+    def test_every_route_answers_as_expected(self):
+        """Каждый маршрут отвечает ожидаемым статусом без ошибок."""
+        users = seed_notes(1, 20, password='secret-pass-1')
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        for route in ROUTES:
+            with self.subTest(route=route.name), override_settings(
+                NOTES_JOB_FILES_DIR=files.name
+            ):
+                summary = benchmark_route(
+                    route, users, concurrency=1, requests=2,
+                    password='secret-pass-1', warmup=0,
+                )
+                self.assertEqual(summary['requests'], 2)
+                self.assertEqual(summary['errors'], 0)
+
+    def test_mixed_load_reports_reads_and_writes(self):
+        users = seed_notes(1, 10, password='secret-pass-1')
+        summaries = run_mixed_load(
+            users, concurrency=1, requests=20, write_ratio=0.5,
+            password='secret-pass-1',
+        )
+        self.assertEqual(
+            summaries['read']['requests'] + summaries['write']['requests'], 20
+        )
+        self.assertEqual(summaries['read']['errors'], 0)
+        self.assertEqual(summaries['write']['errors'], 0)
+        self.assertGreater(summaries['total_rps'], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_regressions(self):
+        baseline = {'list': {'p95_ms': 10, 'queries_mean': 2, 'errors': 0}}
+        self.assertEqual(find_regressions(baseline, baseline, 0.2), [])
+        slower = {'list': {'p95_ms': 13, 'queries_mean': 3, 'errors': 0}}
+        self.assertEqual(len(find_regressions(slower, baseline, 0.2)), 2)
+
+    def test_benchmark_command_fails_on_regression(self):
+        seed_notes(1, 10)
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            call_command(
+                'benchmark', concurrency=1, requests=2, routes='list',
+                output=baseline, stdout=io.StringIO(),
+            )
+            with open(baseline) as stream:
+                report = json.load(stream)
+            self.assertEqual(report['routes']['list']['errors'], 0)
+            report['routes']['list']['queries_mean'] = 0
+            with open(baseline, 'w') as stream:
+                json.dump(report, stream)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark', concurrency=1, requests=2, routes='list',
+                    baseline=baseline, stdout=io.StringIO(),
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import tempfile
+import unittest
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from notes.checks import check_shared_cache
+from notes.models import Note
+from notes.tests.base import BaseTestCase
+
+
+class PageCacheTests(BaseTestCase):
+    """Проверки кэша страниц заметок и его сброса по сигналам."""
+
+    def note_queries(self, client, url):
+        """Запрашивает страницу и возвращает SQL-запросы к заметкам."""
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        return response, [
+            query['sql'] for query in queries if 'notes_note' in query['sql']
+        ]
+
+    def test_repeated_pages_do_not_query_notes(self):
+        """Повторный запрос списка и заметки не обращается к notes_note."""
+        for url in (self.list_url, self.detail_url):
+            with self.subTest(url=url):
+                self.note_queries(self.author_client, url)
+                response, queries = self.note_queries(self.author_client, url)
+                self.assertContains(response, self.note.title)
+                self.assertEqual(queries, [])
+
+    def test_cache_is_invalidated_on_save_and_delete(self):
+        """Изменение и удаление заметки сбрасывают кэш страниц автора."""
+        self.author_client.get(self.list_url)
+        self.author_client.get(self.detail_url)
+        self.note.title = 'Changed title'
+        self.note.save()
+        self.assertContains(
+            self.author_client.get(self.detail_url), 'Changed title'
+        )
+        self.assertContains(
+            self.author_client.get(self.list_url), 'Changed title'
+        )
+        self.note.delete()
+        self.assertNotContains(
+            self.author_client.get(self.list_url), 'Changed title'
+        )
+        self.assertEqual(
+            self.author_client.get(self.detail_url).status_code, 404
+        )
+
+    def test_other_users_pages_are_not_shared(self):
+        """Кэш одного пользователя не отдаётся другому."""
+        self.author_client.get(self.detail_url)
+        response = self.reader_client.get(self.detail_url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_file_based_cache(self):
+        """Кэш страниц работает и с файловым бэкендом."""
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                self.author_client.get(self.detail_url)
+                _, queries = self.note_queries(
+                    self.author_client, self.detail_url
+                )
+                self.assertEqual(queries, [])
+                Note.objects.filter(pk=self.note.pk).get().save()
+                _, queries = self.note_queries(
+                    self.author_client, self.detail_url
+                )
+                self.assertNotEqual(queries, [])
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Проверка notes.E001: кэш страниц должен быть общим для процессов."""
+
+    LOCMEM = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }}
+
+    def test_local_memory_cache_refused_without_debug(self):
+        with override_settings(CACHES=self.LOCMEM, DEBUG=False):
+            errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['notes.E001'])
+
+    def test_local_memory_cache_allowed_in_debug(self):
+        with override_settings(CACHES=self.LOCMEM, DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_default_settings_pass(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import sqlite3
+import unittest
+from contextlib import closing
+
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+
+from notes.compression import ZLIB_MARKER, CompressedText, decompress_text
+from notes.importer import import_notes
+from notes.models import Note
+from notes.search import CREATE_FTS_TABLE, SEARCH_TRIGGERS, search_notes
+from notes.tests.base import BaseTestCase
+
+LONG_TEXT = 'Длинный текст про сжатие заметок. ' * 200
+
+
+def stored_text(note):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT text FROM notes_note WHERE id = %s', [note.pk]
+        )
+        return cursor.fetchone()[0]
+
+
+@override_settings(NOTES_TEXT_COMPRESS_THRESHOLD=1024)
+class CompressionTests(BaseTestCase):
+    """Проверки прозрачного сжатия длинных текстов заметок."""
+
+    def test_long_text_stored_compressed(self):
+        note = Note.objects.create(
+            title='Long', text=LONG_TEXT, author=self.author
+        )
+        raw = stored_text(note)
+        self.assertIsInstance(raw, bytes)
+        self.assertTrue(raw.startswith(ZLIB_MARKER))
+        self.assertLess(len(raw), len(LONG_TEXT.encode()))
+        self.assertEqual(decompress_text(raw), LONG_TEXT)
+        self.assertEqual(stored_text(self.note), 'Some text')
+
+    def test_text_decompressed_lazily(self):
+        note = Note.objects.create(
+            title='Long', text=LONG_TEXT, author=self.author
+        )
+        note = Note.objects.get(pk=note.pk)
+        self.assertIsInstance(note.__dict__['text'], CompressedText)
+        self.assertEqual(note.text, LONG_TEXT)
+        self.assertIsInstance(note.__dict__['text'], str)
+        self.assertEqual(
+            Note.objects.values_list('text', flat=True).get(pk=note.pk),
+            LONG_TEXT,
+        )
+
+    def test_search_and_pages_see_plain_text(self):
+        note = Note.objects.create(
+            title='Long', text=LONG_TEXT, author=self.author
+        )
+        import_notes(self.author, [{'title': 'Imported', 'text': LONG_TEXT}])
+        found = search_notes(self.author, 'сжатие', 10)
+        self.assertEqual(
+            {found_note.title for found_note in found}, {'Long', 'Imported'}
+        )
+        self.assertIn(
+            '<mark>сжатие</mark>', found.object_list[0].text_snippet
+        )
+        note.text = 'Короткий текст'
+        note.save()
+        self.assertEqual(stored_text(note), 'Короткий текст')
+        self.assertEqual(
+            [found_note.title for found_note in
+             search_notes(self.author, 'сжатие', 10)],
+            ['Imported'],
+        )
+        imported = Note.objects.get(title='Imported')
+        response = self.author_client.get(
+            reverse('notes:detail', args=(imported.slug,))
+        )
+        self.assertContains(response, LONG_TEXT[:100])
+
+    def test_text_lookups_see_plain_text(self):
+        note = Note.objects.create(
+            title='Long', text=LONG_TEXT, author=self.author
+        )
+        for lookup in (
+            {'text': LONG_TEXT}, {'text__contains': 'про сжатие'},
+            {'text__startswith': 'Длинный'},
+        ):
+            with self.subTest(lookup=lookup):
+                self.assertEqual(
+                    list(Note.objects.filter(**lookup)), [note]
+                )
+
+    def test_writes_need_django_connection(self):
+        """
+        Вне соединений Django нет функции notes_text(), и триггеры
+        поиска не дают писать в notes_note.
+        """
+        with closing(sqlite3.connect(':memory:')) as raw:
+            raw.execute(
+                'CREATE TABLE notes_note '
+                '(id INTEGER PRIMARY KEY, author_id INTEGER, '
+                'title TEXT, text TEXT)'
+            )
+            raw.execute(CREATE_FTS_TABLE)
+            for sql in SEARCH_TRIGGERS.values():
+                raw.execute(sql)
+            with self.assertRaisesMessage(
+                sqlite3.OperationalError, 'no such function: notes_text'
+            ):
+                raw.execute(
+                    "INSERT INTO notes_note (title, text) VALUES ('a', 'b')"
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from http import HTTPStatus
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from notes.models import Note, VersionConflict
+from notes.tests.base import BaseTestCase
+
+
+class OptimisticConcurrencyTests(BaseTestCase):
+    """Проверки правки заметки с проверкой версии вместо блокировок."""
+
+    def edit(self, version, **fields):
+        data = {
+            'title': self.note.title, 'text': self.note.text,
+            'slug': self.note.slug, 'version': version, **fields,
+        }
+        return self.author_client.post(self.edit_url, data)
+
+    def test_form_carries_version(self):
+        response = self.author_client.get(self.edit_url)
+        self.assertEqual(response.context['form']['version'].value(), 1)
+
+    def test_update_is_conditional_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.edit(1, text='Новый текст')
+        (update,) = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "notes_note"')
+        ]
+        self.assertIn('"notes_note"."version" = 1', update)
+        self.assertRedirects(response, self.success_url)
+
+    def test_second_tab_gets_merge_view(self):
+        self.edit(1, text='Правка первой вкладки')
+        response = self.edit(1, text='Правка второй вкладки')
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.assertTemplateUsed(response, 'notes/conflict.html')
+        self.assertIn('-Правка первой вкладки', response.context['diff'])
+        self.assertIn('+Правка второй вкладки', response.context['diff'])
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(
+            (note.text, note.version), ('Правка первой вкладки', 2)
+        )
+        merge_form = response.context['form']
+        self.assertEqual(merge_form['version'].value(), 2)
+        response = self.author_client.post(self.edit_url, merge_form.data)
+        self.assertRedirects(response, self.success_url)
+        note.refresh_from_db()
+        self.assertEqual(
+            (note.text, note.version), ('Правка второй вкладки', 3)
+        )
+
+    def test_edit_without_version_is_rejected(self):
+        """Правка без версии не перезаписывает заметку в обход проверки."""
+        self.edit(1, text='Правка первой вкладки')
+        response = self.author_client.post(self.edit_url, {
+            'title': self.note.title, 'text': 'Правка без версии',
+            'slug': self.note.slug,
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFormError(
+            response.context['form'], 'version', 'Обязательное поле.'
+        )
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(
+            (note.text, note.version), ('Правка первой вкладки', 2)
+        )
+
+    def test_stale_instance_save_raises(self):
+        stale = Note.objects.get(pk=self.note.pk)
+        Note.objects.get(pk=self.note.pk).save()
+        stale.title = 'Stale'
+        with self.assertRaises(VersionConflict):
+            stale.save()
+        self.assertEqual(stale.version, 1)
+        self.assertEqual(
+            Note.objects.get(pk=self.note.pk).title, self.note.title
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
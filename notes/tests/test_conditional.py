@@ -0,0 +1,92 @@
+import unittest
+from http import HTTPStatus
+from unittest import mock
+
+from notes.models import Note
+from notes.tests.base import BaseTestCase
+
+
+class ConditionalGetTests(BaseTestCase):
+    """Проверки ETag и ответов 304 для страниц заметок."""
+
+    def revalidate(self, url, response):
+        return self.author_client.get(
+            url, headers={'if-none-match': response['ETag']}
+        )
+
+    def test_pages_have_weak_etag(self):
+        """
+        Список и заметка отдают слабый ETag без Last-Modified: в
+        странице есть CSRF-токен сессии.
+        """
+        for url in (self.list_url, self.detail_url):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertNotIn('Last-Modified', response)
+
+    def test_unchanged_pages_return_304_without_rendering(self):
+        """Неизменившаяся страница отвечает 304 и не рендерит шаблон."""
+        for url in (self.list_url, self.detail_url):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                with mock.patch(
+                    'django.template.response.SimpleTemplateResponse.render'
+                ) as render:
+                    response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+                render.assert_not_called()
+
+    def test_edit_changes_validators(self):
+        """После правки заметки старый ETag больше не подходит."""
+        responses = {
+            url: self.author_client.get(url)
+            for url in (self.list_url, self.detail_url)
+        }
+        self.note.text = 'Edited'
+        self.note.save()
+        self.assertEqual(self.note.version, 2)
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_delete_changes_list_validator(self):
+        """Удаление заметки меняет ETag списка, хотя время правки нет."""
+        Note.objects.create(title='Second', text='Text', author=self.author)
+        response = self.author_client.get(self.list_url)
+        self.note.delete()
+        response = self.revalidate(self.list_url, response)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_relogin_changes_validators(self):
+        """После повторного входа страница со старым CSRF-токеном не 304."""
+        responses = {
+            url: self.author_client.get(url)
+            for url in (self.list_url, self.detail_url)
+        }
+        self.author_client.logout()
+        self.author_client.force_login(self.author)
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_trash_and_restore_change_list_validator(self):
+        """
+        Удаление одной заметки и восстановление другой не меняют ни
+        числа заметок, ни времени правки, но меняют ETag списка.
+        """
+        second = Note.objects.create(
+            title='Second', text='Text', author=self.author
+        )
+        Note.objects.trash_owned(self.author, second.slug)
+        response = self.author_client.get(self.list_url)
+        Note.objects.trash_owned(self.author, self.note.slug)
+        Note.objects.restore_owned(self.author, second.pk)
+        response = self.revalidate(self.list_url, response)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+if __name__ == '__main__':
+    unittest.main()
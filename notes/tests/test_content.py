@@ -1,7 +1,11 @@
 import unittest
+from http import HTTPStatus
+from unittest import mock
 
 from notes.forms import NoteForm
+from notes.models import Note
 from notes.tests.base import BaseTestCase
+from notes.views import NotesList
 
 
 class ContentTests(BaseTestCase):
@@ -43,6 +47,41 @@ class ContentTests(BaseTestCase):
                 self.assertIn('form', response.context)
                 self.assertIsInstance(response.context['form'], NoteForm)
 
+    @mock.patch.object(NotesList, 'paginate_by', 2)
+    def test_notes_list_cursor_pagination(self):
+        """
+        Список заметок листается курсорами вперёд и назад,
+        страницы не пересекаются и идут по возрастанию id.
+        """
+        notes = [self.note] + [
+            Note.objects.create(
+                title=f'Note {number}', text='Text', author=self.author
+            )
+            for number in range(4)
+        ]
+        pages = []
+        response = self.author_client.get(self.list_url)
+        while True:
+            page = response.context['page_obj']
+            pages.append(list(page.object_list))
+            if not page.has_next():
+                break
+            response = self.author_client.get(
+                self.list_url, {'cursor': page.next_cursor}
+            )
+        self.assertEqual(pages, [notes[0:2], notes[2:4], notes[4:]])
+        response = self.author_client.get(
+            self.list_url, {'cursor': page.prev_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj'].object_list), notes[2:4]
+        )
+
+    def test_notes_list_invalid_cursor(self):
+        """На испорченный курсор список отвечает 404."""
+        response = self.author_client.get(self.list_url, {'cursor': '!!!'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
 
 if __name__ == '__main__':
     unittest.main()
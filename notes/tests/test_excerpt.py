@@ -0,0 +1,54 @@
+import unittest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from notes.importer import import_notes
+from notes.models import Note
+from notes.tests.base import BaseTestCase
+from notes.text import EXCERPT_LENGTH, make_excerpt
+
+
+class ExcerptTests(BaseTestCase):
+    """Проверки начала текста, числа слов и узкой проекции списка."""
+
+    def test_make_excerpt(self):
+        self.assertEqual(
+            make_excerpt('  Коротко\n\nи  ясно '), 'Коротко и ясно'
+        )
+        excerpt = make_excerpt('слово ' * 1000)
+        self.assertLessEqual(len(excerpt), EXCERPT_LENGTH)
+        self.assertTrue(excerpt.endswith('слово…'))
+
+    def test_derived_fields_follow_text(self):
+        note = Note.objects.create(
+            title='Long', text='раз два три ' * 100, author=self.author
+        )
+        self.assertEqual(note.word_count, 300)
+        self.assertTrue(note.excerpt.startswith('раз два три'))
+        note.text = 'Новый текст'
+        note.save(update_fields=('text',))
+        note.refresh_from_db()
+        self.assertEqual((note.excerpt, note.word_count), ('Новый текст', 2))
+
+    def test_bulk_paths_fill_derived_fields(self):
+        import_notes(self.author, [{'title': 'Imported', 'text': 'a b c'}])
+        note = Note.objects.get(title='Imported')
+        self.assertEqual((note.excerpt, note.word_count), ('a b c', 3))
+
+    def test_list_does_not_load_text(self):
+        """Список читает узкую проекцию и показывает начало текста."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.author_client.get(self.list_url)
+        notes_sql = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "notes_note"' in query['sql']
+        ]
+        self.assertTrue(notes_sql)
+        for sql in notes_sql:
+            self.assertNotIn('"notes_note"."text"', sql)
+        self.assertContains(response, self.note.excerpt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from http import HTTPStatus
+
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from notes.export import export_notes
+from notes.tests.base import BaseTestCase, heavy
+
+# Размеры выгрузок, прирост памяти которых сравнивается.
+SMALL_EXPORT_SIZE = 50_000
+LARGE_EXPORT_SIZE = 500_000
+# Шум замера RSS, который допускается сверх прироста малой выгрузки.
+RSS_SLACK = 16 * 1024 * 1024
+
+
+def current_rss():
+    """Текущий RSS процесса в байтах по /proc (только Linux)."""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class ExportTests(BaseTestCase):
+    """Проверки потоковой выгрузки заметок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.export_url = reverse('notes:export')
+
+    def download(self, export_format):
+        response = self.author_client.get(
+            self.export_url, {'format': export_format}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_jsonl_export_contains_only_own_notes(self):
+        """JSONL-выгрузка содержит только заметки пользователя."""
+        lines = self.download('jsonl').decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['slug'] for line in lines], [self.note.slug]
+        )
+
+    def test_csv_export(self):
+        """CSV-выгрузка начинается с заголовка и содержит текст заметки."""
+        rows = list(csv.DictReader(io.StringIO(self.download('csv').decode())))
+        self.assertEqual(rows[0]['text'], self.note.text)
+
+    def test_markdown_zip_export(self):
+        """Zip-архив содержит Markdown-файл на каждую заметку."""
+        archive = zipfile.ZipFile(io.BytesIO(self.download('md')))
+        self.assertEqual(
+            archive.read(f'{self.note.slug}.md').decode(),
+            f'# {self.note.title}\n\n{self.note.text}\n',
+        )
+
+    def test_unknown_format(self):
+        """Неизвестный формат выгрузки — 404."""
+        response = self.author_client.get(self.export_url, {'format': 'xml'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_export_command(self):
+        """Команда export_notes пишет выгрузку в файл."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'notes.jsonl')
+            call_command('export_notes', self.author.username, output=path)
+            with open(path) as stream:
+                self.assertEqual(json.loads(stream.readline())['title'],
+                                 self.note.title)
+
+    def add_bulk_notes(self, first, last):
+        """Вставляет заметки пользователя с номерами first..last."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'WITH RECURSIVE seq(n) AS ('
+                '  SELECT %s UNION ALL SELECT n + 1 FROM seq WHERE n < %s'
+                ') '
+                'INSERT INTO notes_note '
+                '(title, text, slug, author_id, updated_at, version, '
+                ' change_seq, excerpt, word_count, html, html_version) '
+                "SELECT 'Bulk ' || n, 'Bulk text ' || n, 'bulk-' || n, "
+                "%s, %s, 1, n, 'Bulk text ' || n, 3, '', 0 FROM seq",
+                [first, last, self.user.pk, timezone.now()],
+            )
+
+    def export_growth(self, expected):
+        """Выгружает заметки пользователя, возвращает пиковый прирост RSS."""
+        baseline = peak = current_rss()
+        exported = 0
+        for chunk in export_notes(self.user, 'jsonl'):
+            exported += chunk.count(b'\n')
+            peak = max(peak, current_rss())
+        self.assertEqual(exported, expected)
+        return peak - baseline
+
+    @heavy
+    @unittest.skipUnless(
+        os.path.exists('/proc/self/statm'), 'нужен /proc для замера RSS'
+    )
+    def test_large_export_memory_is_bounded(self):
+        """Память выгрузки не растёт вместе с числом заметок."""
+        self.add_bulk_notes(1, SMALL_EXPORT_SIZE)
+        small = self.export_growth(SMALL_EXPORT_SIZE)
+        self.add_bulk_notes(SMALL_EXPORT_SIZE + 1, LARGE_EXPORT_SIZE)
+        large = self.export_growth(LARGE_EXPORT_SIZE)
+        self.assertLess(large, 2 * small + RSS_SLACK)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from django.core.cache import cache
+from django.test import Client, override_settings
+
+from notes.auth import user_cache
+from notes.tests.base import BaseTestCase
+
+PASSWORD = 'fast-auth-password'
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+    AUTHENTICATION_BACKENDS=['notes.auth.CachedUserBackend'],
+)
+class FastAuthTests(BaseTestCase):
+    """Проверки быстрой аутентификации без запросов к сессиям и users."""
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.author.set_password(PASSWORD)
+        self.author.save()
+        self.client = Client()
+        self.client.login(username=self.author.username, password=PASSWORD)
+
+    def test_detail_costs_one_query(self):
+        self.client.get(self.list_url)
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, self.author.username)
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url)
+
+    def test_password_change_logs_out(self):
+        self.client.get(self.list_url)
+        self.author.set_password('another-password')
+        self.author.save()
+        response = self.client.get(self.list_url)
+        self.assertRedirects(
+            response, f'{self.login_url}?next={self.list_url}'
+        )
+
+    def test_logout_forgets_user(self):
+        self.client.get(self.list_url)
+        self.assertIsNotNone(user_cache.get(self.author.pk))
+        self.client.post(self.logout_url)
+        self.assertIsNone(user_cache.get(self.author.pk))
+        response = self.client.get(self.list_url)
+        self.assertRedirects(
+            response, f'{self.login_url}?next={self.list_url}'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
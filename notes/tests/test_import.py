@@ -0,0 +1,118 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from notes.importer import import_notes, parse_csv, parse_jsonl
+from notes.models import Note
+from notes.search import search_notes
+from notes.tests.base import BaseTestCase
+
+
+class ImportTests(BaseTestCase):
+    """Проверки пакетного импорта заметок."""
+
+    def test_import_resolves_duplicate_slugs(self):
+        """Совпадающие заголовки и занятые slug получают суффиксы."""
+        records = [
+            {'title': 'Todo', 'text': 'one'},
+            {'title': 'Todo', 'text': 'two'},
+            {'title': 'Other', 'text': 'three', 'slug': self.note.slug},
+            {'title': 'Other', 'text': 'four', 'slug': 'same'},
+            {'title': 'Other', 'text': 'five', 'slug': 'same'},
+        ]
+        stats = import_notes(self.user, records, batch_size=2)
+        self.assertEqual(stats.count, 5)
+        self.assertEqual(stats.batches, 3)
+        self.assertQuerySetEqual(
+            Note.objects.filter(author=self.user).order_by('id'),
+            ['todo', 'todo-2', f'{self.note.slug}-2', 'same', 'same-2'],
+            transform=lambda note: note.slug,
+        )
+
+    def test_popular_titles_cost_constant_queries(self):
+        """Число запросов зависит от числа пачек, а не заметок."""
+        records = [{'title': 'Todo', 'text': 'x'}] * 1000
+        with CaptureQueriesContext(connection) as queries:
+            import_notes(self.user, records, batch_size=500)
+        self.assertEqual(Note.objects.filter(author=self.user).count(), 1000)
+        self.assertLess(len(queries), 60)
+
+    def test_imported_notes_are_searchable(self):
+        """Импортированные заметки попадают в полнотекстовый индекс."""
+        import_notes(self.user, [{'title': 'Imported', 'text': 'zebra'}])
+        self.assertEqual(len(search_notes(self.user, 'zebra', 10)), 1)
+
+    def test_parsers(self):
+        """JSONL и CSV читаются потоково в словари."""
+        jsonl = io.StringIO(json.dumps({'title': 'A', 'text': 'B'}) + '\n\n')
+        csv_stream = io.StringIO('title,text\nA,B\n')
+        for records in (parse_jsonl(jsonl), parse_csv(csv_stream)):
+            with self.subTest(records=records):
+                self.assertEqual(
+                    [dict(record) for record in records],
+                    [{'title': 'A', 'text': 'B'}],
+                )
+
+    def test_invalid_slug_is_rebuilt(self):
+        """Недопустимый или слишком длинный slug строится заново."""
+        records = [
+            {'title': 'A', 'slug': 'с пробелом/и слешем'},
+            {'title': 'B', 'slug': 'x' * 150},
+            {'title': 'C', 'slug': '!!!'},
+        ]
+        stats = import_notes(self.user, records)
+        self.assertEqual(stats.skipped, 0)
+        self.assertQuerySetEqual(
+            Note.objects.filter(author=self.user).order_by('id'),
+            ['s-probelomi-sleshem', 'x' * 100, 'c'],
+            transform=lambda note: note.slug,
+        )
+
+    def test_long_title_is_truncated(self):
+        """Заголовок длиннее поля обрезается до его max_length."""
+        import_notes(self.user, [{'title': 'Я' * 150, 'text': 'x'}])
+        note = Note.objects.get(author=self.user)
+        self.assertEqual(note.title, 'Я' * 100)
+
+    def test_invalid_records_are_skipped(self):
+        """Негодные записи пропускаются, их номера попадают в итоги."""
+        jsonl = io.StringIO('\n'.join([
+            json.dumps({'title': 'Good', 'text': 'x'}),
+            json.dumps(['not', 'an', 'object']),
+            '{broken',
+            json.dumps({'title': 'Bad', 'text': 42}),
+            json.dumps({'title': 'Also good'}),
+        ]))
+        stats = import_notes(self.user, parse_jsonl(jsonl), batch_size=2)
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.skipped, 3)
+        self.assertEqual([row for row, _ in stats.skipped_rows], [2, 3, 4])
+        self.assertIn('text', stats.skipped_rows[2][1])
+        self.assertEqual(
+            Note.objects.filter(author=self.user).count(), 2
+        )
+
+    def test_import_command(self):
+        """Команда import_notes загружает файл и сообщает скорость."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'notes.csv')
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write('title,text\nИз файла,Текст\n')
+            output = io.StringIO()
+            call_command(
+                'import_notes', self.user.username, path, stdout=output
+            )
+        self.assertIn('заметок/с', output.getvalue())
+        self.assertTrue(
+            Note.objects.filter(author=self.user, slug='iz-fajla').exists()
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from notes import jobs
+from notes.models import Job, Note
+from notes.tests.base import BaseTestCase
+
+
+class JobTests(BaseTestCase):
+    """Проверки очереди фоновых задач и её API."""
+
+    def setUp(self):
+        super().setUp()
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        settings = override_settings(
+            NOTES_JOB_FILES_DIR=files.name, NOTES_PERIODIC_JOBS={},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def work(self):
+        call_command('run_workers', once=True, stdout=StringIO())
+
+    def status(self, client, task):
+        return client.get(reverse('notes:job', args=(task['id'],)))
+
+    def test_export_job(self):
+        response = self.author_client.post(
+            reverse('notes:export'), {'format': 'jsonl'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+        task = response.json()
+        self.assertEqual(task['status'], Job.Status.QUEUED)
+        self.work()
+        status = self.status(self.author_client, task).json()
+        self.assertEqual(status['status'], Job.Status.DONE)
+        self.assertEqual((status['progress'], status['total']), (1, 1))
+        download = self.author_client.get(status['file_url'])
+        self.assertEqual(download.status_code, HTTPStatus.OK)
+        rows = [
+            json.loads(line)
+            for line in b''.join(download.streaming_content).splitlines()
+        ]
+        self.assertEqual([row['slug'] for row in rows], [self.note.slug])
+
+    def test_foreign_job_is_404(self):
+        task = self.author_client.post(reverse('notes:export')).json()
+        self.work()
+        for url in (
+            reverse('notes:job', args=(task['id'],)),
+            reverse('notes:job_file', args=(task['id'],)),
+        ):
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_import_job(self):
+        upload = SimpleUploadedFile('notes.jsonl', b'\n'.join(
+            json.dumps({'title': f'Imported {i}', 'text': 'text'}).encode()
+            for i in range(3)
+        ))
+        response = self.user_client.post(
+            reverse('notes:import'), {'file': upload}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+        self.work()
+        status = self.status(self.user_client, response.json()).json()
+        self.assertEqual(status['result']['count'], 3)
+        self.assertEqual(Note.objects.for_author(self.user).count(), 3)
+        self.assertEqual(list(jobs.job_file('').iterdir()), [])
+
+    def test_import_job_reports_skipped_rows(self):
+        upload = SimpleUploadedFile('notes.jsonl', b'\n'.join([
+            json.dumps({'title': 'Imported'}).encode(),
+            b'"just a string"',
+            b'{broken',
+        ]))
+        response = self.user_client.post(
+            reverse('notes:import'), {'file': upload}
+        )
+        self.work()
+        result = self.status(self.user_client, response.json()).json()[
+            'result'
+        ]
+        self.assertEqual((result['count'], result['skipped']), (1, 2))
+        self.assertEqual(
+            [row['row'] for row in result['skipped_rows']], [2, 3]
+        )
+
+    def test_import_rejects_unknown_format(self):
+        response = self.user_client.post(reverse('notes:import'), {
+            'file': SimpleUploadedFile('notes.xml', b'<notes/>'),
+        })
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_then_failed(self):
+        broken = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.dict(jobs.HANDLERS, {'broken': (broken, 2)}):
+            task = jobs.enqueue('broken', self.author)
+            self.work()
+            task.refresh_from_db()
+            self.assertEqual(task.status, Job.Status.QUEUED)
+            self.assertGreater(task.run_after, timezone.now())
+            Job.objects.filter(pk=task.pk).update(run_after=timezone.now())
+            self.work()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Job.Status.FAILED, 2))
+        self.assertEqual(broken.call_count, 2)
+        status = self.author_client.get(
+            reverse('notes:job', args=(task.pk,))
+        ).json()
+        self.assertEqual(status['error'], 'RuntimeError: boom')
+
+    def test_claim_is_exclusive(self):
+        task = jobs.enqueue('expire_trash')
+        self.assertEqual(jobs.claim('first'), task)
+        self.assertIsNone(jobs.claim('second'))
+
+    def test_requeue_stale(self):
+        task = jobs.enqueue('expire_trash')
+        jobs.claim('dead')
+        Job.objects.filter(pk=task.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(jobs.requeue_stale(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Job.Status.QUEUED)
+        self.assertEqual(
+            jobs.work('alive', threading.Event(), 0, drain=True), 1
+        )
+
+    def test_periodic_jobs_report_progress(self):
+        """Очистка корзины и задач отчитывается, пока идёт."""
+        old = timezone.now() - timedelta(days=365)
+        Note.objects.filter(pk=self.note.pk).update(deleted_at=old)
+        jobs.job_file('old.jsonl').write_bytes(b'{}')
+        Job.objects.create(
+            kind='export_notes', status=Job.Status.DONE, finished_at=old,
+            max_attempts=1,
+            result={'file': 'old.jsonl'},
+        )
+        with mock.patch.object(
+            Job, 'report', autospec=True, side_effect=Job.report
+        ) as report:
+            tasks = [jobs.enqueue('expire_trash'), jobs.enqueue('expire_jobs')]
+            self.work()
+        for task in tasks:
+            with self.subTest(kind=task.kind):
+                task.refresh_from_db()
+                self.assertEqual(task.status, Job.Status.DONE)
+                self.assertEqual(task.result, {'expired': 1})
+                self.assertIn(mock.call(task, 1), report.call_args_list)
+        self.assertFalse(Note.objects.filter(pk=self.note.pk).exists())
+        self.assertFalse(jobs.job_file('old.jsonl').exists())
+
+    def test_schedule_periodic_once_per_interval(self):
+        with override_settings(NOTES_PERIODIC_JOBS={'expire_trash': 3600}):
+            self.assertEqual(len(jobs.schedule_periodic()), 1)
+            self.assertEqual(jobs.schedule_periodic(), [])
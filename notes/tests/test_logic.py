@@ -61,7 +61,10 @@ class LogicTests(BaseTestCase):
     def test_author_can_edit_own_note(self):
         """Пользователь-автор может редактировать свою заметку."""
         start_count = Note.objects.count()
-        updated = {'title': 'Updated', 'text': 'New text', 'slug': 'updated'}
+        updated = {
+            'title': 'Updated', 'text': 'New text', 'slug': 'updated',
+            'version': self.note.version,
+        }
         response = self.author_client.post(self.edit_url, data=updated)
         self.assertEqual(Note.objects.count(), start_count)
         self.assertRedirects(response, self.success_url)
@@ -73,10 +76,11 @@ class LogicTests(BaseTestCase):
 
     def test_author_can_delete_own_note(self):
         """Пользователь-автор может удалить свою заметку."""
-        start_count = Note.objects.count()
+        live = Note.objects.filter(deleted_at=None)
+        start_count = live.count()
         response = self.author_client.post(self.delete_url)
         self.assertRedirects(response, self.success_url)
-        self.assertEqual(Note.objects.count(), start_count - 1)
+        self.assertEqual(live.count(), start_count - 1)
 
     def test_user_cannot_edit_or_delete_others_note(self):
         """Пользователь не может редактировать или удалять чужие заметки."""
@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from django.core import signing
+from django.core.management import call_command
+from django.test import override_settings
+
+from notes.middleware import PROFILE_HEADER, make_profile_token
+from notes.tests.base import BaseTestCase
+
+
+class ProfilingTests(BaseTestCase):
+    """Проверки профилирования запросов по требованию."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profiles = Path(directory.name)
+        settings = override_settings(NOTES_PROFILE_DIR=self.profiles)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def stored(self):
+        return sorted(
+            path.relative_to(self.profiles).as_posix()
+            for path in self.profiles.rglob('*.prof')
+        )
+
+    def test_signed_header_profiles_request(self):
+        response = self.author_client.get(
+            self.detail_url, headers={PROFILE_HEADER: make_profile_token()}
+        )
+        self.assertEqual(self.stored(), [response['X-Profile-Id']])
+        self.assertTrue(response['X-Profile-Id'].startswith('notes.detail/'))
+
+    def test_bad_or_expired_token_ignored(self):
+        expired = signing.TimestampSigner(salt='other').sign('profile')
+        for token in ('garbage', expired):
+            with self.subTest(token=token):
+                response = self.author_client.get(
+                    self.list_url, headers={PROFILE_HEADER: token}
+                )
+                self.assertNotIn('X-Profile-Id', response)
+        with override_settings(NOTES_PROFILE_TOKEN_MAX_AGE=-1):
+            self.author_client.get(
+                self.list_url, headers={PROFILE_HEADER: make_profile_token()}
+            )
+        self.assertEqual(self.stored(), [])
+
+    def test_query_parameter_only_for_staff(self):
+        self.author_client.get(self.list_url, {'_profile': 1})
+        self.assertEqual(self.stored(), [])
+        self.author.is_staff = True
+        self.author.save()
+        self.author_client.get(self.list_url, {'_profile': 1})
+        self.assertEqual(len(self.stored()), 1)
+
+    def old_profiles(self, count):
+        directory = self.profiles / 'notes.list'
+        directory.mkdir()
+        for number in range(count):
+            path = directory / f'old-{number}.prof'
+            path.write_bytes(b'x' * 100)
+            os.utime(path, (1_000_000 + number, 1_000_000 + number))
+        return [f'notes.list/old-{number}.prof' for number in range(count)]
+
+    def test_oldest_profiles_pruned_over_file_limit(self):
+        old = self.old_profiles(3)
+        with override_settings(NOTES_PROFILE_MAX_FILES=2):
+            response = self.author_client.get(
+                self.detail_url,
+                headers={PROFILE_HEADER: make_profile_token()},
+            )
+        self.assertEqual(
+            self.stored(), sorted([old[-1], response['X-Profile-Id']])
+        )
+
+    def test_oldest_profiles_pruned_over_byte_limit(self):
+        self.old_profiles(3)
+        with override_settings(NOTES_PROFILE_MAX_BYTES=1):
+            response = self.author_client.get(
+                self.detail_url,
+                headers={PROFILE_HEADER: make_profile_token()},
+            )
+        self.assertEqual(self.stored(), [response['X-Profile-Id']])
+
+    def test_report_merges_profiles_per_url_name(self):
+        token = make_profile_token()
+        for _ in range(2):
+            self.author_client.get(
+                self.detail_url, headers={PROFILE_HEADER: token}
+            )
+        self.author_client.get(self.list_url, headers={PROFILE_HEADER: token})
+        out = io.StringIO()
+        call_command('profile_report', 'notes:detail', stdout=out)
+        report = out.getvalue()
+        self.assertIn('notes.detail: профилей 2', report)
+        self.assertNotIn('notes.list', report)
+        self.assertIn('(_get_response)', report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+from io import StringIO
+from unittest import mock
+
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Job, Note, NoteTombstone
+from notes.purge import FIRST_BATCH_SIZE, delete_in_batches, purge_user
+from notes.tests.base import BaseTestCase
+
+User = get_user_model()
+
+
+class PurgeTests(BaseTestCase):
+    """Проверки удаления пользователей с заметками пачками."""
+
+    def setUp(self):
+        super().setUp()
+        Note.objects.bulk_create(
+            Note(title=f'Note {i}', text='Text', slug=f'note-{i}',
+                 author=self.author)
+            for i in range(35)
+        )
+        Note.objects.filter(pk=self.note.pk).delete()
+
+    def deletes(self, max_lock_seconds):
+        with CaptureQueriesContext(connection) as queries:
+            deleted = delete_in_batches(
+                Note.objects.filter(author=self.author), 'default', 20,
+                max_lock_seconds,
+            )
+        self.assertEqual(deleted, 35)
+        return sum(
+            query['sql'].startswith('DELETE')
+            for query in queries.captured_queries
+        )
+
+    def test_batches_stay_small_over_lock_ceiling(self):
+        # После первой пачки ни одна строка не укладывается в потолок.
+        self.assertEqual(
+            self.deletes(max_lock_seconds=0), 1 + 35 - FIRST_BATCH_SIZE
+        )
+
+    def test_batches_grow_under_lock_ceiling(self):
+        self.assertEqual(self.deletes(max_lock_seconds=60), 3)
+
+    def test_batches_fit_lock_ceiling(self):
+        """Пачки подбираются по стоимости строки и держат потолок."""
+        row_cost, ceiling = 0.003, 0.05
+        clock = mock.Mock(return_value=0.0)
+        sizes = []
+
+        def slow_delete(rows, using):
+            sizes.append(rows.count())
+            clock.return_value += row_cost * sizes[-1]
+
+        with mock.patch('notes.purge.time.perf_counter', clock):
+            deleted = delete_in_batches(
+                Note.objects.filter(author=self.author), 'default', 1000,
+                ceiling, before_delete=slow_delete,
+            )
+        self.assertEqual(deleted, 35)
+        self.assertEqual(sum(sizes), 35)
+        self.assertLessEqual(max(sizes) * row_cost, ceiling)
+        self.assertEqual(sizes[:2], [FIRST_BATCH_SIZE, 8])
+
+    def test_purge_user(self):
+        self.assertEqual(purge_user(self.author, batch_size=10), 35)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Note.objects.filter(author=self.author).exists())
+        self.assertFalse(
+            NoteTombstone.objects.filter(author=self.author).exists()
+        )
+        self.assertTrue(Note.objects.filter(author=self.reader).exists())
+
+    def test_purge_user_clears_other_relations(self):
+        """Связи пользователя вне заметок разбираются без каскада Django."""
+        group = Group.objects.create(name='Editors')
+        self.author.groups.add(group)
+        LogEntry.objects.create(
+            user=self.author, action_flag=ADDITION, object_repr='note',
+        )
+        task = Job.objects.create(
+            kind='export', user=self.author, max_attempts=1
+        )
+        purge_user(self.author)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(group.user_set.exists())
+        self.assertFalse(LogEntry.objects.exists())
+        task.refresh_from_db()
+        self.assertIsNone(task.user_id)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('purge_users', 'author', batch_size=10, stdout=out)
+        self.assertIn('author: удалено заметок 35', out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+
+
+class PurgeAdminTests(BaseTestCase):
+    """Удаление пользователей из админки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser('admin', 'a@example.com')
+        cls.admin_client = Client()
+        cls.admin_client.force_login(cls.admin)
+
+    def test_action_enqueues_purge_jobs(self):
+        response = self.admin_client.post(
+            reverse('admin:auth_user_changelist'),
+            {'action': 'purge_selected', '_selected_action': [
+                self.author.pk, self.reader.pk,
+            ]},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCountEqual(
+            Job.objects.filter(kind='purge_user', user=self.admin)
+            .values_list('params__user_id', flat=True),
+            [self.author.pk, self.reader.pk],
+        )
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        call_command('run_workers', once=True, stdout=StringIO())
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+
+    def test_delete_view_purges(self):
+        url = reverse('admin:auth_user_delete', args=(self.author.pk,))
+        response = self.admin_client.get(url)
+        self.assertContains(response, 'author: заметок 1')
+        self.admin_client.post(url, {'post': 'yes'})
+        self.assertEqual(
+            list(Job.objects.filter(kind='purge_user').values_list(
+                'params__user_id', flat=True
+            )),
+            [self.author.pk],
+        )
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertTrue(Note.objects.filter(author=self.author).exists())
+        call_command('run_workers', once=True, stdout=StringIO())
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Note.objects.filter(author=self.author).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
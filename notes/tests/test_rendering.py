@@ -0,0 +1,101 @@
+import io
+import time
+import unittest
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from notes.models import Note
+from notes.rendering import RENDERER_VERSION, render_note
+from notes.tests.base import BaseTestCase
+
+
+class RenderNoteTests(unittest.TestCase):
+    """Проверки рендерера разметки заметок."""
+
+    def test_markup(self):
+        self.assertEqual(
+            render_note('# План\n\n- **раз**\n- *два*\n\nСм. `код`'),
+            '<h1>План</h1>\n'
+            '<ul><li><strong>раз</strong></li><li><em>два</em></li></ul>\n'
+            '<p>См. <code>код</code></p>',
+        )
+        self.assertEqual(
+            render_note('[Я](https://ya.ru/?a=1&b=2) и http://x.ru.'),
+            '<p><a href="https://ya.ru/?a=1&amp;b=2" rel="nofollow noopener">'
+            'Я</a> и <a href="http://x.ru" rel="nofollow noopener">'
+            'http://x.ru</a>.</p>',
+        )
+
+    def test_output_is_sanitized(self):
+        html = render_note(
+            '<script>alert(1)</script>\n'
+            '[клик](javascript:alert(1))\n'
+            '```\n<img src=x onerror=alert(1)>\n```'
+        )
+        self.assertNotIn('<script', html)
+        self.assertNotIn('<img', html)
+        self.assertNotIn('href="javascript', html)
+
+    def test_unclosed_links_render_in_linear_time(self):
+        """Незакрытые ссылки в 80 КБ текста не тормозят рендер."""
+        for text in ('[a](b' * 16000, '[a' * 32000, '[a](' + 'b' * 80000):
+            with self.subTest(text=text[:10]):
+                started = time.perf_counter()
+                html = render_note(text)
+                self.assertLess(time.perf_counter() - started, 1)
+                self.assertNotIn('<a ', html)
+        self.assertIn('<a href="https://x.ru"', render_note(
+            '[[a](https://x.ru)'
+        ))
+
+    def test_deep_quotes_are_bounded(self):
+        self.assertIn('&gt;', render_note('>' * 10000 + 'x'))
+
+
+class StoredHtmlTests(BaseTestCase):
+    """Проверки хранения HTML и его перерисовки."""
+
+    def test_html_rendered_on_write_and_served(self):
+        self.author_client.post(self.add_url, {
+            'title': 'Markdown', 'text': '**Важно**', 'slug': 'markdown',
+        })
+        note = Note.objects.get(slug='markdown')
+        self.assertEqual(note.html, '<p><strong>Важно</strong></p>')
+        self.assertEqual(note.html_version, RENDERER_VERSION)
+        with mock.patch('notes.models.render_note') as render:
+            response = self.author_client.get(
+                reverse('notes:detail', args=(note.slug,))
+            )
+        render.assert_not_called()
+        self.assertContains(response, '<strong>Важно</strong>')
+
+    def test_stale_html_rerendered_on_read(self):
+        Note.objects.filter(pk=self.note.pk).update(
+            html='old', html_version=0
+        )
+        response = self.author_client.get(self.detail_url)
+        self.assertContains(response, '<p>Some text</p>')
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(note.html_version, RENDERER_VERSION)
+        self.assertEqual(
+            (note.version, note.change_seq),
+            (self.note.version, self.note.change_seq),
+        )
+
+    def test_command_rerenders_stale_notes(self):
+        Note.objects.update(html='', html_version=0)
+        out = io.StringIO()
+        call_command('render_notes', batch_size=1, stdout=out)
+        self.assertIn('Перерисовано заметок: 2', out.getvalue())
+        self.assertFalse(
+            Note.objects.exclude(html_version=RENDERER_VERSION).exists()
+        )
+        self.assertEqual(
+            Note.objects.get(pk=self.note.pk).html, '<p>Some text</p>'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
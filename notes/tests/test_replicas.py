@@ -0,0 +1,111 @@
+import unittest
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from notes.middleware import ReplicaPinMiddleware
+from notes.models import Note
+from notes.replicas import PIN_COOKIE, health, primary_reads, read_alias
+from notes.routers import ReplicaRouter
+
+User = get_user_model()
+
+
+@override_settings(NOTES_REPLICAS={'default': ['replica_1']})
+class ReplicaRoutingTests(SimpleTestCase):
+    """Проверки выбора базы при репликах без обращения к БД."""
+
+    def setUp(self):
+        patcher = mock.patch.object(health, 'check', return_value=True)
+        self.check = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(health.clear)
+        health.clear()
+        self.router = ReplicaRouter()
+
+    def test_notes_read_from_replica(self):
+        self.assertEqual(self.router.db_for_read(Note), 'replica_1')
+        self.assertEqual(self.router.db_for_write(Note), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_unhealthy_replica_skipped(self):
+        self.check.return_value = False
+        self.assertEqual(self.router.db_for_read(Note), 'default')
+
+    def test_health_is_cached(self):
+        read_alias('default')
+        read_alias('default')
+        self.assertEqual(self.check.call_count, 1)
+
+    def test_primary_reads(self):
+        with primary_reads():
+            self.assertEqual(self.router.db_for_read(Note), 'default')
+        self.assertEqual(self.router.db_for_read(Note), 'replica_1')
+
+    def test_relations_and_migrations(self):
+        note = Note()
+        note._state.db = 'replica_1'
+        author = User()
+        author._state.db = 'default'
+        self.assertIs(self.router.allow_relation(note, author), True)
+        self.assertIs(self.router.allow_migrate('replica_1', 'notes'), False)
+        self.assertIs(self.router.allow_migrate('replica_1', 'auth'), False)
+
+
+@override_settings(
+    NOTES_REPLICAS={'default': ['replica_1']}, NOTES_REPLICA_PIN_SECONDS=5
+)
+class ReplicaPinMiddlewareTests(SimpleTestCase):
+    """Проверки привязки к основной базе после записи."""
+
+    def setUp(self):
+        patcher = mock.patch.object(health, 'check', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(health.clear)
+        self.factory = RequestFactory()
+        self.response = HttpResponse()
+
+    def handle(self, request):
+        """Пропускает запрос через middleware; возвращает ответ и базу."""
+        used = []
+
+        def view(request):
+            used.append(read_alias('default'))
+            return self.response
+
+        response = ReplicaPinMiddleware(view)(request)
+        return response, used[0]
+
+    def test_read_goes_to_replica(self):
+        response, alias = self.handle(self.factory.get('/'))
+        self.assertEqual(alias, 'replica_1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_write_pins_client(self):
+        response, alias = self.handle(self.factory.post('/'))
+        self.assertEqual(alias, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+
+    def test_failed_write_does_not_pin(self):
+        self.response = HttpResponseBadRequest()
+        response, alias = self.handle(self.factory.post('/'))
+        self.assertEqual(alias, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_pinned_read_goes_to_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.handle(request)[1], 'default')
+
+    @override_settings(NOTES_REPLICAS={})
+    def test_disabled_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaPinMiddleware(lambda request: self.response)
+
+
+if __name__ == '__main__':
+    unittest.main()
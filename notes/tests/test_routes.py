@@ -21,8 +21,11 @@ class RoutesTests(BaseTestCase):
         - список заметок `notes:list`
         - страница успеха `notes:success`
         - страница добавления `notes:add`
+        - поиск `notes:search`
         """
-        urls = [self.list_url, self.success_url, self.add_url]
+        urls = [
+            self.list_url, self.success_url, self.add_url, self.search_url
+        ]
         for url in urls:
             with self.subTest(url=url):
                 response = self.user_client.get(url)
@@ -55,6 +58,7 @@ class RoutesTests(BaseTestCase):
             self.detail_url,
             self.edit_url,
             self.delete_url,
+            self.search_url,
         )
         for url in urls:
             with self.subTest(url=url):
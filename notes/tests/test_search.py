@@ -0,0 +1,106 @@
+import unittest
+from http import HTTPStatus
+
+from notes.models import Note
+from notes.tests.base import BaseTestCase
+
+
+class SearchTests(BaseTestCase):
+    """Проверки полнотекстового поиска по заметкам."""
+
+    def search(self, client, query, **params):
+        response = client.get(self.search_url, {'q': query, **params})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.context['results']
+
+    def test_search_finds_only_own_notes(self):
+        """Поиск находит заметки по тексту и только у их автора."""
+        self.assertEqual(
+            [note.id for note in self.search(self.author_client, 'some')],
+            [self.note.id],
+        )
+        self.assertEqual(self.search(self.reader_client, 'some'), [])
+
+    def test_search_ranks_title_matches_first(self):
+        """Совпадение в заголовке ранжируется выше совпадения в тексте."""
+        in_text = Note.objects.create(
+            title='Plain', text='apple pie recipe', author=self.author
+        )
+        in_title = Note.objects.create(
+            title='Apple', text='Nothing here', author=self.author
+        )
+        results = self.search(self.author_client, 'apple')
+        self.assertEqual(
+            [note.id for note in results], [in_title.id, in_text.id]
+        )
+
+    def test_search_index_follows_updates_and_deletes(self):
+        """Индекс обновляется при изменении и удалении заметки."""
+        self.note.text = 'Completely different'
+        self.note.save()
+        self.assertEqual(self.search(self.author_client, 'some'), [])
+        self.assertEqual(
+            len(self.search(self.author_client, 'different')), 1
+        )
+        self.note.delete()
+        self.assertEqual(self.search(self.author_client, 'different'), [])
+
+    def test_search_highlight_is_escaped(self):
+        """Подсветка экранирует HTML из заметки, а синтаксис FTS5 из
+        запроса не приводит к ошибке.
+        """
+        Note.objects.create(
+            title='<b>Bold</b> title', text='x', author=self.author
+        )
+        results = self.search(self.author_client, 'bold" * (')
+        self.assertEqual(
+            results[0].title_highlight,
+            '&lt;b&gt;<mark>Bold</mark>&lt;/b&gt; title',
+        )
+
+    def test_search_pagination(self):
+        """Страницы поиска выбираются по курсору без пропусков и повторов."""
+        for number in range(25):
+            Note.objects.create(
+                title=f'Page {number}', text='paged', author=self.author
+            )
+        response = self.author_client.get(self.search_url, {'q': 'paged'})
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 20)
+        self.assertFalse(page.has_previous())
+        second = self.author_client.get(
+            self.search_url, {'q': 'paged', 'cursor': page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            {note.id for note in page} & {note.id for note in second}, set()
+        )
+        back = self.author_client.get(
+            self.search_url, {'q': 'paged', 'cursor': second.prev_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [note.id for note in back], [note.id for note in page]
+        )
+
+    def test_search_bad_cursor_is_404(self):
+        response = self.author_client.get(
+            self.search_url, {'q': 'some', 'cursor': 'bad'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_query_does_not_match_author_column(self):
+        """Число в запросе не совпадает с id автора в индексе."""
+        Note.objects.create(
+            title='Other', text='text', author=self.reader
+        )
+        self.assertEqual(
+            self.search(self.reader_client, str(self.reader.pk)), []
+        )
+        self.assertEqual(
+            self.search(self.author_client, str(self.reader.pk)), []
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
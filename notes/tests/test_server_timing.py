@@ -0,0 +1,89 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from notes.metrics import (
+    METRICS_HEADER, TIME_BUCKETS, Histogram, make_metrics_token, registry,
+)
+from notes.tests.base import BaseTestCase
+
+User = get_user_model()
+
+
+@override_settings(NOTES_SERVER_TIMING=True)
+class ServerTimingTests(BaseTestCase):
+    """Проверки заголовка Server-Timing и гистограмм метрик."""
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        # Набор middleware читается при первом запросе клиента.
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def timings(self, response):
+        return {
+            part.split(';')[0]: float(part.split('dur=')[1].split(';')[0])
+            for part in response['Server-Timing'].split(', ')
+        }
+
+    def test_header_has_sql_template_and_total(self):
+        response = self.client.get(self.detail_url)
+        self.assertIn('queries"', response['Server-Timing'])
+        timings = self.timings(response)
+        self.assertGreater(timings['db'], 0)
+        self.assertGreater(timings['tpl'], 0)
+        self.assertGreaterEqual(timings['total'], timings['db'])
+
+    def test_requests_aggregated_per_view(self):
+        for _ in range(3):
+            self.client.get(self.detail_url)
+        self.client.get(self.list_url)
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['notes:detail']['total']['count'], 3)
+        self.assertEqual(snapshot['notes:list']['queries']['count'], 1)
+
+    def test_metrics_endpoint_for_staff_only(self):
+        self.client.get(self.detail_url)
+        url = reverse('notes:metrics')
+        response = self.client.get(url, REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            url, headers={METRICS_HEADER: make_metrics_token()}
+        )
+        self.assertIn('notes:detail', response.json())
+        response = self.client.get(url, headers={METRICS_HEADER: 'forged'})
+        self.assertEqual(response.status_code, 404)
+        User.objects.filter(pk=self.author.pk).update(is_staff=True)
+        response = self.client.get(url)
+        self.assertIn('notes:detail', response.json())
+
+    async def test_async_requests_measured(self):
+        client = AsyncClient()
+        await client.aforce_login(self.author)
+        response = await client.get(self.detail_url)
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(NOTES_SERVER_TIMING=False)
+    def test_disabled_by_default(self):
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(self.detail_url)
+        self.assertNotIn('Server-Timing', response)
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_percentiles_use_bucket_bounds(self):
+        histogram = Histogram(TIME_BUCKETS)
+        for value in (0.5, 3, 3, 4, 7000):
+            histogram.observe(value)
+        self.assertEqual(histogram.percentile(50), 5)
+        self.assertIsNone(histogram.percentile(99))
+        self.assertEqual(histogram.as_dict()['buckets']['+Inf'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,314 @@
+import json
+import unittest
+from collections import Counter
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from notes.models import Note, NoteQuerySet, NoteSlug
+from notes.purge import purge_user
+from notes.rebalance import rebalance, sync_slug_directory
+from notes.routers import ReplicaRouter, ShardRouter
+from notes.sharding import shard_for, start_migrating, stop_migrating
+from notes.tests.base import BaseTestCase
+
+User = get_user_model()
+
+
+class ShardPlacementTests(SimpleTestCase):
+    """Проверки выбора шарда и роутера без обращения к БД."""
+
+    @override_settings(NOTES_SHARDS=['a', 'b', 'c'])
+    def test_authors_spread_evenly(self):
+        placement = Counter(shard_for(author_id) for author_id in range(3000))
+        self.assertEqual(set(placement), {'a', 'b', 'c'})
+        for count in placement.values():
+            self.assertGreater(count, 850)
+
+    def test_new_shard_takes_authors_only_for_itself(self):
+        authors = range(3000)
+        with override_settings(NOTES_SHARDS=['a', 'b', 'c']):
+            before = {author_id: shard_for(author_id) for author_id in authors}
+        with override_settings(NOTES_SHARDS=['a', 'b', 'c', 'd']):
+            after = {author_id: shard_for(author_id) for author_id in authors}
+        moved = [
+            author_id for author_id in before
+            if before[author_id] != after[author_id]
+        ]
+        self.assertEqual({after[author_id] for author_id in moved}, {'d'})
+        self.assertLess(len(moved), 3000 * 0.35)
+
+    @override_settings(NOTES_SHARDS=['default', 'notes_1'])
+    def test_router(self):
+        router = ShardRouter()
+        author = User(pk=7)
+        note = Note(author=author)
+        self.assertEqual(
+            router.db_for_write(Note, instance=note), shard_for(7)
+        )
+        self.assertEqual(
+            router.db_for_read(Note, instance=author), shard_for(7)
+        )
+        self.assertEqual(router.db_for_read(User, instance=note), 'default')
+        self.assertEqual(router.db_for_write(NoteSlug), 'default')
+        self.assertIs(router.allow_migrate('notes_1', 'notes', 'note'), True)
+        self.assertIs(
+            router.allow_migrate('notes_1', 'notes', 'noteslug'), False
+        )
+        self.assertIs(router.allow_migrate('notes_1', 'auth', 'user'), False)
+        self.assertIsNone(router.allow_migrate('default', 'auth', 'user'))
+
+    @override_settings(
+        NOTES_SHARDS=['default', 'notes_1'],
+        NOTES_REPLICAS={'notes_1': ['replica_1']},
+    )
+    def test_migrations_use_migrated_database(self):
+        """Запросы миграций без подсказок идут в мигрируемую базу."""
+        self.assertIsNone(ShardRouter().db_for_write(Note))
+        start_migrating('notes_1')
+        self.addCleanup(stop_migrating)
+        for router in (ShardRouter(), ReplicaRouter()):
+            with self.subTest(router=type(router).__name__):
+                self.assertEqual(router.db_for_write(Note), 'notes_1')
+                self.assertEqual(router.db_for_read(Note), 'notes_1')
+                self.assertEqual(router.db_for_write(NoteSlug), 'default')
+        stop_migrating()
+        self.assertIsNone(ShardRouter().db_for_write(Note))
+
+
+@override_settings(
+    NOTES_SHARDS=['default'], DATABASE_ROUTERS=['notes.routers.ShardRouter']
+)
+class SlugDirectoryTests(BaseTestCase):
+    """Проверки каталога slug, который держит их уникальными между шардами."""
+
+    def setUp(self):
+        super().setUp()
+        sync_slug_directory()
+
+    def claim_of(self, slug):
+        return NoteSlug.objects.filter(slug=slug).values_list(
+            'note_id', flat=True
+        ).first()
+
+    def test_created_note_claims_slug(self):
+        response = self.author_client.post(
+            self.add_url, {'title': 'New', 'text': 'Text', 'slug': 'new'}
+        )
+        self.assertRedirects(response, self.success_url)
+        self.assertEqual(
+            self.claim_of('new'), Note.objects.get(slug='new').pk
+        )
+
+    def test_renamed_note_moves_claim(self):
+        self.author_client.post(self.edit_url, {
+            'title': self.note.title, 'text': self.note.text,
+            'slug': 'renamed', 'version': self.note.version,
+        })
+        self.assertEqual(self.claim_of('renamed'), self.note.pk)
+
+    def test_live_claim_rejects_slug(self):
+        intruder = Note(
+            pk=10 ** 12, slug=self.readers_note.slug, author=self.author
+        )
+        with self.assertRaises(IntegrityError):
+            NoteSlug.claim([intruder])
+        self.assertEqual(
+            self.claim_of(self.readers_note.slug), self.readers_note.pk
+        )
+
+    def test_stale_claim_is_taken_over(self):
+        NoteSlug.objects.create(
+            slug='orphan', note_id=10 ** 12, author=self.reader
+        )
+        note = Note.objects.create(
+            title='Orphan', text='Text', slug='orphan', author=self.author
+        )
+        self.assertEqual(self.claim_of('orphan'), note.pk)
+
+    def test_failed_save_does_not_keep_slug(self):
+        """
+        Запись каталога, пережившая откат транзакции шарда, не мешает
+        другой заметке занять slug.
+        """
+        claim = NoteSlug.claim
+
+        def claim_then_fail(notes):
+            claim(notes)
+            raise RuntimeError('shard failed')
+
+        with mock.patch.object(NoteSlug, 'claim', claim_then_fail):
+            with self.assertRaises(RuntimeError):
+                Note.objects.create(
+                    title='Ghost', text='Text', slug='ghost',
+                    author=self.reader,
+                )
+        self.assertFalse(Note.objects.filter(slug='ghost').exists())
+        self.assertEqual(NoteSlug.owners(['ghost']), {})
+        note = Note.objects.create(
+            title='Ghost', text='Text', slug='ghost', author=self.author
+        )
+        self.assertEqual(self.claim_of('ghost'), note.pk)
+
+    def test_trashed_note_releases_claim(self):
+        Note.objects.trash_owned(self.author, self.note.slug)
+        self.assertEqual(NoteSlug.owners([self.note.slug]), {})
+        taken = Note.objects.create(
+            title='Taken', text='Text', slug=self.note.slug,
+            author=self.reader,
+        )
+        self.assertEqual(self.claim_of(self.note.slug), taken.pk)
+        restored = Note.objects.restore_owned(self.author, self.note.pk)
+        self.assertNotEqual(restored.slug, taken.slug)
+        self.assertEqual(self.claim_of(restored.slug), restored.pk)
+        self.assertEqual(self.claim_of(taken.slug), taken.pk)
+
+    def test_batch_delete_releases_claim(self):
+        kept = Note.objects.create(
+            title='Kept', text='Text', slug='kept', author=self.author
+        )
+        self.client.force_login(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('notes:batch'),
+                json.dumps({'operations': [
+                    {'op': 'delete', 'id': self.note.pk},
+                    {'op': 'delete', 'id': kept.pk},
+                    {'op': 'create', 'text': 'New', 'slug': 'kept'},
+                ]}),
+                content_type='application/json',
+            )
+        self.assertIsNone(self.claim_of(self.note.slug))
+        new = Note.objects.for_author(self.author).get(slug='kept')
+        self.assertEqual(self.claim_of('kept'), new.pk)
+
+    def test_trashed_slug_is_free_for_allocator(self):
+        note = Note.objects.create(
+            title='Заголовок', text='Text', author=self.author
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.trash_owned(self.author, note.slug)
+        self.assertIsNone(self.claim_of(note.slug))
+        again = Note.objects.create(
+            title='Заголовок', text='Text', author=self.reader
+        )
+        self.assertEqual((again.slug, self.claim_of(again.slug)), (
+            note.slug, again.pk
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.trash_owned(self.reader, again.slug)
+        restored = Note.objects.restore_owned(self.author, note.pk)
+        self.assertEqual(restored.slug, note.slug)
+        self.assertEqual(self.claim_of(note.slug), note.pk)
+
+    def test_generated_slug_skips_claimed(self):
+        NoteSlug.objects.create(
+            slug='zagolovok', note_id=10 ** 12, author=self.reader
+        )
+        note = Note.objects.create(
+            title='Заголовок', text='Text', author=self.author
+        )
+        self.assertEqual(note.slug, 'zagolovok-2')
+        self.assertEqual(self.claim_of('zagolovok-2'), note.pk)
+
+
+SHARD = 'notes_1'
+TWO_SHARDS = {
+    'NOTES_SHARDS': ['default', SHARD],
+    'DATABASE_ROUTERS': ['notes.routers.ShardRouter'],
+}
+
+
+@override_settings(**TWO_SHARDS)
+class RebalanceTests(TestCase):
+    """Перенос и удаление автора с двумя настоящими шардами SQLite."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Второй шард — база в памяти, которой нет в настройках проекта.
+        # Её алиас появляется только здесь: запускатель тестов проверяет
+        # databases всех классов ещё до их setUpClass().
+        connections.settings[SHARD] = connections.configure_settings({
+            'default': {},
+            SHARD: {
+                'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+            },
+        })[SHARD]
+        with override_settings(**TWO_SHARDS):
+            call_command('migrate', database=SHARD, verbosity=0)
+        cls.databases = {'default', SHARD}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[SHARD].close()
+        del connections[SHARD]
+        del connections.settings[SHARD]
+
+    def setUp(self):
+        number = 0
+        while True:
+            number += 1
+            self.author = User.objects.create(username=f'author{number}')
+            if shard_for(self.author) == SHARD:
+                break
+        trashed = Note.objects.using('default').create(
+            title='Todo', text='Старая', slug='todo', author=self.author
+        )
+        Note.objects.using('default').filter(pk=trashed.pk).update(
+            deleted_at=timezone.now()
+        )
+        self.live = Note.objects.using('default').create(
+            title='Todo', text='Новая', slug='todo', author=self.author
+        )
+
+    def assert_moved(self):
+        self.assertFalse(Note.objects.using('default').exists())
+        moved = Note.objects.using(SHARD).filter(slug='todo')
+        self.assertEqual(
+            sorted(
+                (note.text, note.deleted_at is None) for note in moved
+            ),
+            [('Новая', True), ('Старая', False)],
+        )
+        self.assertEqual(
+            NoteSlug.objects.get(slug='todo').note_id,
+            moved.get(deleted_at=None).pk,
+        )
+
+    def test_trashed_and_live_note_share_slug(self):
+        self.assertEqual(NoteSlug.objects.get(slug='todo').note_id, (
+            self.live.pk
+        ))
+        rebalance(batch_size=1)
+        self.assert_moved()
+
+    def test_interrupted_move_is_repeated(self):
+        with mock.patch.object(
+            NoteQuerySet, '_raw_delete', side_effect=RuntimeError('crash')
+        ):
+            with self.assertRaises(RuntimeError):
+                rebalance()
+        rebalance()
+        self.assert_moved()
+
+    def test_purge_user_does_not_look_for_notes_in_default(self):
+        rebalance()
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertEqual(purge_user(self.author), 2)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Note.objects.using(SHARD).exists())
+        self.assertFalse(any(
+            '"notes_note"' in query['sql'] for query in queries
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
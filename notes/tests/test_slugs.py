@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+from django.db import IntegrityError
+from pytils.translit import slugify
+
+from notes.models import Note
+from notes.slugs import SlugAllocator, is_slug_conflict
+from notes.tests.base import BaseTestCase
+
+
+class SlugAllocationTests(BaseTestCase):
+    """Проверки автоматического подбора уникальных slug."""
+
+    def test_same_titles_get_numbered_slugs(self):
+        """Заметки с одинаковым заголовком получают суффиксы -2, -3."""
+        data = {'title': 'Test title', 'text': 'Text'}
+        for _ in range(3):
+            self.user_client.post(self.add_url, data=data)
+        self.assertQuerySetEqual(
+            Note.objects.filter(author=self.user).order_by('id'),
+            ['test-title', 'test-title-2', 'test-title-3'],
+            transform=lambda note: note.slug,
+        )
+
+    def test_batch_allocation_costs_two_queries(self):
+        """Пачка slug для одной основы подбирается двумя запросами."""
+        Note.objects.create(title='Todo', text='Text', author=self.author)
+        allocator = SlugAllocator(Note)
+        with self.assertNumQueries(2):
+            slugs = [allocator.allocate('todo') for _ in range(50)]
+        self.assertEqual(slugs[0], 'todo-2')
+        self.assertEqual(slugs[-1], 'todo-51')
+
+    def test_free_bare_slug_wins_over_numbers(self):
+        """Свободный slug без номера выдаётся, даже если заняты номерные."""
+        slugs = [
+            Note.objects.create(
+                title=title, text='Text', author=self.author
+            ).slug
+            for title in ('Todo 5', 'Todo', 'Todo')
+        ]
+        self.assertEqual(slugs, ['todo-5', 'todo', 'todo-6'])
+
+    def test_conflict_with_concurrent_save_is_retried(self):
+        """
+        Если slug занят между подбором и сохранением, занятость
+        перечитывается и сохранение повторяется.
+        """
+        real_check = SlugAllocator._bare_taken
+        calls = []
+
+        def stale_first(allocator, *args):
+            calls.append(args)
+            return False if len(calls) == 1 else real_check(allocator, *args)
+
+        with mock.patch.object(SlugAllocator, '_bare_taken', stale_first):
+            note = Note.objects.create(
+                title=self.note.title, text='Text', author=self.author
+            )
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(note.slug, f'{self.note.slug}-2')
+
+    def test_edit_with_empty_slug_keeps_own_slug(self):
+        """При очистке slug у своей заметки она не конфликтует сама с собой."""
+        self.author_client.post(
+            self.edit_url, data={'title': self.note.title, 'text': 'New'}
+        )
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.slug, slugify(self.note.title))
+
+    def test_only_slug_index_is_a_slug_conflict(self):
+        self.assertTrue(is_slug_conflict(
+            IntegrityError('UNIQUE constraint failed: notes_note.slug')
+        ))
+        self.assertFalse(is_slug_conflict(
+            IntegrityError('UNIQUE constraint failed: notes_noteslugalias.x')
+        ))
+
+    def test_untransliterable_title_gets_fallback_slug(self):
+        """Заголовок без букв и цифр получает slug по умолчанию."""
+        note = Note.objects.create(title='!!!', text='x', author=self.author)
+        self.assertEqual(note.slug, 'note')
+
+
+if __name__ == '__main__':
+    unittest.main()
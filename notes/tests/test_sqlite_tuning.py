@@ -0,0 +1,45 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from notes.db import apply_sqlite_pragmas
+
+
+def pragma(name):
+    return connection.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+def apply_pragmas(values):
+    for name, value in values.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Только для SQLite.')
+class SqliteTuningTests(TestCase):
+    """Проверки прагм продакшен-профиля SQLite."""
+
+    def setUp(self):
+        connection.ensure_connection()
+        saved = {name: pragma(name) for name in ('cache_size', 'busy_timeout')}
+        self.addCleanup(apply_pragmas, saved)
+
+    def test_pragmas_applied_when_tuning(self):
+        with override_settings(
+            NOTES_SQLITE_TUNING=True,
+            NOTES_SQLITE_PRAGMAS={'cache_size': -1234, 'busy_timeout': 4321},
+        ):
+            with self.assertNumQueries(0):
+                apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(pragma('cache_size'), -1234)
+        self.assertEqual(pragma('busy_timeout'), 4321)
+
+    def test_nothing_applied_by_default(self):
+        before = pragma('cache_size')
+        with override_settings(NOTES_SQLITE_PRAGMAS={'cache_size': -1234}):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(pragma('cache_size'), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from http import HTTPStatus
+
+from django.urls import reverse
+
+from notes.models import Note, NoteTombstone
+from notes.tests.base import BaseTestCase
+
+
+class SyncTests(BaseTestCase):
+    """Проверки инкрементальной синхронизации заметок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sync_url = reverse('notes:sync')
+
+    def sync(self, token='', **params):
+        response = self.author_client.get(
+            self.sync_url, {'token': token, **params}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()
+
+    def test_change_seq_grows_with_every_write(self):
+        """Каждая запись заметки получает новый, больший номер."""
+        first = self.note.change_seq
+        self.note.text = 'Edited'
+        self.note.save(update_fields=('text',))
+        self.note.refresh_from_db()
+        self.assertGreater(self.note.change_seq, first)
+        self.assertGreater(self.note.change_seq, self.readers_note.change_seq)
+
+    def test_first_sync_returns_all_own_notes(self):
+        data = self.sync()
+        self.assertEqual([note['id'] for note in data['notes']],
+                         [self.note.pk])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+
+    def test_only_changes_after_token(self):
+        """После токена приходят только правки и удаления."""
+        second = Note.objects.create(title='Second', text='x',
+                                     author=self.author)
+        token = self.sync()['token']
+        self.assertEqual(self.sync(token)['notes'], [])
+        self.note.text = 'Edited'
+        self.note.save()
+        self.author_client.post(
+            reverse('notes:delete', args=(second.slug,))
+        )
+        data = self.sync(token)
+        self.assertEqual([note['text'] for note in data['notes']],
+                         ['Edited'])
+        self.assertEqual(data['deleted'], [second.pk])
+        self.assertEqual(self.sync(data['token'])['notes'], [])
+
+    def test_queryset_delete_leaves_tombstones(self):
+        Note.objects.filter(author=self.author).delete()
+        self.assertQuerySetEqual(
+            NoteTombstone.objects.all(), [self.note.pk],
+            transform=lambda tombstone: tombstone.note_id,
+        )
+
+    def test_limit_pages_changes(self):
+        """Изменения отдаются порциями, has_more зовёт за следующей."""
+        for number in range(4):
+            Note.objects.create(title=f'N{number}', text='x',
+                                author=self.author)
+        token, seen = '', []
+        while True:
+            data = self.sync(token, limit=2)
+            seen += [note['id'] for note in data['notes']]
+            token = data['token']
+            if not data['has_more']:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_changes_cost_does_not_depend_on_collection(self):
+        Note.objects.bulk_create(
+            Note(title='Bulk', text='x', slug=f'bulk-{i}', author=self.author)
+            for i in range(300)
+        )
+        token = self.sync(limit=1000)['token']
+        with self.assertNumQueries(4):
+            data = self.sync(token)
+        self.assertEqual(data['notes'], [])
+
+    def test_bad_token(self):
+        response = self.author_client.get(self.sync_url, {'token': 'x'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
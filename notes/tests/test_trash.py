@@ -0,0 +1,148 @@
+import unittest
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from notes.models import Note, NoteTombstone
+from notes.tests.base import BaseTestCase
+
+
+class TrashTests(BaseTestCase):
+    """Проверки корзины: удаление, восстановление и очистка."""
+
+    def setUp(self):
+        super().setUp()
+        self.restore_url = reverse('notes:restore', args=(self.note.pk,))
+        self.trash_url = reverse('notes:trash')
+
+    def trash(self):
+        self.author_client.post(self.delete_url)
+        return Note.objects.get(pk=self.note.pk)
+
+    def test_trashed_note_is_hidden(self):
+        self.trash()
+        response = self.author_client.get(self.list_url)
+        self.assertNotIn(self.note, response.context['object_list'])
+        for url in (self.detail_url, self.edit_url, self.delete_url):
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.author_client.get(
+            reverse('notes:search'), {'q': 'Author'}
+        )
+        self.assertEqual(response.context['results'], [])
+
+    def test_trash_lists_only_own_trashed_notes(self):
+        self.trash()
+        self.reader_client.post(
+            reverse('notes:delete', args=(self.readers_note.slug,))
+        )
+        response = self.author_client.get(self.trash_url)
+        self.assertEqual(list(response.context['object_list']), [self.note])
+        self.assertContains(response, self.restore_url)
+
+    def test_restore(self):
+        self.trash()
+        response = self.author_client.post(self.restore_url)
+        self.assertRedirects(response, self.detail_url)
+        self.assertIsNone(Note.objects.get(pk=self.note.pk).deleted_at)
+        self.assertEqual(
+            self.author_client.post(self.restore_url).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_trashed_slug_is_free(self):
+        """Slug заметки в корзине может занять заметка другого автора."""
+        self.trash()
+        response = self.reader_client.post(self.add_url, {
+            'title': 'Taken', 'text': 'Text', 'slug': self.note.slug,
+        })
+        self.assertRedirects(response, self.success_url)
+        self.assertTrue(
+            Note.objects.for_author(self.reader).filter(
+                slug=self.note.slug
+            ).exists()
+        )
+
+    def test_restore_reallocates_taken_slug(self):
+        """Восстановленная заметка получает новый slug, если её заняли."""
+        self.trash()
+        taken = Note.objects.create(
+            title='Taken', text='Text', slug=self.note.slug,
+            author=self.reader,
+        )
+        response = self.author_client.post(self.restore_url)
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertIsNone(note.deleted_at)
+        self.assertNotEqual(note.slug, taken.slug)
+        self.assertEqual(note.version, self.note.version + 1)
+        self.assertRedirects(
+            response, reverse('notes:detail', args=(note.slug,))
+        )
+
+    def test_restore_picks_note_by_id(self):
+        """Из двух заметок в корзине с одним slug восстанавливается одна."""
+        self.trash()
+        second = Note.objects.create(
+            title='Second', text='Text', slug=self.note.slug,
+            author=self.author,
+        )
+        self.author_client.post(
+            reverse('notes:delete', args=(second.slug,))
+        )
+        self.author_client.post(
+            reverse('notes:restore', args=(second.pk,))
+        )
+        self.assertEqual(
+            list(Note.objects.for_author(self.author).filter(
+                slug=self.note.slug
+            )),
+            [second],
+        )
+        self.assertIsNotNone(Note.objects.get(pk=self.note.pk).deleted_at)
+
+    def test_foreign_restore_is_404(self):
+        self.trash()
+        response = self.reader_client.post(self.restore_url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIsNotNone(Note.objects.get(pk=self.note.pk).deleted_at)
+
+    def test_sync_sees_trash_and_restore(self):
+        sync_url = reverse('notes:sync')
+        token = self.author_client.get(sync_url).json()['token']
+        self.trash()
+        data = self.author_client.get(sync_url, {'token': token}).json()
+        self.assertEqual(data['deleted'], [self.note.pk])
+        self.author_client.post(self.restore_url)
+        data = self.author_client.get(
+            sync_url, {'token': data['token']}
+        ).json()
+        self.assertEqual(
+            [note['id'] for note in data['notes']], [self.note.pk]
+        )
+
+    def test_expiry(self):
+        old = self.trash()
+        Note.objects.filter(pk=old.pk).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        self.reader_client.post(
+            reverse('notes:delete', args=(self.readers_note.slug,))
+        )
+        out = StringIO()
+        call_command('expire_trash', batch_size=1, stdout=out)
+        self.assertIn('Удалено из корзины: 1', out.getvalue())
+        self.assertFalse(Note.objects.filter(pk=old.pk).exists())
+        self.assertTrue(
+            Note.objects.filter(pk=self.readers_note.pk).exists()
+        )
+        tombstone = NoteTombstone.objects.get(note_id=old.pk)
+        self.assertEqual(tombstone.change_seq, old.change_seq)
+
+
+if __name__ == '__main__':
+    unittest.main()
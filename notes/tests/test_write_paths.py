@@ -0,0 +1,92 @@
+import unittest
+from http import HTTPStatus
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from notes.forms import WARNING
+from notes.models import Note, NoteTombstone
+from notes.tests.base import BaseTestCase
+
+# Запросы сессии и пользователя, которые есть у любого запроса с входом.
+AUTH_QUERIES = 2
+
+
+class WritePathTests(BaseTestCase):
+    """Число запросов на добавление, правку и удаление заметки."""
+
+    def post(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.author_client.post(url, data or {})
+        statements = [
+            query['sql'] for query in queries.captured_queries[AUTH_QUERIES:]
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        return response, statements
+
+    def test_create_is_single_insert(self):
+        response, statements = self.post(
+            self.add_url, {'title': 'New', 'text': 'Text', 'slug': 'new'}
+        )
+        self.assertRedirects(response, self.success_url)
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(statements[0].startswith('UPDATE notes_changecounter'))
+        self.assertTrue(statements[1].startswith('INSERT INTO "notes_note"'))
+
+    def test_edit_writes_only_changed_fields(self):
+        response, statements = self.post(self.edit_url, {
+            'title': 'Renamed', 'text': self.note.text, 'slug': self.note.slug,
+            'version': self.note.version,
+        })
+        self.assertRedirects(response, self.success_url)
+        self.assertEqual(len(statements), 3)
+        update = statements[-1]
+        self.assertIn('"title"', update)
+        self.assertNotIn('"text"', update)
+        self.assertNotIn('"slug"', update)
+
+    def test_unchanged_edit_writes_nothing(self):
+        response, statements = self.post(self.edit_url, {
+            'title': self.note.title, 'text': self.note.text,
+            'slug': self.note.slug, 'version': self.note.version,
+        })
+        self.assertRedirects(response, self.success_url)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(Note.objects.get(pk=self.note.pk).version, 1)
+
+    def test_taken_slug_rejected_by_index(self):
+        response, statements = self.post(self.edit_url, {
+            'title': 'Taken', 'text': 'Text',
+            'slug': self.readers_note.slug, 'version': self.note.version,
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFormError(
+            response.context['form'], 'slug',
+            self.readers_note.slug + WARNING,
+        )
+        # Единственный SELECT — загрузка редактируемой заметки.
+        self.assertEqual(
+            sum(sql.startswith('SELECT') for sql in statements), 1
+        )
+        self.assertEqual(
+            Note.objects.get(pk=self.note.pk).title, self.note.title
+        )
+
+    def test_delete_is_single_update(self):
+        response, statements = self.post(self.delete_url)
+        self.assertRedirects(response, self.success_url)
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(statements[0].startswith('UPDATE notes_changecounter'))
+        self.assertTrue(statements[1].startswith('UPDATE "notes_note"'))
+        self.assertIsNotNone(Note.objects.get(pk=self.note.pk).deleted_at)
+
+    def test_delete_of_foreign_note_is_404(self):
+        self.client.force_login(self.reader)
+        response = self.client.post(self.delete_url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertTrue(Note.objects.filter(pk=self.note.pk).exists())
+        self.assertFalse(NoteTombstone.objects.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import difflib
+
+# Длина сохранённого начала текста для списков, с многоточием.
+EXCERPT_LENGTH = 160
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """
+    Начало текста без переносов и лишних пробелов для превью в списках.
+
+    Смотрит только на первые ``2 * length`` символов, обрезает по границе
+    слова и ставит многоточие, если текст не поместился.
+    """
+    head = ' '.join(text[:length * 2].split())
+    if len(head) <= length and len(text) <= length * 2:
+        return head
+    cut = head[:length - 1]
+    if head[length - 1:length] not in ('', ' ') and ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + '…'
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def text_diff(old, new):
+    """Построчные отличия ``new`` от ``old`` без заголовков unified diff."""
+    return list(difflib.unified_diff(
+        old.splitlines(), new.splitlines(), lineterm='', n=2
+    ))[2:]
@@ -1,15 +1,43 @@
+from django.conf import settings
 from django.urls import path
 
-from notes import views
+from notes import async_views, views
 
 app_name = 'notes'
 
+
+def note_urlpatterns(crud):
+    """Маршруты чтения и правки заметок из модуля представлений ``crud``."""
+    return [
+        path('add/', crud.NoteCreate.as_view(), name='add'),
+        path('edit/<slug:slug>/', crud.NoteUpdate.as_view(), name='edit'),
+        path('note/<slug:slug>/', crud.NoteDetail.as_view(), name='detail'),
+        path(
+            'delete/<slug:slug>/', crud.NoteDelete.as_view(), name='delete'
+        ),
+        path('notes/', crud.NotesList.as_view(), name='list'),
+    ]
+
+
 urlpatterns = [
     path('', views.Home.as_view(), name='home'),
-    path('add/', views.NoteCreate.as_view(), name='add'),
-    path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
-    path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
-    path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
-    path('notes/', views.NotesList.as_view(), name='list'),
+    *note_urlpatterns(
+        async_views if settings.NOTES_ASYNC_VIEWS else views
+    ),
+    path('trash/', views.NoteTrash.as_view(), name='trash'),
+    path(
+        'trash/<int:pk>/restore/', views.NoteRestore.as_view(),
+        name='restore',
+    ),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('export/', views.NoteExport.as_view(), name='export'),
+    path('api/batch/', views.NoteBatchApi.as_view(), name='batch'),
+    path('api/import/', views.NoteImportApi.as_view(), name='import'),
+    path('api/jobs/<int:pk>/', views.JobStatusApi.as_view(), name='job'),
+    path(
+        'api/jobs/<int:pk>/file/', views.JobFile.as_view(), name='job_file'
+    ),
+    path('api/sync/', views.NoteSyncApi.as_view(), name='sync'),
+    path('metrics/', views.ServerMetrics.as_view(), name='metrics'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
@@ -1,9 +1,33 @@
+import json
+from http import HTTPStatus
+from pathlib import Path
+from uuid import uuid4
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.http import (
+    FileResponse, Http404, HttpResponseRedirect, JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
-from .forms import NoteForm
-from .models import Note
+from .batch import BatchError, NoteBatch
+from .cache import get_or_compute
+from .conditional import detail_etag, detail_note, list_etag
+from .export import EXPORT_FORMATS, export_notes
+from .forms import NoteForm, conflict_context
+from .importer import IMPORT_FORMATS
+from .jobs import enqueue, job_as_dict, job_file
+from .metrics import METRICS_HEADER, metrics_token_valid, registry
+from .models import LIST_FIELDS, Job, Note, VersionConflict
+from .pagination import KeysetPaginator
+from .search import search_notes
+from .sync import DEFAULT_LIMIT, MAX_LIMIT, changes_since, parse_token
 
 
 class Home(generic.TemplateView):
@@ -23,37 +47,329 @@ class NoteBase(LoginRequiredMixin):
 
     def get_queryset(self):
         """Пользователь может работать только со своими заметками."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.for_author(self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class NoteFormMixin(NoteBase):
+    """Общее для добавления и редактирования заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        try:
+            saved = form.save_unique()
+        except VersionConflict:
+            return self.conflict(form)
+        if not saved:
+            return self.form_invalid(form)
+        self.object = form.instance
+        return HttpResponseRedirect(self.get_success_url())
+
+    def conflict(self, form):
+        """Вместо потерянной правки — страница слияния с ответом 409."""
+        current = self.get_queryset().filter(
+            pk=form.instance.pk
+        ).primary().first()
+        if current is None:
+            raise Http404('Заметка удалена.')
+        return TemplateResponse(
+            self.request, 'notes/conflict.html',
+            conflict_context(form, current), status=HTTPStatus.CONFLICT,
+        )
+
+
+class NoteCreate(NoteFormMixin, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteFormMixin, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
-    """Удаление заметки."""
+    """Удаление заметки в корзину."""
     template_name = 'notes/delete.html'
 
+    def post(self, request, *args, **kwargs):
+        # Один UPDATE по автору и slug вместо загрузки заметки.
+        if not Note.objects.trash_owned(request.user, kwargs['slug']):
+            raise Http404('Заметка не найдена.')
+        return HttpResponseRedirect(self.success_url)
+
+
+class NoteTrash(NoteBase, generic.ListView):
+    """Корзина: удалённые заметки, которые ещё можно восстановить."""
+    template_name = 'notes/trash.html'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return (
+            self.model.objects.for_author(self.request.user, trashed=True)
+            .only(*LIST_FIELDS, 'deleted_at').order_by('-deleted_at', '-id')
+        )
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            trash_days=settings.NOTES_TRASH_DAYS, **kwargs
+        )
 
+
+class NoteRestore(NoteBase, generic.View):
+    """
+    Восстановление заметки из корзины.
+
+    Заметка выбирается по id: slug в корзине не уникален, его могут
+    делить несколько удалённых заметок.
+    """
+
+    def post(self, request, *args, **kwargs):
+        note = Note.objects.restore_owned(request.user, kwargs['pk'])
+        if note is None:
+            raise Http404('Заметки нет в корзине.')
+        return HttpResponseRedirect(reverse('notes:detail', args=(note.slug,)))
+
+
+@method_decorator(condition(etag_func=list_etag), name='get')
 class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return super().get_queryset().for_list()
 
+    def paginate_queryset(self, queryset, page_size):
+        """Курсорная пагинация вместо OFFSET: страница N стоит как первая."""
+        paginator = KeysetPaginator(queryset, page_size)
+        cursor = self.request.GET.get('cursor')
+        page = get_or_compute(
+            self.request.user.pk,
+            ('list', str(page_size), cursor or ''),
+            lambda: paginator.page(cursor),
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
 
+
+@method_decorator(condition(etag_func=detail_etag), name='get')
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_object(self, queryset=None):
+        note = detail_note(self.request, self.kwargs[self.slug_url_kwarg])
+        if note is None:
+            raise Http404('Заметка не найдена.')
+        return note
+
+
+class NoteSearch(LoginRequiredMixin, generic.TemplateView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+    paginate_by = 20
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        page = search_notes(
+            self.request.user,
+            query,
+            limit=self.paginate_by,
+            cursor=self.request.GET.get('cursor'),
+        )
+        context.update(
+            query=query, results=page.object_list, page_obj=page,
+        )
+        return context
+
+
+def job_accepted(task):
+    """Ответ 202 на поставленную задачу со ссылкой на её состояние."""
+    return JsonResponse(
+        {**job_as_dict(task), 'status_url': reverse(
+            'notes:job', args=(task.pk,)
+        )},
+        status=HTTPStatus.ACCEPTED,
+    )
+
+
+class NoteExport(LoginRequiredMixin, generic.View):
+    """
+    Выгрузка всех заметок пользователя.
+
+    GET отдаёт выгрузку потоком в том же запросе, POST ставит фоновую
+    задачу: файл потом скачивается по ссылке из состояния задачи.
+    """
+
+    def get_format(self, params):
+        export_format = params.get('format', 'jsonl')
+        if export_format not in EXPORT_FORMATS:
+            raise Http404('Неизвестный формат выгрузки.')
+        return export_format
+
+    def post(self, request, *args, **kwargs):
+        return job_accepted(enqueue(
+            'export_notes', request.user,
+            export_format=self.get_format(request.POST),
+        ))
+
+    def get(self, request, *args, **kwargs):
+        export_format = self.get_format(request.GET)
+        _, content_type, extension = EXPORT_FORMATS[export_format]
+        return StreamingHttpResponse(
+            export_notes(request.user, export_format),
+            content_type=content_type,
+            headers={
+                'Content-Disposition':
+                    f'attachment; filename="notes.{extension}"',
+            },
+        )
+
+
+class NoteImportApi(LoginRequiredMixin, generic.View):
+    """
+    Импорт заметок из файла JSONL или CSV фоновой задачей.
+
+    Файл приходит в поле ``file`` multipart-запроса, формат — в поле
+    ``format`` или по расширению. Запрос только сохраняет файл и ставит
+    задачу; ответ 202 содержит ссылку на её состояние.
+    """
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse(
+                {'error': 'Нет файла в поле file.'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        import_format = request.POST.get('format') or (
+            Path(upload.name).suffix.lstrip('.')
+        )
+        if import_format not in IMPORT_FORMATS:
+            return JsonResponse(
+                {'error': f'Неизвестный формат: {import_format}.'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        name = f'import-{uuid4().hex}.{import_format}'
+        with open(job_file(name), 'wb') as stream:
+            for chunk in upload.chunks():
+                stream.write(chunk)
+        return job_accepted(enqueue(
+            'import_notes', request.user,
+            upload=name, import_format=import_format,
+        ))
+
+
+class JobStatusApi(LoginRequiredMixin, generic.View):
+    """JSON API: состояние фоновой задачи пользователя для опроса."""
+    raise_exception = True
+
+    def get_job(self):
+        return get_object_or_404(
+            Job, pk=self.kwargs['pk'], user=self.request.user
+        )
+
+    def get(self, request, *args, **kwargs):
+        task = self.get_job()
+        data = job_as_dict(task)
+        if task.status == Job.Status.DONE and 'file' in (task.result or {}):
+            data['file_url'] = reverse('notes:job_file', args=(task.pk,))
+        return JsonResponse(data)
+
+
+class JobFile(JobStatusApi):
+    """Скачивание файла, который оставила выполненная задача."""
+
+    def get(self, request, *args, **kwargs):
+        task = self.get_job()
+        result = task.result or {}
+        if task.status != Job.Status.DONE or 'file' not in result:
+            raise Http404('У задачи нет готового файла.')
+        try:
+            stream = open(job_file(result['file']), 'rb')
+        except FileNotFoundError:
+            raise Http404('Файл задачи уже удалён.')
+        return FileResponse(
+            stream, as_attachment=True, filename=result['filename'],
+            content_type=result['content_type'],
+        )
+
+
+class NoteBatchApi(LoginRequiredMixin, generic.View):
+    """
+    JSON API: пакет операций над заметками за один запрос.
+
+    Тело запроса — ``{"operations": [{"op": "create", ...}, ...]}``,
+    операции выполняются в одной транзакции по принципу «всё или ничего».
+    Правка и удаление могут передать ``version``: если заметка уже в
+    другой версии, пакет не пишется и отвечает 409.
+    """
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            return JsonResponse(
+                {'error': 'Ожидается JSON-объект с ключом operations.'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        try:
+            results = NoteBatch(request.user, payload.get('operations')).run()
+        except BatchError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+        statuses = {result['status'] for result in results}
+        status = HTTPStatus.OK
+        if 'error' in statuses:
+            status = HTTPStatus.BAD_REQUEST
+        elif 'conflict' in statuses:
+            status = HTTPStatus.CONFLICT
+        return JsonResponse({'results': results}, status=status)
+
+
+class NoteSyncApi(LoginRequiredMixin, generic.View):
+    """
+    JSON API: изменения заметок после токена клиента.
+
+    Клиент передаёт ``token`` из прошлого ответа (в первый раз — ничего)
+    и получает изменённые заметки, id удалённых и новый токен. Пока
+    ``has_more`` истинно, запрос стоит повторить с новым токеном.
+    """
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = parse_token(request.GET.get('token'))
+            limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Некорректный токен или лимит.'},
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        limit = min(max(limit, 1), MAX_LIMIT)
+        return JsonResponse(changes_since(request.user, since, limit))
+
+
+class ServerMetrics(generic.View):
+    """
+    Гистограммы Server-Timing по представлениям, только для своих.
+
+    Адрес клиента не в счёт: за обратным прокси все запросы приходят с
+    127.0.0.1. Без входа эндпоинт отвечает на подписанный токен в
+    заголовке X-Metrics-Token, его присылает manage.py server_metrics.
+    """
+
+    def get(self, request, *args, **kwargs):
+        token = request.headers.get(METRICS_HEADER)
+        if not (
+            request.user.is_staff
+            or token and metrics_token_valid(token)
+        ):
+            raise Http404
+        return JsonResponse(registry.snapshot())
@@ -22,11 +22,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.middleware.ServerTimingMiddleware',
+    'notes.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'notes.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -59,6 +62,149 @@ DATABASES = {
     }
 }
 
+# Кэш страниц сбрасывается сменой поколения в кэше, поэтому кэш должен
+# быть общим для всех процессов: файловый, Redis или Memcached.
+# LocMemCache у каждого процесса свой, с ним проверка notes.E001 не даст
+# запуститься при DEBUG = False.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+# Сколько секунд хранить данные страниц заметок в кэше.
+NOTES_PAGE_CACHE_TIMEOUT = 300
+
+# Замерять SQL и рендеринг каждого запроса: заголовок Server-Timing
+# и гистограммы на эндпоинте метрик (/metrics/).
+NOTES_SERVER_TIMING = False
+
+# Куда складывать профили запросов и сколько секунд живёт токен
+# профилирования из manage.py profile_token. Сверх NOTES_PROFILE_MAX_FILES
+# файлов или NOTES_PROFILE_MAX_BYTES байт старейшие профили удаляются.
+NOTES_PROFILE_DIR = BASE_DIR / 'profiles'
+NOTES_PROFILE_TOKEN_MAX_AGE = 300
+NOTES_PROFILE_MAX_FILES = 200
+NOTES_PROFILE_MAX_BYTES = 100 * 1024 * 1024
+
+# Обслуживать заметки асинхронными представлениями (имеет смысл под ASGI).
+NOTES_ASYNC_VIEWS = False
+
+# Быстрая аутентификация: сессии в подписанных cookie и пользователи
+# из кэша процесса на NOTES_USER_CACHE_TIMEOUT секунд, без запросов к
+# django_session и auth_user. Выход и смена пароля сбрасывают кэш только
+# в своём процессе, а подписанную cookie нельзя отозвать на сервере.
+NOTES_FAST_AUTH = False
+NOTES_USER_CACHE_TIMEOUT = 30
+
+if NOTES_FAST_AUTH:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+    AUTHENTICATION_BACKENDS = ['notes.auth.CachedUserBackend']
+
+# Тексты заметок от этого размера в байтах хранятся в SQLite сжатыми.
+NOTES_TEXT_COMPRESS_THRESHOLD = 4096
+
+# Продакшен-профиль SQLite: журнал WAL (читатели не ждут писателя),
+# synchronous=NORMAL, отображение файла в память и кэш страниц побольше.
+# Прагмы ставит notes.db каждому новому соединению. Соединения живут
+# между запросами и проверяются перед повторным использованием, а
+# транзакции сразу берут блокировку записи (BEGIN IMMEDIATE), чтобы
+# писатели ждали друг друга busy_timeout, а не падали с database is locked.
+NOTES_SQLITE_TUNING = False
+NOTES_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -32000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+NOTES_SQLITE_CONNECTION = {
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {'timeout': 5, 'transaction_mode': 'IMMEDIATE'},
+}
+
+# Шарды заметок: алиасы из DATABASES, между которыми заметки, надгробия и
+# счётчик изменений раскладываются по хэшу автора. Пользователи и каталог
+# slug остаются в default. Порядок задаёт диапазоны id заметок, поэтому
+# новые шарды добавляются в конец, после чего запускается
+# manage.py rebalance_shards. Пустой список — всё в одной базе default.
+# Например:
+# NOTES_SHARDS = ['default', 'notes_1']
+# DATABASES['notes_1'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': BASE_DIR / 'notes_1.sqlite3',
+# }
+NOTES_SHARDS = []
+
+
+# Реплики для чтения заметок: основная база (default или шард) → список
+# её копий. Заметки читаются со случайной живой реплики, запись и всё
+# остальное — с основной базы. После записи клиент читает с основной
+# базы ещё NOTES_REPLICA_PIN_SECONDS секунд, чтобы видеть свои изменения.
+# Реплика, не ответившая на проверку, пропускается
+# NOTES_REPLICA_HEALTH_INTERVAL секунд. Локально реплика — копия файла
+# SQLite (manage.py refresh_replicas), открытая только для чтения:
+# NOTES_REPLICAS = {'default': ['replica_1']}
+# DATABASES['replica_1'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': f'file:{BASE_DIR / "replica_1.sqlite3"}?mode=ro',
+#     'OPTIONS': {'uri': True},
+#     'TEST': {'MIRROR': 'default'},
+# }
+NOTES_REPLICAS = {}
+NOTES_REPLICA_PIN_SECONDS = 5
+NOTES_REPLICA_HEALTH_INTERVAL = 5
+
+if NOTES_REPLICAS:
+    DATABASE_ROUTERS = ['notes.routers.ReplicaRouter']
+elif NOTES_SHARDS:
+    DATABASE_ROUTERS = ['notes.routers.ShardRouter']
+
+if NOTES_SQLITE_TUNING:
+    # Реплики открыты только для чтения, им профиль не нужен.
+    replicas = {alias for aliases in NOTES_REPLICAS.values() for alias in aliases}
+    for alias, database in DATABASES.items():
+        if (
+            alias not in replicas
+            and database['ENGINE'] == 'django.db.backends.sqlite3'
+        ):
+            database.update(NOTES_SQLITE_CONNECTION)
+
+
+# Удаление пользователя с заметками (manage.py purge_users, действие в
+# админке) и очистка корзины: заметки удаляются пачками до
+# NOTES_PURGE_BATCH_SIZE строк, а размер пачки подбирается по замеренной
+# стоимости строки так, чтобы её транзакция держала блокировку записи
+# меньше NOTES_PURGE_MAX_LOCK_SECONDS.
+NOTES_PURGE_BATCH_SIZE = 1000
+NOTES_PURGE_MAX_LOCK_SECONDS = 0.05
+
+# Сколько дней удалённая заметка лежит в корзине, прежде чем её удалит
+# периодическая задача expire_trash (или manage.py expire_trash).
+NOTES_TRASH_DAYS = 30
+
+# Фоновые задачи: очередь в таблице notes_job, выполняет их
+# manage.py run_workers пулом из NOTES_JOB_THREADS потоков. Упавшая
+# задача повторяется через NOTES_JOB_RETRY_SECONDS (с удвоением) до
+# NOTES_JOB_MAX_ATTEMPTS попыток; задача, обработчик которой молчит
+# NOTES_JOB_TIMEOUT секунд, возвращается в очередь. Загрузки и
+# результаты (файлы выгрузок) лежат в NOTES_JOB_FILES_DIR и удаляются
+# вместе с задачей через NOTES_JOB_KEEP_DAYS дней. NOTES_PERIODIC_JOBS —
+# виды задач, которые run_workers ставит сам раз в столько секунд.
+NOTES_JOB_THREADS = 2
+NOTES_JOB_POLL_SECONDS = 1
+NOTES_JOB_MAX_ATTEMPTS = 3
+NOTES_JOB_RETRY_SECONDS = 30
+NOTES_JOB_TIMEOUT = 600
+NOTES_JOB_KEEP_DAYS = 7
+NOTES_JOB_FILES_DIR = BASE_DIR / 'job_files'
+NOTES_PERIODIC_JOBS = {
+    'expire_trash': 60 * 60,
+    'expire_jobs': 60 * 60,
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {